@@ -2,110 +2,87 @@
 Business rules for order calculations
 This file centralizes all pricing logic to prevent manipulation from client-side
 
-Configuration values are in config_rules.py for easy modification
+Configuration values are in config_rules.py for easy modification.
+They are compiled into an immutable rules object by pricing.py and
+reloaded automatically when the file changes.
 """
 
-# Import configuration from the human-readable config file
-from .config_rules import (
-    TAX_RATE, TAX_ENABLED,
-    SHIPPING_TIERS, SHIPPING_ENABLED,
-    COD_ENABLED, COD_FIXED_CHARGE, COD_MAX_ORDER_VALUE, COD_USE_PERCENTAGE, COD_PERCENTAGE,
-    COUPONS
-)
+from .pricing import get_rules
+from . import offer_index, promotions
 
 
 def calculate_tax(subtotal: float) -> float:
     """Calculate tax amount based on subtotal"""
-    if not TAX_ENABLED:
-        return 0.0
-    return round(subtotal * (TAX_RATE / 100), 2)
+    return get_rules().tax(subtotal)
 
 
 def calculate_shipping(subtotal: float, state: str = None) -> float:
     """Calculate shipping charges based on subtotal using tiered rates"""
-    if not SHIPPING_ENABLED:
-        return 0.0
-    
-    # Find the applicable shipping tier
-    for tier in SHIPPING_TIERS:
-        min_value = tier['cart_min']
-        max_value = tier['cart_max']
-        shipping_charge = tier['shipping_charge']
-        
-        if max_value is None:
-            # Last tier (unlimited max)
-            if subtotal >= min_value:
-                return shipping_charge
-        else:
-            # Regular tier with both min and max
-            if min_value <= subtotal < max_value:
-                return shipping_charge
-    
-    # Default fallback (should not reach here if tiers are configured correctly)
-    return 0.0
+    return get_rules().shipping(subtotal)
 
 
 def calculate_cod_charges(subtotal: float, payment_method: str) -> float:
     """Calculate COD charges if payment method is COD"""
-    if payment_method.lower() != "cod" or not COD_ENABLED:
-        return 0.0
-    
-    # Check if order value exceeds COD limit
-    if subtotal > COD_MAX_ORDER_VALUE:
-        raise ValueError(f"COD not available for orders above ₹{COD_MAX_ORDER_VALUE}")
-    
-    if COD_USE_PERCENTAGE:
-        return round(subtotal * (COD_PERCENTAGE / 100), 2)
-    else:
-        return COD_FIXED_CHARGE
+    return get_rules().cod(subtotal, payment_method)
 
 
 def apply_coupon(subtotal: float, coupon_code: str = None) -> float:
-    """Calculate discount amount based on coupon code"""
-    if not coupon_code or coupon_code not in COUPONS:
+    """Calculate discount amount based on coupon code (admin offers and config coupons)"""
+    offer = offer_index.lookup(coupon_code)
+    if not offer:
         return 0.0
-    
-    coupon = COUPONS[coupon_code]
-    
-    # Check if coupon is active
-    if not coupon.get("active", True):
-        raise ValueError(f"Coupon {coupon_code} is not active")
-    
-    # Check minimum order value
-    if subtotal < coupon.get("min_order_value", 0):
-        raise ValueError(f"Minimum order value of ₹{coupon['min_order_value']} required for {coupon_code}")
-    
-    # Calculate discount
-    if coupon["type"] == "percentage":
-        discount = round(subtotal * (coupon["value"] / 100), 2)
-    else:  # fixed
-        discount = coupon["value"]
-    
-    return discount
+    return offer.discount_for(subtotal)
 
 
 from sqlalchemy.orm import Session
 from . import models
 
-def calculate_order_totals(db: Session, items: list, payment_method: str, coupon_code: str = None):
+def calculate_order_totals(db: Session, items: list, payment_method: str, coupon_code: str = None, free_samples: list = None):
     """
     Calculate all order totals based on business rules
     Returns a tuple: (financial_breakdown, order_items)
+
+    Products and variants for all lines (and any free samples) are loaded in
+    one query each; promotions are then evaluated in memory and their free
+    items appended to order_items at price 0.
     """
+    free_samples = free_samples or []
+    rules = get_rules()
+
+    # Load everything the order touches up front
+    product_ids = {item['productId'] for item in items}
+    product_ids.update(sample.get('productId') for sample in free_samples)
+    product_ids.update(promotions.reward_product_ids(rules.promotions))
+    product_ids.discard(None)
+    products = {
+        product.id: product
+        for product in db.query(models.Product).filter(models.Product.id.in_(product_ids)).all()
+    } if product_ids else {}
+
+    variant_ids = {item.get('variantId') for item in items}
+    variant_ids.update(sample.get('variantId') for sample in free_samples)
+    variant_ids.discard(None)
+    variants = {
+        variant.id: variant
+        for variant in db.query(models.Variant).filter(models.Variant.id.in_(variant_ids)).all()
+    } if variant_ids else {}
+
     # Calculate subtotal from items and validate products exist
     subtotal = 0
     order_items = []
+    lines = []
     
     for item in items:
-        product = db.query(models.Product).filter(models.Product.id == item['productId']).first()
+        product = products.get(item['productId'])
         if not product:
             raise ValueError(f"Product {item['productId']} not found")
             
         price = product.sale_price if product.sale_price else product.price
         variant_id = item.get('variantId')
+        variant = None
         
         if variant_id:
-            variant = db.query(models.Variant).filter(models.Variant.id == variant_id).first()
+            variant = variants.get(variant_id)
             if not variant:
                 raise ValueError(f"Variant {variant_id} not found")
             price = variant.price
@@ -117,11 +94,19 @@ def calculate_order_totals(db: Session, items: list, payment_method: str, coupon
             "product_id": product.id,
             "variant_id": variant_id,
             "quantity": quantity,
-            "price": price
+            "price": price,
+            "product_name": product.name,
+            "variant_name": variant.name if variant else None,
+            "product_image": product.image_url
         })
+        lines.append({"product_id": product.id, "category_id": product.category_id, "quantity": quantity})
+
+    # Free items earned through promotions (no extra queries)
+    order_items.extend(promotions.apply_promotions(rules.promotions, lines, free_samples, products, variants))
 
     # Apply discount
-    discount_amount = apply_coupon(subtotal, coupon_code)
+    offer = offer_index.lookup(coupon_code)
+    discount_amount = offer.discount_for(subtotal) if offer else 0.0
     amount_after_discount = subtotal - discount_amount
     
     # Calculate tax on discounted amount
@@ -130,7 +115,7 @@ def calculate_order_totals(db: Session, items: list, payment_method: str, coupon
     # Calculate shipping on subtotal (before discount)
     # Note: State is not passed here, assuming flat shipping or based on subtotal only for now
     # If state-based shipping is needed, we need to pass shipping_address to this function
-    shipping_amount = calculate_shipping(subtotal)
+    shipping_amount = 0.0 if offer and offer.free_shipping else calculate_shipping(subtotal)
     
     # Calculate COD charges on subtotal
     cod_charges = calculate_cod_charges(subtotal, payment_method)
@@ -148,3 +133,48 @@ def calculate_order_totals(db: Session, items: list, payment_method: str, coupon
     }
     
     return financial_breakdown, order_items
+
+
+def redeem_offer(db: Session, offer, order_id: int, user_id: int = None, customer_email: str = None):
+    """
+    Record a coupon redemption for an order inside the caller's transaction.
+
+    The remaining usage_limit is consumed with a conditional decrement, so
+    concurrent checkouts on the same code serialize on the offer row only
+    for the rest of their transaction and can never oversell. Per-user
+    limits are counted after that row is locked, using the
+    (offer_id, user_id) / (offer_id, customer_email) indexes.
+    Raises ValueError if the code can no longer be used; the caller must
+    roll back.
+    """
+    if offer is None or offer.offer_id is None:
+        # Config coupons have no usage accounting
+        return
+
+    if offer.usage_limit is not None:
+        updated = db.query(models.Offer).filter(
+            models.Offer.id == offer.offer_id,
+            models.Offer.usage_limit > 0
+        ).update({models.Offer.usage_limit: models.Offer.usage_limit - 1}, synchronize_session=False)
+        if not updated:
+            offer_index.invalidate()
+            raise ValueError(f"Coupon usage limit reached ({offer.code})")
+    elif offer.per_user_limit is not None:
+        # Lock the offer row so two checkouts by the same user can't both pass the count
+        db.query(models.Offer.id).filter(models.Offer.id == offer.offer_id).with_for_update().first()
+
+    if offer.per_user_limit is not None:
+        redemptions = db.query(models.OfferRedemption).filter(models.OfferRedemption.offer_id == offer.offer_id)
+        if user_id is not None:
+            redemptions = redemptions.filter(models.OfferRedemption.user_id == user_id)
+        else:
+            redemptions = redemptions.filter(models.OfferRedemption.customer_email == customer_email)
+        if redemptions.count() >= offer.per_user_limit:
+            raise ValueError(f"Coupon already used the maximum number of times ({offer.code})")
+
+    db.add(models.OfferRedemption(
+        offer_id=offer.offer_id,
+        order_id=order_id,
+        user_id=user_id,
+        customer_email=customer_email
+    ))
@@ -0,0 +1,241 @@
+"""
+Catalog version and conditional GETs
+
+The catalog (products, their variants and categories) carries one monotonic
+version number in the KV store. Any committed ORM write that touches those
+tables bumps it: a session listener notes catalog changes at flush time
+(including bulk query.update()/delete()) and increments the counter after
+the commit succeeds, so rolled-back writes never invalidate anything.
+
+CatalogETagMiddleware tags GET responses under CATALOG_PATHS with a strong
+ETag built from the version and the normalized path and query string. A
+request whose If-None-Match matches gets a 304 straight from the middleware,
+before routing, so no session is opened and nothing is serialized.
+
+Workers compare their cached version against the shared counter at most
+every CATALOG_VERSION_CHECK_INTERVAL seconds (immediately in the worker that
+made the write), in the threadpool rather than on the event loop. When the
+counter is missing (fresh store, eviction) it is seeded from the wall clock
+in milliseconds, so a reset never reissues a version that was already
+handed out. The counter expires CATALOG_VERSION_MAX_AGE seconds after it was
+seeded, which reissues every tag even when a bump was missed (a write made
+around the ORM, a store outage).
+
+The counter must be shared by every worker and by scripts that write the
+catalog, so ETags are only served when KV_STORE_URL is set; with the
+in-process store each worker would keep its own version.
+
+With a read replica (READ_DATABASE_URL) the catalog routes read from the
+replica, which may not have replayed the write when the version is bumped
+and would serve old rows under the new tag. A second bump follows
+READ_YOUR_WRITES_SECONDS after the last catalog write, once it has caught up.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .database import READ_DATABASE_URL, READ_YOUR_WRITES_SECONDS
+from .services.kv_store import get_store, is_shared
+
+logger = logging.getLogger(__name__)
+
+CATALOG_ETAGS_ENABLED = os.getenv("CATALOG_ETAGS_ENABLED", "true").lower() == "true"
+CATALOG_VERSION_CHECK_INTERVAL = float(os.getenv("CATALOG_VERSION_CHECK_INTERVAL", "1"))
+CATALOG_VERSION_MAX_AGE = float(os.getenv("CATALOG_VERSION_MAX_AGE", "3600"))
+CATALOG_PATHS = ("/api/v1/products", "/api/v1/categories")
+VERSION_KEY = "catalog:version"
+
+CATALOG_MODELS = (models.Product, models.Variant, models.Category)
+CATALOG_TABLES = frozenset(model.__tablename__ for model in CATALOG_MODELS)
+
+# Suffixes CompressionMiddleware appends to the ETags of encoded bodies
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+_version: Optional[int] = None
+_next_check = 0.0
+_lock = threading.Lock()
+
+# Follow-up bump once the read replica has replayed the latest catalog write
+_replica_bump_at = 0.0
+_replica_timer: Optional[threading.Timer] = None
+_replica_lock = threading.Lock()
+
+
+def _shared_version() -> int:
+    store = get_store()
+    value = store.get(VERSION_KEY)
+    if value is None:
+        return store.incr(VERSION_KEY, int(time.time() * 1000), ttl=CATALOG_VERSION_MAX_AGE)
+    return int(value)
+
+
+def current_version() -> int:
+    global _version, _next_check
+    now = time.monotonic()
+    if _version is not None and now < _next_check:
+        return _version
+    with _lock:
+        if _version is None or now >= _next_check:
+            _version = _shared_version()
+            _next_check = now + CATALOG_VERSION_CHECK_INTERVAL
+        return _version
+
+
+def bump() -> int:
+    """Invalidate every catalog ETag; called after catalog writes commit"""
+    global _version, _next_check
+    with _lock:
+        _shared_version()  # seed the counter if it is missing
+        _version = get_store().incr(VERSION_KEY, ttl=CATALOG_VERSION_MAX_AGE)
+        _next_check = time.monotonic() + CATALOG_VERSION_CHECK_INTERVAL
+        return _version
+
+
+def _start_replica_timer(delay: float) -> threading.Timer:
+    timer = threading.Timer(delay, _bump_after_replica_lag)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def _bump_after_replica_lag():
+    global _replica_timer
+    with _replica_lock:
+        remaining = _replica_bump_at - time.monotonic()
+        if remaining > 0:
+            # Another write came in meanwhile; wait for the replica to replay that one too
+            _replica_timer = _start_replica_timer(remaining)
+            return
+        _replica_timer = None
+    try:
+        bump()
+    except Exception:
+        logger.exception("Could not bump the catalog version")
+
+
+def schedule_replica_bump():
+    """Bump again READ_YOUR_WRITES_SECONDS after the last catalog write (no-op without a replica)"""
+    global _replica_bump_at, _replica_timer
+    if not READ_DATABASE_URL:
+        return
+    with _replica_lock:
+        _replica_bump_at = time.monotonic() + READ_YOUR_WRITES_SECONDS
+        if _replica_timer is None:
+            _replica_timer = _start_replica_timer(READ_YOUR_WRITES_SECONDS)
+
+
+# Session hooks
+
+@event.listens_for(Session, "after_flush")
+def _note_catalog_changes(session, flush_context):
+    if session.info.get("catalog_changed"):
+        return
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info["catalog_changed"] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, CATALOG_MODELS) and session.is_modified(obj):
+            session.info["catalog_changed"] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_bulk_catalog_changes(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.local_table.name in CATALOG_TABLES:
+            orm_execute_state.session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session):
+    if session.info.pop("catalog_changed", False):
+        try:
+            bump()
+        except Exception:
+            # The write is committed; clients revalidate once the store is back
+            logger.exception("Could not bump the catalog version")
+        schedule_replica_bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changed", None)
+
+
+# Conditional GETs
+
+def etag_for(version: int, path: str, query_string: str) -> str:
+    query = urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+    digest = hashlib.blake2b(f"{path}?{query}".encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def if_none_match(header: str, etag: str) -> Optional[str]:
+    """
+    Weak comparison (RFC 9110) that ignores the content-encoding suffix.
+    Returns the matching tag as the client holds it, for the 304. "*" is
+    left to the route: only it knows whether the resource exists.
+    """
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        base = tag
+        for suffix in ENCODING_SUFFIXES:
+            if tag.endswith(suffix + '"'):
+                base = tag[:-len(suffix) - 1] + '"'
+                break
+        if base == etag:
+            return tag
+    return None
+
+
+class CatalogETagMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not scope["path"].startswith(CATALOG_PATHS):
+            return await self.app(scope, receive, send)
+        if not is_shared():
+            # A per-worker version would miss writes made by other workers and scripts
+            return await self.app(scope, receive, send)
+        try:
+            # A refresh is a store round trip: do it in the threadpool, off the event loop
+            version = _version if _version is not None and time.monotonic() < _next_check else None
+            if version is None:
+                version = await run_in_threadpool(current_version)
+        except Exception:
+            # Without a version there is nothing safe to compare against
+            logger.exception("Could not read the catalog version")
+            return await self.app(scope, receive, send)
+
+        etag = etag_for(version, scope["path"], scope.get("query_string", b"").decode("latin-1"))
+        for key, value in scope["headers"]:
+            if key == b"if-none-match":
+                matched = if_none_match(value.decode("latin-1"), etag)
+                if matched:
+                    await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", matched.encode())]})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+                break
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = [(key, value) for key, value in message.get("headers", []) if key.lower() != b"etag"]
+                headers.append((b"etag", etag.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,192 @@
+"""
+CDN caching for the public catalog
+
+CDNCacheMiddleware adds Cache-Control to catalog GETs according to the
+per-route POLICIES below: a short browser max-age, a longer shared (CDN)
+s-maxage, stale-while-revalidate so the CDN can refresh in the background,
+and stale-if-error to ride out origin outages. 304s from the catalog ETag
+check get the same header.
+
+Routes tag their responses with surrogate keys via tag(request, keys)
+(product-<id>, category-<id>, product-list, categories); the middleware
+sends them as a Surrogate-Key header so the CDN can purge by key. Product and
+category writes call purge() with the keys they invalidate.
+
+Purging goes through a pluggable purger, selected with CDN_PURGE_URL:
+    CDN_PURGE_URL=                                  -> log the keys (default)
+    CDN_PURGE_URL=https://cdn.example.com/purge     -> POST the keys there
+Any object with a purge(keys) method can be installed with set_purger().
+HTTP purges are sent from a background thread and never fail the write.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CDN_CACHE_ENABLED = os.getenv("CDN_CACHE_ENABLED", "true").lower() == "true"
+CDN_PURGE_URL = os.getenv("CDN_PURGE_URL", "")
+CDN_PURGE_TOKEN = os.getenv("CDN_PURGE_TOKEN", "")
+CDN_PURGE_TIMEOUT_SECONDS = float(os.getenv("CDN_PURGE_TIMEOUT_SECONDS", "5"))
+
+PRODUCT_LIST_KEY = "product-list"
+CATEGORIES_KEY = "categories"
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    path: str  # regular expression matched against the full path
+    max_age: int  # browsers
+    s_maxage: int  # shared caches (CDN); purged on writes, so it can be long
+    stale_while_revalidate: int = 0
+    stale_if_error: int = 0
+
+    def header(self) -> str:
+        parts = [f"public, max-age={self.max_age}", f"s-maxage={self.s_maxage}"]
+        if self.stale_while_revalidate:
+            parts.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        if self.stale_if_error:
+            parts.append(f"stale-if-error={self.stale_if_error}")
+        return ", ".join(parts)
+
+
+POLICIES = (
+    CachePolicy(r"/api/v1/products/?", 60, 300, stale_while_revalidate=600, stale_if_error=86400),
+    CachePolicy(r"/api/v1/products/[^/]+", 60, 3600, stale_while_revalidate=600, stale_if_error=86400),
+    CachePolicy(r"/api/v1/categories/?", 300, 3600, stale_while_revalidate=3600, stale_if_error=86400),
+)
+_COMPILED = tuple((re.compile(policy.path), policy.header()) for policy in POLICIES)
+
+
+def policy_header(path: str) -> Optional[str]:
+    for pattern, header in _COMPILED:
+        if pattern.fullmatch(path):
+            return header
+    return None
+
+
+# Surrogate keys
+
+def product_key(product_id) -> str:
+    return f"product-{product_id}"
+
+
+def category_key(category_id) -> str:
+    return f"category-{category_id}"
+
+
+def product_keys(products) -> List[str]:
+    """Keys for a response showing these products"""
+    keys = {product_key(product.id) for product in products}
+    keys.update(category_key(product.category_id) for product in products if product.category_id)
+    return sorted(keys)
+
+
+def tag(request, keys: Iterable[str]) -> None:
+    """Attach surrogate keys to the response for this request"""
+    request.state.surrogate_keys = list(keys)
+
+
+# Purging
+
+class LoggingPurger:
+    """Stand-in for local development: records what would be purged"""
+
+    def purge(self, keys: List[str]) -> None:
+        logger.info("CDN purge: %s", " ".join(keys))
+
+
+class HttpPurger:
+    """POSTs the keys to a purge endpoint (JSON body plus a Surrogate-Key header)"""
+
+    def __init__(self, url: str, token: str = CDN_PURGE_TOKEN, timeout: float = CDN_PURGE_TIMEOUT_SECONDS):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cdn-purge")
+
+    def purge(self, keys: List[str]) -> None:
+        self._executor.submit(self._send, keys)
+
+    def _send(self, keys: List[str]) -> None:
+        headers = {"Content-Type": "application/json", "Surrogate-Key": " ".join(keys)}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(
+            self.url, data=json.dumps({"surrogate_keys": keys}).encode(), headers=headers, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            logger.info("CDN purge sent: %s", " ".join(keys))
+        except Exception:
+            # Entries expire on their own (s-maxage); the next write purges again
+            logger.exception("CDN purge failed for %s", " ".join(keys))
+
+
+def create_purger(url: str = CDN_PURGE_URL):
+    if url.startswith(("http://", "https://")):
+        return HttpPurger(url)
+    return LoggingPurger()
+
+
+_purger = None
+_purger_lock = threading.Lock()
+
+
+def get_purger():
+    global _purger
+    if _purger is None:
+        with _purger_lock:
+            if _purger is None:
+                _purger = create_purger()
+    return _purger
+
+
+def set_purger(purger) -> None:
+    global _purger
+    _purger = purger
+
+
+def purge(keys: Iterable[str]) -> None:
+    """Purge cached catalog responses; call after the write has committed"""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    try:
+        get_purger().purge(keys)
+    except Exception:
+        logger.exception("CDN purge failed for %s", " ".join(keys))
+
+
+class CDNCacheMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        cache_control = policy_header(scope["path"])
+        if cache_control is None:
+            return await self.app(scope, receive, send)
+        # Routes write their keys into the request state (same dict)
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] in (200, 304):
+                headers = list(message.get("headers", []))
+                if not any(key.lower() == b"cache-control" for key, _ in headers):
+                    headers.append((b"cache-control", cache_control.encode()))
+                keys = state.get("surrogate_keys")
+                if keys and message["status"] == 200:
+                    headers.append((b"surrogate-key", " ".join(keys).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,198 @@
+"""
+Response compression
+
+An ASGI middleware that compresses responses with brotli or gzip, whichever
+the client prefers via Accept-Encoding (brotli only when the brotli package
+is installed). Bodies under COMPRESSION_MIN_SIZE bytes, non-text content
+types and responses that are already encoded are passed through untouched
+and never buffered.
+
+Catalog responses (GET under COMPRESSION_CACHE_PATHS) repeat byte for byte
+between requests, so their compressed bodies are kept in an in-process LRU
+keyed by a digest of the raw body and the encoding. A repeated hit costs one
+hash instead of a recompression; any change to the data changes the digest,
+so entries never go stale.
+
+Strong ETags on compressed responses get an -br/-gzip suffix, since each
+encoding is a different representation. Every response that could have been
+compressed carries Vary: Accept-Encoding, including uncompressed ones and
+304s, so shared caches never hand one encoding to a client that asked for
+another. HEAD responses are passed through with their upstream length.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+COMPRESSION_CACHE_PATHS = tuple(
+    path.strip() for path in os.getenv("COMPRESSION_CACHE_PATHS", "/api/v1/products,/api/v1/categories").split(",")
+    if path.strip()
+)
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "text/", "application/javascript", "application/xml", "image/svg+xml",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = offered.get(encoding, offered.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (raw body digest, encoding), bounded in bytes"""
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, body: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                return compressed
+        compressed = compress(body, encoding)
+        if len(compressed) <= self.max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = compressed
+                    self.size += len(compressed)
+                    while self.size > self.max_bytes:
+                        _, evicted = self._entries.popitem(last=False)
+                        self.size -= len(evicted)
+        return compressed
+
+
+def _header(headers, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _varies(headers, status: int) -> bool:
+    """Whether the response is one this middleware compresses for clients that accept it"""
+    if status == 304:
+        return True
+    content_type = _header(headers, b"content-type") or ""
+    return _header(headers, b"content-encoding") is None and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _add_vary(headers) -> list:
+    vary = _header(headers, b"vary")
+    if vary and "accept-encoding" in vary.lower():
+        return list(headers)
+    headers = [(key, value) for key, value in headers if key.lower() != b"vary"]
+    headers.append((b"vary", (vary + ", Accept-Encoding" if vary else "Accept-Encoding").encode()))
+    return headers
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, cache: Optional[CompressedBodyCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache or CompressedBodyCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(_header(scope["headers"], b"accept-encoding") or "")
+        if encoding is None or scope["method"] == "HEAD":
+            # Sent as is (a HEAD body is empty, so its length must stay the upstream one)
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start" and _varies(message.get("headers", []), message["status"]):
+                    message = {**message, "headers": _add_vary(message.get("headers", []))}
+                await send(message)
+
+            return await self.app(scope, receive, send_with_vary)
+        cacheable = scope["method"] == "GET" and scope["path"].startswith(COMPRESSION_CACHE_PATHS)
+
+        start_message = None
+        chunks = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = _header(headers, b"content-type") or ""
+                length = _header(headers, b"content-length")
+                if (
+                    _header(headers, b"content-encoding") is not None
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (length is not None and int(length) < self.minimum_size)
+                ):
+                    passthrough = True
+                    if _varies(headers, message["status"]):
+                        message = {**message, "headers": _add_vary(headers)}
+                    return await send(message)
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            body = b"".join(chunks)
+            headers = [(key, value) for key, value in start_message.get("headers", []) if key.lower() != b"content-length"]
+            if len(body) >= self.minimum_size:
+                if cacheable and start_message["status"] == 200:
+                    body = self.cache.get_or_compress(body, encoding)
+                else:
+                    body = compress(body, encoding)
+                headers.append((b"content-encoding", encoding.encode()))
+                # Each encoding is its own representation and needs its own strong ETag
+                etag = _header(headers, b"etag")
+                if etag and etag.endswith('"') and not etag.startswith("W/"):
+                    headers = [(key, value) for key, value in headers if key.lower() != b"etag"]
+                    headers.append((b"etag", f'{etag[:-1]}-{encoding}"'.encode()))
+            headers = _add_vary(headers)
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -94,11 +94,48 @@ COUPONS = {
     # }
 }
 
+# ------------------------------------------
+# 5. PROMOTIONS (Buy X, Get Y Free)
+# ------------------------------------------
+# Format for each promotion:
+# {
+#     "code": unique name,
+#     "qualifying_category_ids": categories whose items count towards the offer,
+#     "qualifying_product_ids": individual products that count towards the offer,
+#     "min_qualifying": how many qualifying items are needed,
+#     "count_by": "lines" (distinct items in cart) or "quantity" (total units),
+#     "reward_category_ids": categories the free item can be picked from,
+#     "reward_product_ids": individual products that can be given free,
+#     "reward_quantity": units of the free item,
+#     "repeat": True to give one reward per min_qualifying items (e.g. buy 6 get 2),
+#     "auto_apply": True to add reward_product_ids automatically,
+#     "active": True/False
+# }
+
+PROMOTIONS = [
+    {
+        "code": "PREMIX_FREE_SAMPLE",
+        "description": "Buy 3 Instant Premixes to get 1 free",
+        "qualifying_category_ids": [1],  # 1 is Instant Premixes
+        "qualifying_product_ids": [],
+        "min_qualifying": 3,
+        "count_by": "lines",
+        "reward_category_ids": [1],  # Customer picks any Instant Premix
+        "reward_product_ids": [],
+        "reward_quantity": 1,
+        "repeat": False,
+        "auto_apply": False,
+        "active": True
+    }
+]
+
 # ==========================================
 # NOTES FOR MODIFICATION:
 # ==========================================
 # 1. Shipping Tiers: Add/remove tiers as needed. Keep them in ascending order.
 # 2. Coupons: Add new coupons by copying an existing one and modifying values.
-# 3. Set "active": False to temporarily disable a coupon without deleting it.
-# 4. After modifying this file, restart the server for changes to take effect.
+# 3. Set "active": False to temporarily disable a coupon or promotion without deleting it.
+# 4. Changes are picked up automatically by running servers within a few
+#    seconds (PRICING_RELOAD_INTERVAL). If the edited file has an error, the
+#    previous rules stay in effect and the error is logged.
 # ==========================================
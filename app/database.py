@@ -6,13 +6,36 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Imported after load_dotenv so the pool settings can come from .env
+from .db_pool import engine_options, instrument
+from .query_stats import instrument_engine
+from .services.kv_store import get_store
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 if SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
     SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+_engine_options = engine_options(SQLALCHEMY_DATABASE_URL)
+engine = instrument(create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options), _engine_options)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional read replica for read-only endpoints; falls back to the primary
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "")
+if READ_DATABASE_URL.startswith("postgres://"):
+    READ_DATABASE_URL = READ_DATABASE_URL.replace("postgres://", "postgresql://", 1)
+# How long a user's reads stay on the primary after they write (covers replica lag)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "30"))
+
+if READ_DATABASE_URL:
+    _read_engine_options = engine_options(READ_DATABASE_URL)
+    read_engine = instrument(create_engine(READ_DATABASE_URL, **_read_engine_options), _read_engine_options)
+    instrument_engine(read_engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+else:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
+
 Base = declarative_base()
 
 def get_db():
@@ -21,3 +44,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Session on the read replica (or the primary when none is configured); never write through it"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def mark_recent_write(user_id: int):
+    """
+    Keep this user's reads on the primary until the replica has caught up.
+    The marker is only seen by every worker when KV_STORE_URL is set.
+    """
+    if READ_DATABASE_URL and user_id is not None:
+        get_store().set(f"db:recent-write:{user_id}", "1", ttl=READ_YOUR_WRITES_SECONDS)
+
+def read_sessionmaker_for(user_id: int):
+    """Replica sessions, except for a user who wrote recently (read-your-writes)"""
+    if not READ_DATABASE_URL:
+        return SessionLocal
+    if user_id is not None and get_store().get(f"db:recent-write:{user_id}") is not None:
+        return SessionLocal
+    return ReadSessionLocal
@@ -0,0 +1,163 @@
+"""
+Connection pool configuration and telemetry
+
+Pool settings come from the environment so they can be sized against the
+number of gunicorn workers (each worker has its own pool; the total must fit
+under Postgres max_connections or the PgBouncer pool):
+
+    DB_POOL_SIZE=5            persistent connections per worker
+    DB_MAX_OVERFLOW=10        extra connections opened under load
+    DB_POOL_TIMEOUT=30        seconds to wait for a free connection
+    DB_POOL_RECYCLE=1800      reconnect connections older than this (seconds)
+    DB_POOL_PRE_PING=true     test connections on checkout (drops stale ones)
+    DB_PGBOUNCER=false        behind PgBouncer in transaction mode: no
+                              app-side pool (NullPool) and no server-side
+                              prepared statements
+
+Checkout waits are timed in the pool itself; pool_stats() returns the
+current occupancy plus a cumulative wait-time histogram and timeout count.
+Each engine (primary, read replica) keeps its own histogram.
+"""
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class PoolWaitStats:
+    """Cumulative checkout wait histogram of one engine's pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = [0] * len(WAIT_BUCKETS)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.timeouts = 0
+        self.connects = 0
+
+    def observe(self, seconds: float):
+        index = bisect_left(WAIT_BUCKETS, seconds)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.total_seconds += seconds
+
+    def timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def connected(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = list(self.buckets)
+            count, total, timeouts, connects = self.count, self.total_seconds, self.timeouts, self.connects
+        cumulative, running = [], 0
+        for bound, hits in zip(WAIT_BUCKETS, buckets):
+            running += hits
+            cumulative.append(("+Inf" if bound == float("inf") else bound, running))
+        return {
+            "checkouts": count,
+            "wait_seconds_total": round(total, 6),
+            "wait_histogram": cumulative,  # (le, cumulative count), Prometheus style
+            "timeouts": timeouts,
+            "connections_opened": connects,
+        }
+
+
+# engine -> (PoolWaitStats, the engine_options it was created with)
+_telemetry = weakref.WeakKeyDictionary()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    wait_stats = None  # set by instrument()
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; keep counting into the same histogram
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.wait_stats:
+                self.wait_stats.timeout()
+            raise
+        if self.wait_stats:
+            self.wait_stats.observe(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine based on the env settings"""
+    if not url or url.startswith("sqlite"):
+        # SQLite picks its own pool; sizing options don't apply
+        return {}
+    options = {
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    if DB_PGBOUNCER:
+        # PgBouncer owns the pooling; an app-side pool would pin server
+        # connections. psycopg 3 prepares statements server-side after a few
+        # executions, which breaks under transaction pooling, so turn that off
+        # (psycopg2 never uses server-side prepared statements).
+        options["poolclass"] = NullPool
+        if url.startswith("postgresql+psycopg:"):
+            options["connect_args"] = {"prepare_threshold": None}
+    else:
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def instrument(engine, options: dict):
+    """Give the engine its own wait stats; options are the engine_options() it was created with"""
+    stats = PoolWaitStats()
+    _telemetry[engine] = (stats, options)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.wait_stats = stats
+    event.listen(engine, "connect", lambda dbapi_connection, record: stats.connected())
+    return engine
+
+
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    wait_stats, options = _telemetry.get(engine) or (PoolWaitStats(), {})
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=options.get("max_overflow"),  # None when the dialect picked the pool
+        )
+    stats.update(wait_stats.snapshot())
+    return stats
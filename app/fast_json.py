@@ -0,0 +1,42 @@
+"""
+Fast JSON responses for read-heavy endpoints
+
+By default FastAPI validates a route's return value against its
+response_model, dumps the model back to Python objects and then encodes them
+with the stdlib json module. Routes that opt in with typed_response() instead
+validate the payload once through a prebuilt TypeAdapter (reading ORM
+attributes directly) and let pydantic-core write the JSON bytes in one pass.
+Payloads that are already instances of the response model are serialized
+without any validation.
+
+The response_model on the route is kept for the OpenAPI schema; returning a
+Response bypasses FastAPI's own validation. Set FAST_JSON_RESPONSES=false to
+fall back to the standard path.
+"""
+import os
+from functools import lru_cache
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() == "true"
+
+
+@lru_cache(maxsize=None)
+def get_adapter(model_type) -> TypeAdapter:
+    """One TypeAdapter per response type, built on first use"""
+    return TypeAdapter(model_type)
+
+
+def dump_json(model_type, payload) -> bytes:
+    adapter = get_adapter(model_type)
+    if not (isinstance(model_type, type) and isinstance(payload, model_type)):
+        payload = adapter.validate_python(payload, from_attributes=True)
+    return adapter.dump_json(payload)
+
+
+def typed_response(model_type, payload, status_code: int = 200):
+    """Serialize payload as model_type straight to a JSON response"""
+    if not FAST_JSON_RESPONSES:
+        return payload
+    return Response(content=dump_json(model_type, payload), status_code=status_code, media_type="application/json")
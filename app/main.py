@@ -1,12 +1,29 @@
-from fastapi import FastAPI
-from .database import engine, Base
-from .routers import auth, dashboard, products, orders, categories, offers, reports, users, cart, wholesale
+from fastapi import FastAPI, HTTPException, Request, Response
+from . import offer_index, sessions
+from .database import engine, read_engine, READ_DATABASE_URL, READ_YOUR_WRITES_SECONDS
+from .db_pool import pool_stats
+from .services.kv_store import is_shared
+from .routers import auth, dashboard, products, orders, categories, offers, reports, users, cart, wholesale, profiling
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from .rate_limit import RateLimitMiddleware, RATE_LIMIT_ENABLED, RATE_LIMIT_TRUSTED_PROXY_HOPS
+from .compression import CompressionMiddleware, COMPRESSION_ENABLED
+from .catalog_version import CatalogETagMiddleware, CATALOG_ETAGS_ENABLED
+from .cdn import CDNCacheMiddleware, CDN_CACHE_ENABLED
+from . import metrics
+from .query_stats import QueryStatsMiddleware
+from .profiler import ProfilingMiddleware, PROFILING_ENABLED
+from .logging_config import RequestIdMiddleware, configure_logging
+import logging
 import os
+import secrets
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations (python migrate.py), applied at deploy
+# time rather than by every worker on import. DB_AUTO_MIGRATE=true applies
+# pending migrations at startup instead, which is handy for local development.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "false").lower() == "true"
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="TruMix E-Commerce API",
@@ -32,6 +49,22 @@ origins = [
     "https://trumix.co.in/"
 ]
 
+# Rate limiting sits inside CORS so 429 responses stay readable by the browser
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
+# Catalog ETags/304s, inside compression so encoded bodies get their own tags
+if CATALOG_ETAGS_ENABLED:
+    app.add_middleware(CatalogETagMiddleware)
+
+# gzip/brotli for large JSON bodies; catalog bodies are compressed once and reused
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Cache-Control/Surrogate-Key for the CDN, outside the ETag check so 304s carry them too
+if CDN_CACHE_ENABLED:
+    app.add_middleware(CDNCacheMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -40,6 +73,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Admin-armed sampling profiler; not installed at all unless enabled
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Query count/DB time per request (Server-Timing outside production)
+app.add_middleware(QueryStatsMiddleware)
+
+# Latency covers every other middleware
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Outermost, so every log line of the request carries its id
+app.add_middleware(RequestIdMiddleware)
+
 # Include Routers
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -51,6 +98,62 @@ app.include_router(offers.router)
 app.include_router(reports.router)
 app.include_router(cart.router)
 app.include_router(wholesale.router)
+app.include_router(profiling.router)
+
+@app.on_event("startup")
+def setup_logging():
+    # Here rather than at import so importing the app has no side effects
+    configure_logging()
+
+@app.on_event("startup")
+def apply_migrations():
+    if DB_AUTO_MIGRATE:
+        from . import migrations
+        migrations.upgrade()
+
+@app.on_event("startup")
+def load_session_revocations():
+    try:
+        sessions.load_revocations()
+    except Exception:
+        # Don't keep the worker from starting; the set is loaded on first use
+        logger.exception("Could not preload revoked sessions")
+    if not is_shared():
+        logger.warning(
+            "KV_STORE_URL is not set: with several workers, a logout reaches the other workers only "
+            "after SESSION_REVOCATION_RELOAD_INTERVAL (%ss)", sessions.SESSION_REVOCATION_RELOAD_INTERVAL
+        )
+
+@app.on_event("startup")
+def check_rate_limit_proxies():
+    if RATE_LIMIT_ENABLED and not RATE_LIMIT_TRUSTED_PROXY_HOPS:
+        logger.warning(
+            "RATE_LIMIT_TRUSTED_PROXY_HOPS is 0: behind a reverse proxy (the Azure front end) every client "
+            "shares the proxy's address and one per-IP rate limit bucket; set it to the number of proxies"
+        )
+
+@app.on_event("startup")
+def check_offer_index():
+    if not is_shared():
+        logger.warning(
+            "KV_STORE_URL is not set: with several workers, offer changes reach the other workers only "
+            "after OFFER_INDEX_RELOAD_INTERVAL (%ss)", offer_index.OFFER_INDEX_RELOAD_INTERVAL
+        )
+
+@app.on_event("startup")
+def check_catalog_etags():
+    if CATALOG_ETAGS_ENABLED and not is_shared():
+        logger.warning("CATALOG_ETAGS_ENABLED needs a shared KV_STORE_URL; catalog ETags are not served")
+
+@app.on_event("startup")
+def check_read_replica():
+    # The read-your-writes markers live in the KV store; the in-process store
+    # only pins reads on the worker that handled the write
+    if READ_DATABASE_URL and not is_shared():
+        logger.warning(
+            "READ_DATABASE_URL is set but KV_STORE_URL is not: with several workers, a user's reads "
+            "may hit the replica within READ_YOUR_WRITES_SECONDS (%ss) of their own write", READ_YOUR_WRITES_SECONDS
+        )
 
 @app.get("/")
 def read_root():
@@ -59,3 +162,25 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/pool")
+def pool_health():
+    """Connection pool occupancy and checkout wait times for this worker"""
+    stats = {"pid": os.getpid(), **pool_stats(engine)}
+    if read_engine is not engine:
+        stats["replica"] = pool_stats(read_engine)
+    return stats
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    """Prometheus scrape endpoint for this worker"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if metrics.METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {metrics.METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    engines = {"primary": engine}
+    if read_engine is not engine:
+        engines["replica"] = read_engine
+    return Response(metrics.render(engines), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,270 @@
+"""
+Prometheus metrics
+
+GET /metrics serves the text exposition format. Recorded per worker process
+(each gunicorn worker keeps its own numbers; scrape through the service
+discovery of your choice or sum across workers in queries):
+
+- http_requests_total{method,route,status} and
+  http_request_duration_seconds{method,route}, labelled by the route
+  template (/api/v1/products/{id_or_slug}) so ids don't explode the label set
+- http_requests_in_flight
+- db_queries_total, db_query_duration_seconds, plus per-request
+  http_request_db_queries / http_request_db_seconds (fed by app.query_stats)
+- db_pool_* from the connection pool telemetry (read replica included)
+- email_sent_total{result}, email_smtp_duration_seconds
+- azure_uploads_total{result}, azure_upload_duration_seconds
+- log_records_dropped_total, records the non-blocking log queue had no room for
+
+Recording is lock-free: every thread writes into its own shard (a plain dict
+only that thread touches) and a scrape sums the shards. An observation is a
+dict lookup and a couple of additions, a few microseconds at most.
+"""
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Optional bearer token required to scrape /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, float("inf"))
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, float("inf"))
+EXTERNAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+
+# Per-thread shards
+
+_local = threading.local()
+_shards: List[dict] = []
+_shards_lock = threading.Lock()  # taken once per thread, when its shard is created
+
+
+def _shard() -> dict:
+    try:
+        return _local.values
+    except AttributeError:
+        values = {}
+        with _shards_lock:
+            _shards.append(values)
+        _local.values = values
+        return values
+
+
+def _snapshot() -> Dict[tuple, list]:
+    """Sum of all shards: (metric, labels) -> [values...]"""
+    with _shards_lock:
+        shards = list(_shards)
+    totals = {}
+    for shard in shards:
+        for key, values in list(shard.items()):
+            total = totals.get(key)
+            if total is None:
+                totals[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    total[i] += value
+    return totals
+
+
+@dataclass(frozen=True)
+class Metric:
+    name: str
+    kind: str  # "counter", "gauge" or "histogram"
+    help: str
+    buckets: Tuple[float, ...] = ()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        shard = _shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            shard[key] = [amount]
+        else:
+            values[0] += amount
+
+    def dec(self, labels: tuple = ()) -> None:
+        self.inc(labels, -1)
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        shard = _shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            # per-bucket counts, then sum, then count
+            values = shard[key] = [0] * (len(self.buckets) + 2)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+
+_metrics: Dict[str, Metric] = {}
+_label_names: Dict[str, Tuple[str, ...]] = {}
+
+
+def _register(name: str, kind: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = ()) -> Metric:
+    metric = _metrics[name] = Metric(name, kind, help, buckets)
+    _label_names[name] = labels
+    return metric
+
+
+http_requests = _register("http_requests_total", "counter", "HTTP requests", ("method", "route", "status"))
+http_duration = _register("http_request_duration_seconds", "histogram", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS)
+http_in_flight = _register("http_requests_in_flight", "gauge", "HTTP requests being served")
+request_db_queries = _register("http_request_db_queries", "histogram", "DB queries per HTTP request", ("route",), COUNT_BUCKETS)
+request_db_seconds = _register("http_request_db_seconds", "histogram", "DB time per HTTP request", ("route",), LATENCY_BUCKETS)
+db_queries = _register("db_queries_total", "counter", "SQL statements executed")
+db_query_duration = _register("db_query_duration_seconds", "histogram", "SQL statement latency", (), QUERY_BUCKETS)
+email_sent = _register("email_sent_total", "counter", "Emails by result", ("result",))
+email_smtp_duration = _register("email_smtp_duration_seconds", "histogram", "SMTP send latency", (), EXTERNAL_BUCKETS)
+azure_uploads = _register("azure_uploads_total", "counter", "Azure Blob uploads by result", ("result",))
+azure_upload_duration = _register("azure_upload_duration_seconds", "histogram", "Azure Blob upload latency", (), EXTERNAL_BUCKETS)
+
+
+# Per-request DB accounting
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Set by MetricsMiddleware (or QueryStatsMiddleware when metrics are off) and
+# filled in by the statement hooks in app.query_stats. Sync endpoints run in
+# worker threads with a copy of the context, so they update the same object.
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("current_request", default=None)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            current_request.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't grow the series
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc((method, route, str(status)))
+            http_duration.observe(time.perf_counter() - started, (method, route))
+            request_db_queries.observe(stats.queries, (route,))
+            request_db_seconds.observe(stats.db_seconds, (route,))
+
+
+# Exposition
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    """Sample value: integers exactly (counters pass 1e6), other floats at full precision"""
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _pool_lines(engines: Dict[str, object]) -> List[str]:
+    from .db_pool import pool_stats
+
+    gauges = (
+        ("size", "db_pool_size", "Configured pool size"),
+        ("checked_out", "db_pool_checked_out", "Connections in use"),
+        ("checked_in", "db_pool_checked_in", "Idle connections"),
+        ("overflow", "db_pool_overflow", "Overflow connections open"),
+    )
+    lines = []
+    stats = {name: pool_stats(engine) for name, engine in engines.items()}
+    for field, metric, help in gauges:
+        lines += [f"# HELP {metric} {help}", f"# TYPE {metric} gauge"]
+        for name, values in stats.items():
+            if field in values:
+                lines.append(f'{metric}{{engine="{name}"}} {_number(values[field])}')
+    lines += ["# HELP db_pool_wait_seconds Time spent waiting for a pooled connection", "# TYPE db_pool_wait_seconds histogram"]
+    for name, values in stats.items():
+        for bound, count in values["wait_histogram"]:
+            lines.append(f'db_pool_wait_seconds_bucket{{engine="{name}",le="{bound}"}} {_number(count)}')
+        lines.append(f'db_pool_wait_seconds_sum{{engine="{name}"}} {_number(values["wait_seconds_total"])}')
+        lines.append(f'db_pool_wait_seconds_count{{engine="{name}"}} {_number(values["checkouts"])}')
+    counters = (
+        ("timeouts", "db_pool_timeouts_total", "Checkouts that timed out"),
+        ("connections_opened", "db_pool_connections_opened_total", "New DB connections"),
+    )
+    for field, metric, help in counters:
+        lines += [f"# HELP {metric} {help}", f"# TYPE {metric} counter"]
+        for name, values in stats.items():
+            lines.append(f'{metric}{{engine="{name}"}} {_number(values[field])}')
+    return lines
+
+
+def _logging_lines() -> List[str]:
+    from .logging_config import NonBlockingQueueHandler
+
+    return [
+        "# HELP log_records_dropped_total Log records dropped because the log queue was full",
+        "# TYPE log_records_dropped_total counter",
+        f"log_records_dropped_total {_number(NonBlockingQueueHandler.dropped)}",
+    ]
+
+
+def render(engines: Optional[Dict[str, object]] = None) -> str:
+    """Everything recorded in this process, in Prometheus text format"""
+    totals = _snapshot()
+    by_metric: Dict[str, list] = {}
+    for (name, labels), values in totals.items():
+        by_metric.setdefault(name, []).append((labels, values))
+
+    lines = []
+    for name, metric in _metrics.items():
+        names = _label_names[name]
+        lines += [f"# HELP {name} {metric.help}", f"# TYPE {name} {metric.kind}"]
+        for labels, values in sorted(by_metric.get(name, ())):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(values[0])}")
+                continue
+            running = 0
+            for bound, hits in zip(metric.buckets, values):
+                running += hits
+                le = 'le="%s"' % _bound(bound)
+                lines.append(f"{name}_bucket{_labels(names, labels, le)} {_number(running)}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(values[-2])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {_number(values[-1])}")
+    if engines:
+        lines += _pool_lines(engines)
+    lines += _logging_lines()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,136 @@
+"""
+Versioned schema migrations
+
+Each module in app/migrations/versions named vNNN_description.py is one
+migration: a docstring, an upgrade(conn) function and optionally
+TRANSACTIONAL = False for steps that can't run inside a transaction (such as
+CREATE INDEX CONCURRENTLY on Postgres). Applied versions are recorded in the
+schema_migrations table, so each one runs exactly once per database.
+
+Run pending migrations with:
+    python migrate.py          # apply everything pending
+    python migrate.py status   # list applied / pending versions
+
+Migrations should be idempotent (the helpers in app.migrations.ops check for
+existing columns and indexes), because v001 builds fresh databases straight
+from the models and later steps then find their changes already in place.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+
+from .. import database
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant key for pg_advisory_lock so two deploys don't migrate at once
+ADVISORY_LOCK_KEY = 720145
+
+_MODULE_NAME = re.compile(r"^v(\d+)_(\w+)$")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    description: str
+    upgrade: Callable
+    transactional: bool = True
+
+
+def discover() -> List[Migration]:
+    """All migrations in app/migrations/versions, ordered by version"""
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        match = _MODULE_NAME.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        migrations.append(Migration(
+            version=int(match.group(1)),
+            name=match.group(2),
+            description=module.__doc__.strip().splitlines()[0] if module.__doc__ else match.group(2),
+            upgrade=module.upgrade,
+            transactional=getattr(module, "TRANSACTIONAL", True)
+        ))
+    migrations.sort(key=lambda migration: migration.version)
+    seen = set()
+    for migration in migrations:
+        if migration.version in seen:
+            raise RuntimeError(f"Duplicate migration version {migration.version}")
+        seen.add(migration.version)
+    return migrations
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+        """))
+
+
+def applied_versions(engine=None) -> set:
+    engine = engine or database.engine
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def _record(conn, migration: Migration):
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+        {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+    )
+
+
+def _run(engine, migration: Migration):
+    if migration.transactional:
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            _record(conn, migration)
+    else:
+        # Each statement commits on its own; the version is recorded only
+        # after every step succeeded, and the steps are safe to re-run
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            migration.upgrade(conn)
+            _record(conn, migration)
+
+
+def upgrade(engine=None, target: Optional[int] = None) -> List[Migration]:
+    """Apply pending migrations up to target (default: all); returns the ones applied"""
+    engine = engine or database.engine
+    lock_conn = None
+    if engine.dialect.name == "postgresql":
+        lock_conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+    try:
+        done = applied_versions(engine)
+        applied = []
+        for migration in discover():
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+            logger.info("Applying migration %03d_%s", migration.version, migration.name)
+            _run(engine, migration)
+            applied.append(migration)
+        return applied
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            lock_conn.close()
+
+
+def status(engine=None) -> List[tuple]:
+    """(migration, applied) for every known migration"""
+    done = applied_versions(engine)
+    return [(migration, migration.version in done) for migration in discover()]
@@ -0,0 +1,74 @@
+"""
+Idempotent schema operations for migrations, portable between Postgres
+(production) and SQLite (local development).
+"""
+import logging
+from typing import Sequence
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+def is_postgres(conn) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    return any(col["name"] == column for col in inspect(conn).get_columns(table))
+
+
+def add_column(conn, table: str, column: str, definition: str) -> bool:
+    """ALTER TABLE ... ADD COLUMN unless it exists; returns True if added"""
+    if not has_table(conn, table) or has_column(conn, table, column):
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    logger.info("Added column %s.%s", table, column)
+    return True
+
+
+def create_index(
+    conn,
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    using: str = None,
+    concurrently: bool = True
+) -> None:
+    """
+    CREATE INDEX IF NOT EXISTS. On Postgres the index is built CONCURRENTLY
+    (no write lock on the table), which requires a migration with
+    TRANSACTIONAL = False. A concurrent build that failed earlier leaves an
+    INVALID index behind; it is dropped and rebuilt.
+    """
+    if not has_table(conn, table):
+        return
+    unique_sql = "UNIQUE " if unique else ""
+    columns_sql = ", ".join(columns)
+    if is_postgres(conn):
+        concurrently_sql = "CONCURRENTLY " if concurrently else ""
+        invalid = conn.execute(text("""
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND NOT i.indisvalid
+        """), {"name": name}).first()
+        if invalid:
+            logger.warning("Dropping invalid index %s left by an interrupted build", name)
+            conn.execute(text(f"DROP INDEX {concurrently_sql}IF EXISTS {name}"))
+        using_sql = f" USING {using}" if using else ""
+        conn.execute(text(
+            f"CREATE {unique_sql}INDEX {concurrently_sql}IF NOT EXISTS {name} ON {table}{using_sql} ({columns_sql})"
+        ))
+    else:
+        conn.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({columns_sql})"))
+
+
+def drop_index(conn, name: str, concurrently: bool = True) -> None:
+    if is_postgres(conn) and concurrently:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    else:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -0,0 +1 @@
+# Migration versions; see app/migrations/__init__.py
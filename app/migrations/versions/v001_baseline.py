@@ -0,0 +1,11 @@
+"""Create any missing tables from the models
+
+On a new database this builds the full current schema (including model
+indexes). On an existing one it only adds tables that don't exist yet.
+"""
+from ... import models  # noqa: F401  (registers every table on Base.metadata)
+from ...database import Base
+
+
+def upgrade(conn):
+    Base.metadata.create_all(bind=conn)
@@ -0,0 +1,51 @@
+"""Add columns introduced before migrations existed
+
+Replaces update_db_schema.py, fix_users_schema.py, fix_wholesale_schema.py,
+add_display_order.py, add_order_financial_fields.py and
+add_offer_usage_fields.py.
+"""
+from sqlalchemy import text
+
+from ..ops import add_column, has_table, is_postgres
+
+
+def upgrade(conn):
+    add_column(conn, "users", "phone", "VARCHAR")
+    add_column(conn, "users", "avatar_url", "VARCHAR")
+
+    add_column(conn, "products", "slug", "VARCHAR")
+    add_column(conn, "products", "sale_price", "FLOAT")
+    add_column(conn, "products", "images", "TEXT")
+    add_column(conn, "products", "rating", "FLOAT DEFAULT 0.0")
+    add_column(conn, "products", "review_count", "INTEGER DEFAULT 0")
+    add_column(conn, "products", "attributes", "TEXT")
+    add_column(conn, "products", "display_order", "INTEGER DEFAULT 0")
+
+    add_column(conn, "categories", "slug", "VARCHAR")
+    add_column(conn, "categories", "image_url", "VARCHAR")
+
+    add_column(conn, "orders", "user_id", "INTEGER REFERENCES users(id)")
+    if add_column(conn, "orders", "subtotal", "FLOAT DEFAULT 0.0"):
+        # For existing orders, total_amount is the closest thing to a subtotal
+        conn.execute(text("UPDATE orders SET subtotal = total_amount WHERE subtotal = 0.0"))
+    add_column(conn, "orders", "discount_amount", "FLOAT DEFAULT 0.0")
+    add_column(conn, "orders", "tax_amount", "FLOAT DEFAULT 0.0")
+    add_column(conn, "orders", "shipping_amount", "FLOAT DEFAULT 0.0")
+    add_column(conn, "orders", "cod_charges", "FLOAT DEFAULT 0.0")
+
+    add_column(conn, "offers", "per_user_limit", "INTEGER")
+
+    add_column(conn, "wholesale_inquiries", "business_type", "VARCHAR")
+    add_column(conn, "wholesale_inquiries", "gst_id", "VARCHAR")
+    add_column(conn, "wholesale_inquiries", "address", "TEXT")
+    add_column(conn, "wholesale_inquiries", "website", "VARCHAR")
+    if is_postgres(conn) and has_table(conn, "wholesale_inquiries"):
+        conn.execute(text("""
+            DO $$ BEGIN
+                CREATE TYPE wholesaleinquirystatus AS ENUM ('Pending', 'Approved', 'Rejected');
+            EXCEPTION WHEN duplicate_object THEN NULL;
+            END $$
+        """))
+        add_column(conn, "wholesale_inquiries", "status", "wholesaleinquirystatus DEFAULT 'Pending'")
+    else:
+        add_column(conn, "wholesale_inquiries", "status", "VARCHAR(8) DEFAULT 'Pending'")
@@ -0,0 +1,16 @@
+"""Add the 'user' value to the userrole enum
+
+Replaces update_enum.py. ALTER TYPE ... ADD VALUE can't run inside a
+transaction block on older Postgres versions, so this step runs in
+autocommit mode.
+"""
+from sqlalchemy import text
+
+from ..ops import is_postgres
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    if is_postgres(conn):
+        conn.execute(text("ALTER TYPE userrole ADD VALUE IF NOT EXISTS 'user'"))
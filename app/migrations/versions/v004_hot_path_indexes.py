@@ -0,0 +1,36 @@
+"""Index foreign keys and the columns our hot queries filter and sort on
+
+Built with CREATE INDEX CONCURRENTLY on Postgres so the tables stay
+writable while the indexes are created. The same indexes are declared on
+the models, so new databases get them from v001.
+"""
+from ..ops import create_index
+
+TRANSACTIONAL = False
+
+INDEXES = [
+    # Phone (OTP) login
+    ("ix_users_phone", "users", ["phone"]),
+    # Profile addresses, variant lookups by product
+    ("ix_addresses_user_id", "addresses", ["user_id"]),
+    ("ix_variants_product_id", "variants", ["product_id"]),
+    # Cart contents and the "is this product already in the cart" check
+    ("ix_cart_items_cart_product", "cart_items", ["cart_id", "product_id", "variant_id"]),
+    # Order detail / listing item loads
+    ("ix_order_items_order_id", "order_items", ["order_id"]),
+    # My orders (user_id = ? ORDER BY created_at DESC), admin lists filtered
+    # by status, and date-range reports
+    ("ix_orders_user_created", "orders", ["user_id", "created_at"]),
+    ("ix_orders_status_created", "orders", ["status", "created_at"]),
+    ("ix_orders_created_at", "orders", ["created_at"]),
+    # Catalog listings: default sort, optionally within a category
+    ("ix_products_display_order", "products", ["display_order", "id"]),
+    ("ix_products_category_display", "products", ["category_id", "display_order", "id"]),
+    # Admin inquiry list, newest first
+    ("ix_wholesale_inquiries_created_at", "wholesale_inquiries", ["created_at"]),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
@@ -0,0 +1,47 @@
+"""Store products.images and products.attributes as native JSON
+
+Postgres: TEXT -> JSONB. Values that aren't valid JSON become NULL, as the
+old response validators already treated them as empty. The type change
+rewrites the products table under an exclusive lock, which is brief for a
+catalog-sized table.
+
+SQLite: the columns keep their storage; invalid JSON is cleared so the JSON
+type can decode every row.
+"""
+from sqlalchemy import text
+
+from ..ops import has_table, is_postgres
+
+COLUMNS = ("images", "attributes")
+
+
+def _pg_column_type(conn, column):
+    return conn.execute(text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'products' AND column_name = :column
+    """), {"column": column}).scalar()
+
+
+def upgrade(conn):
+    if not has_table(conn, "products"):
+        return
+    if is_postgres(conn):
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION pg_temp.try_jsonb(value text) RETURNS jsonb AS $$
+            BEGIN
+                RETURN NULLIF(value, '')::jsonb;
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql IMMUTABLE
+        """))
+        for column in COLUMNS:
+            if _pg_column_type(conn, column) != "jsonb":
+                conn.execute(text(
+                    f"ALTER TABLE products ALTER COLUMN {column} TYPE JSONB USING pg_temp.try_jsonb({column})"
+                ))
+    else:
+        for column in COLUMNS:
+            conn.execute(text(
+                f"UPDATE products SET {column} = NULL WHERE {column} IS NOT NULL AND NOT json_valid({column})"
+            ))
@@ -0,0 +1,14 @@
+"""GIN index on products.attributes for attribute filtering
+
+jsonb_path_ops supports the containment operator (attributes @> '{...}')
+used by the product list's attr filter, with a smaller index than the
+default operator class. Postgres only.
+"""
+from ..ops import create_index, is_postgres
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    if is_postgres(conn):
+        create_index(conn, "ix_products_attributes", "products", ["attributes jsonb_path_ops"], using="GIN")
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Text, Enum
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Text, Enum, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 import enum
 
+# Native JSON: JSONB on Postgres (indexable with GIN), JSON text on SQLite
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 class UserRole(str, enum.Enum):
     admin = "admin"
     editor = "editor"
@@ -39,10 +43,8 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     role = Column(Enum(UserRole), default=UserRole.admin)
-    phone = Column(String, nullable=True)
+    phone = Column(String, nullable=True, index=True)
     avatar_url = Column(String, nullable=True)
-    otp = Column(String, nullable=True)
-    otp_expiry = Column(DateTime, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     addresses = relationship("Address", back_populates="user")
@@ -52,7 +54,7 @@ class Address(Base):
     __tablename__ = "addresses"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     street = Column(String, nullable=False)
     city = Column(String, nullable=False)
     state = Column(String, nullable=False)
@@ -83,10 +85,10 @@ class Product(Base):
     sale_price = Column(Float, nullable=True)
     stock = Column(Integer, default=0)
     image_url = Column(String, nullable=True) # Main image
-    images = Column(Text, nullable=True) # JSON string of list of images
+    images = Column(JSONType, nullable=True) # List of image URLs
     rating = Column(Float, default=0.0)
     review_count = Column(Integer, default=0)
-    attributes = Column(Text, nullable=True) # JSON string
+    attributes = Column(JSONType, nullable=True) # Free-form key/value attributes
     category_id = Column(Integer, ForeignKey("categories.id"))
     display_order = Column(Integer, default=0, nullable=True)
     
@@ -95,11 +97,22 @@ class Product(Base):
     order_items = relationship("OrderItem", back_populates="product")
     cart_items = relationship("CartItem", back_populates="product")
 
+    # Catalog listings sort by display_order, optionally within a category
+    __table_args__ = (
+        Index("ix_products_display_order", "display_order", "id"),
+        Index("ix_products_category_display", "category_id", "display_order", "id"),
+        # Attribute filters (attributes @> '{...}'); Postgres only, see migration v006
+        Index(
+            "ix_products_attributes", "attributes",
+            postgresql_using="gin", postgresql_ops={"attributes": "jsonb_path_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
 class Variant(Base):
     __tablename__ = "variants"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     name = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     stock = Column(Integer, default=0)
@@ -131,6 +144,11 @@ class CartItem(Base):
     product = relationship("Product", back_populates="cart_items")
     variant = relationship("Variant", back_populates="cart_items")
 
+    # Cart contents and the "already in cart" check on add
+    __table_args__ = (
+        Index("ix_cart_items_cart_product", "cart_id", "product_id", "variant_id"),
+    )
+
 class Order(Base):
     __tablename__ = "orders"
 
@@ -150,15 +168,21 @@ class Order(Base):
     total_amount = Column(Float, nullable=False)  # Final total
     
     status = Column(Enum(OrderStatus), default=OrderStatus.Pending)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
     items = relationship("OrderItem", back_populates="order")
 
+    # My orders (newest first) and admin lists filtered by status
+    __table_args__ = (
+        Index("ix_orders_user_created", "user_id", "created_at"),
+        Index("ix_orders_status_created", "status", "created_at"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     variant_id = Column(Integer, ForeignKey("variants.id"), nullable=True)
     quantity = Column(Integer, default=1)
@@ -178,9 +202,38 @@ class Offer(Base):
     min_order_value = Column(Float, default=0)
     valid_from = Column(DateTime, nullable=True)
     valid_until = Column(DateTime, nullable=True)
-    usage_limit = Column(Integer, nullable=True)
+    usage_limit = Column(Integer, nullable=True)  # Remaining redemptions, decremented at checkout
+    per_user_limit = Column(Integer, nullable=True)  # Max redemptions per user (or guest email)
     status = Column(Enum(OfferStatus), default=OfferStatus.Active)
 
+class OfferRedemption(Base):
+    __tablename__ = "offer_redemptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    offer_id = Column(Integer, ForeignKey("offers.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    customer_email = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Per-user limit checks count redemptions by (offer, user) or (offer, guest email)
+    __table_args__ = (
+        Index("ix_offer_redemptions_offer_user", "offer_id", "user_id"),
+        Index("ix_offer_redemptions_offer_email", "offer_id", "customer_email"),
+    )
+
+class UserSession(Base):
+    __tablename__ = "user_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    family_id = Column(String, nullable=False, index=True)  # Shared by every rotation of one login
+    token_hash = Column(String, unique=True, index=True, nullable=False)  # SHA-256 of the refresh token
+    expires_at = Column(DateTime, nullable=False)
+    rotated_at = Column(DateTime, nullable=True)  # Set when exchanged for a newer token
+    revoked_at = Column(DateTime, nullable=True, index=True)  # Set on logout or token reuse
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class WholesaleInquiry(Base):
     __tablename__ = "wholesale_inquiries"
 
@@ -196,7 +249,7 @@ class WholesaleInquiry(Base):
     message = Column(Text, nullable=False)
     estimated_volume = Column(String, nullable=True)
     status = Column(Enum(WholesaleInquiryStatus), default=WholesaleInquiryStatus.Pending)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
 class ContactSubmission(Base):
     __tablename__ = "contact_submissions"
@@ -0,0 +1,205 @@
+"""
+In-memory index of coupon codes
+
+Checkout and /offers/validate resolve coupon codes through this one lookup.
+The index is an immutable snapshot of the whole offers table merged with the
+coupons from config_rules.py (database offers win on a code clash), keyed by
+code with validity windows precomputed as timestamps.
+
+Because the snapshot holds every known code, a miss is authoritative: unknown
+codes (typos, brute-force attempts) are answered from memory and never reach
+Postgres.
+
+Freshness: create_offer calls invalidate(), which bumps a version counter in
+the KV store. Workers compare their snapshot against that counter at most
+every OFFER_INDEX_CHECK_INTERVAL seconds (immediately in the worker that made
+the change) and also rebuild after OFFER_INDEX_MAX_AGE seconds or when the
+pricing rules are reloaded. The version only reaches other workers through a
+shared KV_STORE_URL; with the in-process store each worker instead rebuilds
+every OFFER_INDEX_RELOAD_INTERVAL seconds.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from . import database, models
+from .pricing import get_rules
+from .services.kv_store import get_store, is_shared
+
+logger = logging.getLogger(__name__)
+
+OFFER_INDEX_CHECK_INTERVAL = float(os.getenv("OFFER_INDEX_CHECK_INTERVAL", "1"))
+OFFER_INDEX_MAX_AGE = float(os.getenv("OFFER_INDEX_MAX_AGE", "300"))
+# Max age without a shared store, where other workers' invalidate() is never seen
+OFFER_INDEX_RELOAD_INTERVAL = float(os.getenv("OFFER_INDEX_RELOAD_INTERVAL", "10"))
+VERSION_KEY = "offers:version"
+
+_TYPES = {
+    models.OfferType.Percentage: "percentage",
+    models.OfferType.Fixed: "fixed",
+    models.OfferType.Shipping: "shipping",
+}
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    # Offer windows are stored as naive UTC datetimes
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+@dataclass(frozen=True)
+class OfferEntry:
+    code: str
+    type: str  # "percentage", "fixed" or "shipping"
+    value: float
+    min_order_value: float = 0
+    enabled: bool = True
+    valid_from: Optional[float] = None  # POSIX timestamps
+    valid_until: Optional[float] = None
+    usage_limit: Optional[int] = None  # Snapshot only; checkout consumes it atomically in the DB
+    per_user_limit: Optional[int] = None
+    offer_id: Optional[int] = None  # None for config_rules coupons
+
+    @property
+    def free_shipping(self) -> bool:
+        return self.type == "shipping"
+
+    @property
+    def active(self) -> bool:
+        return self.unavailable_reason() is None
+
+    def unavailable_reason(self, now: Optional[float] = None) -> Optional[str]:
+        """Why the code can't be used right now, regardless of cart value"""
+        now = time.time() if now is None else now
+        if not self.enabled:
+            return "Coupon is not active"
+        if self.valid_from is not None and self.valid_from > now:
+            return "Coupon is not yet valid"
+        if self.valid_until is not None and self.valid_until < now:
+            return "Coupon has expired"
+        if self.usage_limit is not None and self.usage_limit <= 0:
+            return "Coupon usage limit reached"
+        return None
+
+    def check(self, cart_value: float, now: Optional[float] = None) -> Optional[str]:
+        reason = self.unavailable_reason(now)
+        if reason:
+            return reason
+        if cart_value < self.min_order_value:
+            return f"Minimum order value of {self.min_order_value} required"
+        return None
+
+    def discount_for(self, cart_value: float) -> float:
+        """Discount amount; raises ValueError if the code can't be applied"""
+        reason = self.check(cart_value)
+        if reason:
+            raise ValueError(f"{reason} ({self.code})")
+        if self.type == "percentage":
+            return round(cart_value * (self.value / 100), 2)
+        if self.type == "fixed":
+            return self.value
+        return 0.0  # Free shipping is applied to the shipping amount instead
+
+
+@dataclass(frozen=True)
+class OfferIndex:
+    entries: Dict[str, OfferEntry]
+    version: Optional[int]
+    rules_version: int
+    loaded_at: float
+
+
+def _load(version: Optional[int]) -> OfferIndex:
+    rules = get_rules()
+    entries = {
+        code: OfferEntry(
+            code=code,
+            type=coupon.type,
+            value=coupon.value,
+            min_order_value=coupon.min_order_value,
+            enabled=coupon.active
+        )
+        for code, coupon in rules.coupons.items()
+    }
+    db = database.SessionLocal()
+    try:
+        for offer in db.query(models.Offer).all():
+            entries[offer.code] = OfferEntry(
+                code=offer.code,
+                type=_TYPES[offer.type],
+                value=offer.value,
+                min_order_value=offer.min_order_value or 0,
+                enabled=offer.status == models.OfferStatus.Active,
+                valid_from=_timestamp(offer.valid_from),
+                valid_until=_timestamp(offer.valid_until),
+                usage_limit=offer.usage_limit,
+                per_user_limit=offer.per_user_limit,
+                offer_id=offer.id
+            )
+    finally:
+        db.close()
+    logger.info("Loaded offer index v%s with %d codes", version, len(entries))
+    return OfferIndex(entries=entries, version=version, rules_version=rules.version, loaded_at=time.monotonic())
+
+
+_index: Optional[OfferIndex] = None
+_next_check = 0.0
+_lock = threading.Lock()
+
+
+def _shared_version() -> Optional[int]:
+    value = get_store().get(VERSION_KEY)
+    return int(value) if value is not None else None
+
+
+def get_index() -> OfferIndex:
+    global _index, _next_check
+    index = _index
+    now = time.monotonic()
+    if index is not None and now < _next_check:
+        return index
+    with _lock:
+        index = _index
+        if index is not None and now < _next_check:
+            return index
+        version = _shared_version()
+        max_age = OFFER_INDEX_MAX_AGE if is_shared() else min(OFFER_INDEX_MAX_AGE, OFFER_INDEX_RELOAD_INTERVAL)
+        if (
+            index is None
+            or index.version != version
+            or index.rules_version != get_rules().version
+            or now - index.loaded_at >= max_age
+        ):
+            index = _index = _load(version)
+        _next_check = now + OFFER_INDEX_CHECK_INTERVAL
+        return index
+
+
+def lookup(code: Optional[str]) -> Optional[OfferEntry]:
+    """Resolve a coupon code; None means the code does not exist"""
+    if not code:
+        return None
+    return get_index().entries.get(code)
+
+
+def pin(entries: Dict[str, OfferEntry]) -> OfferIndex:
+    """Serve a fixed set of codes and never refresh from the database (benchmarks, tests)"""
+    global _index, _next_check
+    with _lock:
+        _index = OfferIndex(entries=dict(entries), version=None, rules_version=get_rules().version, loaded_at=time.monotonic())
+        _next_check = float("inf")
+        return _index
+
+
+def invalidate():
+    """Force every worker to rebuild its snapshot; call after offer writes"""
+    global _next_check
+    get_store().incr(VERSION_KEY)
+    _next_check = 0.0
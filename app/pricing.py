@@ -0,0 +1,182 @@
+"""
+Compiled pricing rules
+
+The human-readable settings in config_rules.py are compiled once into an
+immutable PricingRules object (sorted shipping tier boundaries searched with
+bisect, a read-only coupon table, promotions, tax and COD parameters).
+Request handlers only ever read the current object, so nothing is reparsed
+per request.
+
+When the rules file changes on disk it is recompiled and the new object is
+swapped in atomically, so edits take effect without restarting workers.
+"""
+import bisect
+import logging
+import os
+import runpy
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from .promotions import Promotion, compile_promotions
+
+logger = logging.getLogger(__name__)
+
+PRICING_RULES_PATH = os.getenv(
+    "PRICING_RULES_PATH",
+    os.path.join(os.path.dirname(__file__), "config_rules.py")
+)
+# How often (seconds) a worker checks the rules file for changes; 0 disables reloading
+PRICING_RELOAD_INTERVAL = float(os.getenv("PRICING_RELOAD_INTERVAL", "5"))
+
+
+@dataclass(frozen=True)
+class Coupon:
+    code: str
+    type: str  # "percentage" or "fixed"
+    value: float
+    min_order_value: float = 0
+    active: bool = True
+    description: str = ""
+
+    def discount_for(self, subtotal: float) -> float:
+        if not self.active:
+            raise ValueError(f"Coupon {self.code} is not active")
+        if subtotal < self.min_order_value:
+            raise ValueError(f"Minimum order value of ₹{self.min_order_value} required for {self.code}")
+        if self.type == "percentage":
+            return round(subtotal * (self.value / 100), 2)
+        return self.value
+
+
+@dataclass(frozen=True)
+class PricingRules:
+    tax_enabled: bool
+    tax_rate: float
+    shipping_enabled: bool
+    tier_mins: Tuple[float, ...]  # sorted ascending, searched with bisect
+    tier_maxes: Tuple[float, ...]  # float("inf") for the open-ended tier
+    tier_charges: Tuple[float, ...]
+    cod_enabled: bool
+    cod_fixed_charge: float
+    cod_max_order_value: float
+    cod_use_percentage: bool
+    cod_percentage: float
+    coupons: Mapping[str, Coupon] = field(default_factory=lambda: MappingProxyType({}))
+    promotions: Tuple[Promotion, ...] = ()
+    version: int = 0
+    # Raw settings the rules were compiled from, used to derive what-if variants
+    source: Mapping = field(default_factory=lambda: MappingProxyType({}), compare=False, repr=False)
+
+    def tax(self, subtotal: float) -> float:
+        if not self.tax_enabled:
+            return 0.0
+        return round(subtotal * (self.tax_rate / 100), 2)
+
+    def shipping(self, subtotal: float) -> float:
+        if not self.shipping_enabled:
+            return 0.0
+        index = bisect.bisect_right(self.tier_mins, subtotal) - 1
+        if index < 0 or subtotal >= self.tier_maxes[index]:
+            # Below the first tier or in a gap between tiers
+            return 0.0
+        return self.tier_charges[index]
+
+    def cod(self, subtotal: float, payment_method: str) -> float:
+        if payment_method.lower() != "cod" or not self.cod_enabled:
+            return 0.0
+        if subtotal > self.cod_max_order_value:
+            raise ValueError(f"COD not available for orders above ₹{self.cod_max_order_value}")
+        if self.cod_use_percentage:
+            return round(subtotal * (self.cod_percentage / 100), 2)
+        return self.cod_fixed_charge
+
+    def coupon(self, code: Optional[str]) -> Optional[Coupon]:
+        if not code:
+            return None
+        return self.coupons.get(code)
+
+
+def compile_rules(config: Mapping, version: int = 0) -> PricingRules:
+    """Build a PricingRules object from a config_rules-style namespace"""
+    tiers = sorted(config.get("SHIPPING_TIERS", []), key=lambda tier: tier["cart_min"])
+    coupons = {
+        code: Coupon(
+            code=code,
+            type=data["type"],
+            value=data["value"],
+            min_order_value=data.get("min_order_value", 0),
+            active=data.get("active", True),
+            description=data.get("description", "")
+        )
+        for code, data in config.get("COUPONS", {}).items()
+    }
+    return PricingRules(
+        tax_enabled=config.get("TAX_ENABLED", False),
+        tax_rate=config.get("TAX_RATE", 0),
+        shipping_enabled=config.get("SHIPPING_ENABLED", False),
+        tier_mins=tuple(tier["cart_min"] for tier in tiers),
+        tier_maxes=tuple(float("inf") if tier["cart_max"] is None else tier["cart_max"] for tier in tiers),
+        tier_charges=tuple(tier["shipping_charge"] for tier in tiers),
+        cod_enabled=config.get("COD_ENABLED", False),
+        cod_fixed_charge=config.get("COD_FIXED_CHARGE", 0),
+        cod_max_order_value=config.get("COD_MAX_ORDER_VALUE", float("inf")),
+        cod_use_percentage=config.get("COD_USE_PERCENTAGE", False),
+        cod_percentage=config.get("COD_PERCENTAGE", 0),
+        coupons=MappingProxyType(coupons),
+        promotions=compile_promotions(config.get("PROMOTIONS", [])),
+        version=version,
+        source=MappingProxyType({key: value for key, value in config.items() if key.isupper()})
+    )
+
+
+def with_overrides(rules: PricingRules, overrides: Mapping) -> PricingRules:
+    """Compile a variant of the given rules with some settings replaced (e.g. SHIPPING_TIERS)"""
+    return compile_rules({**rules.source, **overrides}, version=rules.version)
+
+
+_rules: Optional[PricingRules] = None
+_rules_mtime = None
+_next_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def _source_mtime():
+    try:
+        return os.stat(PRICING_RULES_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+
+def reload_rules(force: bool = False) -> PricingRules:
+    """Recompile the rules file if it changed (or always, with force=True)"""
+    global _rules, _rules_mtime
+    with _reload_lock:
+        mtime = _source_mtime()
+        if _rules is not None and not force and mtime == _rules_mtime:
+            return _rules
+        try:
+            config = runpy.run_path(PRICING_RULES_PATH)
+            rules = compile_rules(config, version=(_rules.version + 1) if _rules else 1)
+        except Exception:
+            if _rules is None:
+                raise
+            # Keep serving the last good rules if the edited file is broken
+            logger.exception("Failed to reload pricing rules from %s", PRICING_RULES_PATH)
+            _rules_mtime = mtime
+            return _rules
+        _rules, _rules_mtime = rules, mtime
+        logger.info("Loaded pricing rules v%s from %s", rules.version, PRICING_RULES_PATH)
+        return rules
+
+
+def get_rules() -> PricingRules:
+    """Current compiled rules; checks the source file at most every PRICING_RELOAD_INTERVAL seconds"""
+    global _next_check
+    now = time.monotonic()
+    if _rules is None or (PRICING_RELOAD_INTERVAL > 0 and now >= _next_check):
+        _next_check = now + PRICING_RELOAD_INTERVAL
+        return reload_rules()
+    return _rules
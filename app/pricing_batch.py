@@ -0,0 +1,171 @@
+"""
+Vectorized pricing for many carts at once
+
+Applies the compiled PricingRules to arrays of subtotals, payment methods and
+coupon codes with NumPy, for marketing simulations and historical replays.
+The arithmetic mirrors business_rules.calculate_order_totals; carts that the
+checkout would reject (inactive coupon, minimum order not met, COD above the
+limit) are flagged instead of raising.
+"""
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from .pricing import PricingRules, get_rules
+
+# Per-cart error codes
+OK = 0
+COUPON_INACTIVE = 1
+COUPON_MIN_ORDER = 2
+COD_UNAVAILABLE = 3
+
+ERROR_NAMES = {
+    COUPON_INACTIVE: "coupon_inactive",
+    COUPON_MIN_ORDER: "coupon_min_order",
+    COD_UNAVAILABLE: "cod_unavailable",
+}
+
+
+def _broadcast_labels(values, size: int):
+    """Map a list (or single value) of labels to (distinct labels, per-cart index)"""
+    if values is None or isinstance(values, str):
+        return [values], np.zeros(size, dtype=np.intp)
+    if len(values) != size:
+        raise ValueError(f"Expected {size} values, got {len(values)}")
+    # Hash-based factorization; much faster than sorting object arrays with np.unique
+    index = {}
+    assign = index.setdefault
+    inverse = np.fromiter((assign(value, len(index)) for value in values), dtype=np.intp, count=size)
+    return list(index), inverse
+
+
+def _round2(values):
+    """Round to 2 decimals exactly like Python's round(), which checkout uses"""
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    # np.rint works on the scaled float; near-halfway cases can land on the
+    # other side of round(x, 2), so settle those few with round() itself
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        index = np.flatnonzero(near_tie)
+        rounded[index] = [round(value, 2) for value in values[index].tolist()]
+    return rounded
+
+
+def quote_batch(
+    subtotals: Sequence[float],
+    payment_methods=None,
+    coupon_codes=None,
+    rules: Optional[PricingRules] = None,
+    coupon_lookup: Optional[Callable] = None
+) -> dict:
+    """
+    Price many carts in one pass.
+
+    Args:
+        subtotals: Cart subtotals
+        payment_methods: One method for all carts, or one per cart
+        coupon_codes: One code for all carts, or one per cart (None/"" for no coupon)
+        rules: Rules to apply; defaults to the live rules
+        coupon_lookup: Resolves a code to a coupon/offer; defaults to the
+            coupons compiled into rules (pass offer_index.lookup for live offers)
+
+    Returns:
+        dict of NumPy arrays: subtotal, discount_amount, tax_amount,
+        shipping_amount, cod_charges, total_amount, error (see ERROR_NAMES)
+    """
+    rules = rules or get_rules()
+    coupon_lookup = coupon_lookup or rules.coupon
+    subtotal = np.asarray(subtotals, dtype=np.float64)
+    size = subtotal.shape[0]
+    error = np.zeros(size, dtype=np.int8)
+
+    # Coupons: resolve each distinct code once, then gather per cart
+    codes, code_index = _broadcast_labels(coupon_codes, size)
+    is_percentage = np.zeros(len(codes), dtype=bool)
+    coupon_value = np.zeros(len(codes))
+    coupon_min = np.zeros(len(codes))
+    coupon_known = np.zeros(len(codes), dtype=bool)
+    coupon_active = np.ones(len(codes), dtype=bool)
+    coupon_free_shipping = np.zeros(len(codes), dtype=bool)
+    for i, code in enumerate(codes):
+        coupon = coupon_lookup(code)
+        if coupon:
+            coupon_known[i] = True
+            coupon_active[i] = coupon.active
+            coupon_free_shipping[i] = getattr(coupon, "free_shipping", False)
+            is_percentage[i] = coupon.type == "percentage"
+            coupon_value[i] = coupon.value
+            coupon_min[i] = coupon.min_order_value
+    known = coupon_known[code_index]
+    error[known & ~coupon_active[code_index]] = COUPON_INACTIVE
+    error[(error == OK) & known & (subtotal < coupon_min[code_index])] = COUPON_MIN_ORDER
+    applies = known & (error == OK)
+    value = coupon_value[code_index]
+    discount = np.where(
+        is_percentage[code_index],
+        _round2(subtotal * (value / 100)),
+        value
+    )
+    free_shipping = applies & coupon_free_shipping[code_index]
+    discount = np.where(applies & ~free_shipping, discount, 0.0)
+
+    # Tax on the discounted amount
+    after_discount = subtotal - discount
+    if rules.tax_enabled:
+        tax = _round2(after_discount * (rules.tax_rate / 100))
+    else:
+        tax = np.zeros(size)
+
+    # Shipping tiers: the same bisect as PricingRules.shipping, vectorized
+    if rules.shipping_enabled and rules.tier_mins:
+        mins = np.asarray(rules.tier_mins, dtype=np.float64)
+        maxes = np.asarray(rules.tier_maxes, dtype=np.float64)
+        charges = np.asarray(rules.tier_charges, dtype=np.float64)
+        tier = np.searchsorted(mins, subtotal, side="right") - 1
+        in_tier = tier >= 0
+        tier = np.clip(tier, 0, None)
+        in_tier &= subtotal < maxes[tier]
+        shipping = np.where(in_tier & ~free_shipping, charges[tier], 0.0)
+    else:
+        shipping = np.zeros(size)
+
+    # COD on the subtotal
+    methods, method_index = _broadcast_labels(payment_methods, size)
+    method_is_cod = np.array([str(method or "").lower() == "cod" for method in methods])
+    is_cod = method_is_cod[method_index] & rules.cod_enabled
+    over_limit = is_cod & (subtotal > rules.cod_max_order_value)
+    error[(error == OK) & over_limit] = COD_UNAVAILABLE
+    if rules.cod_use_percentage:
+        cod_charge = _round2(subtotal * (rules.cod_percentage / 100))
+    else:
+        cod_charge = np.full(size, float(rules.cod_fixed_charge))
+    cod = np.where(is_cod & ~over_limit, cod_charge, 0.0)
+
+    total = after_discount + tax + shipping + cod
+
+    return {
+        "subtotal": _round2(subtotal),
+        "discount_amount": _round2(discount),
+        "tax_amount": _round2(tax),
+        "shipping_amount": _round2(shipping),
+        "cod_charges": _round2(cod),
+        "total_amount": _round2(total),
+        "error": error,
+    }
+
+
+def summarize(quotes: dict) -> dict:
+    """Aggregate a quote_batch result over the carts the checkout would accept"""
+    error = quotes["error"]
+    valid = error == OK
+    counts = np.bincount(error, minlength=len(ERROR_NAMES) + 1)
+    return {
+        "carts": int(error.shape[0]),
+        "valid": int(valid.sum()),
+        "errors": {name: int(counts[code]) for code, name in ERROR_NAMES.items()},
+        "totals": {
+            key: round(float(quotes[key][valid].sum()), 2)
+            for key in ("subtotal", "discount_amount", "tax_amount", "shipping_amount", "cod_charges", "total_amount")
+        },
+    }
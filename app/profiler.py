@@ -0,0 +1,257 @@
+"""
+On-demand sampling profiler
+
+Off by default: unless PROFILING_ENABLED=true the middleware is not installed
+and the admin endpoints answer 404, so production pays nothing.
+
+When enabled, an admin arms a profiling session through
+POST /api/v1/admin/profiling with a method, a path and a request count. The
+next N matching requests (across all workers) are profiled, as is any
+request that carries the session's X-Profile-Token header. While a profiled
+request runs, a background thread snapshots every thread's stack every
+interval_ms (sys._current_frames, 5 ms by default) and keeps the
+stacks that pass through application code. Stacks are reported in the
+collapsed format ("frame;frame;frame count" per line) that flamegraph.pl,
+speedscope and inferno read directly.
+
+Sessions and results live in the KV store (shared across workers when it is
+Redis) for PROFILING_TTL seconds; each session is its own field of one hash,
+so concurrent arms and disarms never overwrite each other. Workers re-read
+the armed sessions at most every PROFILING_CHECK_INTERVAL seconds, and the
+middleware makes its store calls in the threadpool. The sampler sees the whole process,
+so requests served concurrently by the same worker show up in the profile
+too; profile on a quiet worker or read the per-request sample counts.
+"""
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .services.kv_store import get_store
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_TTL = int(os.getenv("PROFILING_TTL", "3600"))
+PROFILING_CHECK_INTERVAL = float(os.getenv("PROFILING_CHECK_INTERVAL", "1"))
+
+SESSIONS_KEY = "profiling:sessions:v2"  # hash: session id -> session JSON
+TOKEN_HEADER = b"x-profile-token"
+# Frames from these module prefixes make a stack worth keeping
+APP_MODULES = ("app.",)
+
+
+@dataclass(frozen=True)
+class ProfileSession:
+    id: str
+    method: str
+    path: str  # exact path, or a prefix ending in "*"
+    count: int
+    interval_ms: float
+    token: str
+    created_at: float
+
+    def matches(self, method: str, path: str) -> bool:
+        if method != self.method:
+            return False
+        if self.path.endswith("*"):
+            return path.startswith(self.path[:-1])
+        return path == self.path
+
+
+# Sampling
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{frame.f_code.co_qualname}"
+
+
+class Sampler(threading.Thread):
+    """Counts collapsed stacks of every other thread until stopped"""
+
+    def __init__(self, interval_ms: float):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                names = []
+                in_app = False
+                while frame is not None:
+                    name = _frame_name(frame)
+                    in_app = in_app or name.startswith(APP_MODULES)
+                    names.append(name)
+                    frame = frame.f_back
+                # Idle threads (event loop in select, pool workers waiting) are skipped
+                if in_app:
+                    self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+def collapsed(stacks) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+# Sessions
+
+def _load_sessions() -> List[ProfileSession]:
+    sessions, expired = [], []
+    now = time.time()
+    for session_id, raw in get_store().hgetall(SESSIONS_KEY).items():
+        data = json.loads(raw)
+        if now - data["created_at"] < PROFILING_TTL:
+            sessions.append(ProfileSession(**data))
+        else:
+            expired.append(session_id)
+    if expired:
+        get_store().hdel(SESSIONS_KEY, *expired)
+    return sorted(sessions, key=lambda session: session.created_at)
+
+
+def arm(method: str, path: str, count: int, interval_ms: float) -> ProfileSession:
+    global _next_check
+    session = ProfileSession(
+        id=secrets.token_hex(8),
+        method=method.upper(),
+        path=path,
+        count=count,
+        interval_ms=interval_ms,
+        token=secrets.token_urlsafe(16),
+        created_at=time.time(),
+    )
+    get_store().hsetnx(SESSIONS_KEY, session.id, json.dumps(asdict(session)), ttl=PROFILING_TTL)
+    _next_check = 0.0
+    return session
+
+
+def disarm(session_id: str) -> bool:
+    global _next_check
+    found = get_session(session_id) is not None
+    get_store().hdel(SESSIONS_KEY, session_id)
+    _next_check = 0.0
+    return found
+
+
+def get_session(session_id: str) -> Optional[ProfileSession]:
+    return next((session for session in _load_sessions() if session.id == session_id), None)
+
+
+def list_sessions() -> List[ProfileSession]:
+    return _load_sessions()
+
+
+def results(session: ProfileSession) -> List[dict]:
+    """Profiled requests of a session, in the order they were claimed"""
+    store = get_store()
+    profiled = []
+    for slot in range(1, session.count + 1):
+        raw = store.get(f"profiling:{session.id}:{slot}")
+        if raw:
+            profiled.append({"slot": slot, **json.loads(raw)})
+    return profiled
+
+
+def merged_stacks(profiled: List[dict]) -> Counter:
+    stacks = Counter()
+    for result in profiled:
+        stacks.update(result["stacks"])
+    return stacks
+
+
+_armed: List[ProfileSession] = []
+_exhausted = set()  # sessions whose request count this worker has seen used up
+_next_check = 0.0
+
+
+def armed_sessions() -> List[ProfileSession]:
+    global _armed, _next_check
+    now = time.monotonic()
+    if now >= _next_check:
+        _next_check = now + PROFILING_CHECK_INTERVAL
+        try:
+            _armed = [session for session in _load_sessions() if session.id not in _exhausted]
+        except Exception:
+            logger.exception("Could not load profiling sessions")
+            _armed = []
+    return _armed
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # Between refreshes the armed list is in memory; only a refresh touches the store
+        sessions = _armed if time.monotonic() < _next_check else await run_in_threadpool(armed_sessions)
+        if not sessions:
+            return await self.app(scope, receive, send)
+
+        # Compared as bytes: a non-ASCII header must not match (or raise), whatever it decodes to
+        token = dict(scope["headers"]).get(TOKEN_HEADER, b"")
+        session = next(
+            (s for s in sessions if (token and secrets.compare_digest(token, s.token.encode())) or s.matches(scope["method"], scope["path"])),
+            None
+        )
+        if session is None:
+            return await self.app(scope, receive, send)
+        store = get_store()
+        try:
+            slot = await run_in_threadpool(store.incr, f"profiling:{session.id}:claimed", ttl=PROFILING_TTL)
+        except Exception:
+            logger.exception("Could not claim a profiling slot")
+            return await self.app(scope, receive, send)
+        if slot > session.count:
+            _exhausted.add(session.id)
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", session.id.encode())]}
+            await send(message)
+
+        sampler = Sampler(session.interval_ms)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stacks = sampler.stop()
+            result = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "samples": sampler.samples,
+                "pid": os.getpid(),
+                "stacks": dict(stacks),
+            }
+            try:
+                await run_in_threadpool(store.set, f"profiling:{session.id}:{slot}", json.dumps(result), ttl=PROFILING_TTL)
+            except Exception:
+                logger.exception("Could not store profile %s/%s", session.id, slot)
@@ -0,0 +1,141 @@
+"""
+Buy-X-get-Y promotions
+
+Promotions are declared as data in config_rules.PROMOTIONS and compiled into
+immutable Promotion objects together with the rest of the pricing rules.
+apply_promotions evaluates them against cart lines that checkout has already
+loaded, so granting a free item costs no extra queries. Several promotions
+can be active at once; each one grants its own reward slots.
+"""
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Tuple
+
+
+@dataclass(frozen=True)
+class Promotion:
+    code: str
+    description: str = ""
+    qualifying_category_ids: FrozenSet[int] = frozenset()
+    qualifying_product_ids: FrozenSet[int] = frozenset()
+    min_qualifying: int = 1
+    count_by: str = "lines"  # "lines" (distinct cart lines) or "quantity"
+    reward_category_ids: FrozenSet[int] = frozenset()
+    reward_product_ids: FrozenSet[int] = frozenset()
+    reward_quantity: int = 1
+    repeat: bool = False  # One reward per min_qualifying block instead of one in total
+    auto_apply: bool = False  # Add reward_product_ids automatically instead of letting the customer pick
+    active: bool = True
+
+    def qualifies(self, product_id: int, category_id: int) -> bool:
+        return product_id in self.qualifying_product_ids or category_id in self.qualifying_category_ids
+
+    def is_reward(self, product_id: int, category_id: int) -> bool:
+        return product_id in self.reward_product_ids or category_id in self.reward_category_ids
+
+    def reward_slots(self, lines: Iterable[dict]) -> int:
+        """How many rewards the cart lines earn"""
+        if self.count_by == "quantity":
+            count = sum(line["quantity"] for line in lines if self.qualifies(line["product_id"], line["category_id"]))
+        else:
+            count = sum(1 for line in lines if self.qualifies(line["product_id"], line["category_id"]))
+        if count < self.min_qualifying:
+            return 0
+        return count // self.min_qualifying if self.repeat else 1
+
+
+def compile_promotions(config: Iterable[Mapping]) -> Tuple[Promotion, ...]:
+    return tuple(
+        Promotion(
+            code=data["code"],
+            description=data.get("description", ""),
+            qualifying_category_ids=frozenset(data.get("qualifying_category_ids", [])),
+            qualifying_product_ids=frozenset(data.get("qualifying_product_ids", [])),
+            min_qualifying=data.get("min_qualifying", 1),
+            count_by=data.get("count_by", "lines"),
+            reward_category_ids=frozenset(data.get("reward_category_ids", [])),
+            reward_product_ids=frozenset(data.get("reward_product_ids", [])),
+            reward_quantity=data.get("reward_quantity", 1),
+            repeat=data.get("repeat", False),
+            auto_apply=data.get("auto_apply", False),
+            active=data.get("active", True)
+        )
+        for data in config
+    )
+
+
+def reward_product_ids(promotions: Iterable[Promotion]) -> set:
+    """Products that may be added automatically; checkout loads them with the cart"""
+    ids = set()
+    for promotion in promotions:
+        if promotion.active and promotion.auto_apply:
+            ids.update(promotion.reward_product_ids)
+    return ids
+
+
+def _reward_item(product, variant_id, quantity: int, promotion: Promotion, variants: Mapping) -> dict:
+    variant = variants.get(variant_id) if variant_id else None
+    return {
+        "product_id": product.id,
+        "variant_id": variant_id,
+        "quantity": quantity,
+        "price": 0.0,  # Free!
+        "product_name": product.name,
+        "variant_name": variant.name if variant else None,
+        "product_image": product.image_url,
+        "promotion": promotion.code
+    }
+
+
+def apply_promotions(
+    promotions: Iterable[Promotion],
+    lines: List[dict],
+    claims: List[dict],
+    products: Mapping[int, object],
+    variants: Mapping[int, object] = None
+) -> List[dict]:
+    """
+    Evaluate promotions and return the free order items they grant.
+
+    Args:
+        promotions: Compiled promotions
+        lines: Paid cart lines with product_id, category_id and quantity
+        claims: Free items requested by the customer, [{productId, variantId}]
+        products: Already-loaded products by id (must include claimed and
+            auto-applied reward products)
+        variants: Already-loaded variants by id
+
+    Raises ValueError if a claimed item isn't earned by the cart.
+    """
+    variants = variants or {}
+    active = [promotion for promotion in promotions if promotion.active]
+    slots: Dict[str, int] = {promotion.code: promotion.reward_slots(lines) for promotion in active}
+    rewards = []
+
+    for promotion in active:
+        if promotion.auto_apply and slots[promotion.code]:
+            for product_id in sorted(promotion.reward_product_ids):
+                product = products.get(product_id)
+                if product:
+                    rewards.append(_reward_item(
+                        product, None, promotion.reward_quantity * slots[promotion.code], promotion, variants
+                    ))
+            slots[promotion.code] = 0
+
+    for claim in claims:
+        product = products.get(claim.get("productId"))
+        if not product:
+            raise ValueError("Free sample product not found")
+        promotion = next(
+            (promotion for promotion in active
+             if slots[promotion.code] > 0 and promotion.is_reward(product.id, product.category_id)),
+            None
+        )
+        if promotion is None:
+            offers = " ".join(f"{promotion.description}." for promotion in active if not promotion.auto_apply)
+            if not any(slots[promotion.code] for promotion in active):
+                raise ValueError(f"Not eligible for free sample. {offers}".strip())
+            raise ValueError(f"{product.name} is not eligible as a free sample. {offers}".strip())
+        slots[promotion.code] -= 1
+        rewards.append(_reward_item(product, claim.get("variantId"), promotion.reward_quantity, promotion, variants))
+
+    return rewards
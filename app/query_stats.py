@@ -0,0 +1,175 @@
+"""
+Per-request query accounting and slow query logging
+
+SQLAlchemy cursor hooks on every engine time each statement and:
+- add it to the current request's RequestStats (query count and DB time),
+  which feed the /metrics histograms and, outside production, a
+  Server-Timing header (db;dur=12.4;desc="7 queries", app;dur=31.0) that
+  shows up in the browser's network panel
+- log statements slower than SLOW_QUERY_MS, with string literals and bound
+  parameter values replaced by their types so no customer data reaches logs
+- on Postgres with SLOW_QUERY_EXPLAIN=true, capture EXPLAIN (ANALYZE,
+  BUFFERS) for SELECTs slower than SLOW_QUERY_EXPLAIN_MS, at most once per
+  SLOW_QUERY_EXPLAIN_INTERVAL seconds per worker. ANALYZE runs the query a
+  second time, so keep this off unless you are chasing a regression.
+
+Requests that run REQUEST_QUERY_WARN statements or more are logged with
+their path, which is how N+1 loops show up.
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+from sqlalchemy import event
+
+from .metrics import RequestStats, current_request, db_queries, db_query_duration
+
+logger = logging.getLogger(__name__)
+
+# "production" hides Server-Timing; anything else (development, staging) shows it
+APP_ENV = os.getenv("APP_ENV", "production").lower()
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", str(APP_ENV != "production")).lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+SLOW_QUERY_EXPLAIN_MS = float(os.getenv("SLOW_QUERY_EXPLAIN_MS", "1000"))
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60"))
+REQUEST_QUERY_WARN = int(os.getenv("REQUEST_QUERY_WARN", "30"))  # 0 disables
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+def redact_statement(statement: str) -> str:
+    return STRING_LITERAL.sub("'?'", " ".join(statement.split()))
+
+
+def redact_parameters(parameters, executemany: bool = False) -> str:
+    """Types only: ('<str>', '<int>') or {'email': '<str>'}"""
+    if executemany and parameters and isinstance(parameters[0], (list, tuple, dict)):
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return repr({key: f"<{type(value).__name__}>" for key, value in parameters.items()})
+    if isinstance(parameters, (list, tuple)):
+        return repr(tuple(f"<{type(value).__name__}>" for value in parameters))
+    return "<none>" if parameters is None else f"<{type(parameters).__name__}>"
+
+
+_next_explain = 0.0
+_explain_lock = threading.Lock()
+
+
+def _explain_allowed() -> bool:
+    global _next_explain
+    now = time.monotonic()
+    with _explain_lock:
+        if now < _next_explain:
+            return False
+        _next_explain = now + SLOW_QUERY_EXPLAIN_INTERVAL
+        return True
+
+
+def _explain(conn, statement, parameters) -> None:
+    # A separate DBAPI cursor, so the original result set is left alone, and
+    # a savepoint, so a failed EXPLAIN can't abort the request's transaction
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT query_stats_explain")
+        try:
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT query_stats_explain")
+            raise
+        cursor.execute("RELEASE SAVEPOINT query_stats_explain")
+        logger.warning("EXPLAIN (ANALYZE, BUFFERS) for %s\n%s", redact_statement(statement), plan)
+    except Exception:
+        logger.exception("Could not EXPLAIN slow query")
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    db_queries.inc()
+    db_query_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+    logger.warning(
+        "Slow query (%.1f ms): %s params=%s",
+        elapsed_ms, redact_statement(statement), redact_parameters(parameters, executemany)
+    )
+    if (
+        SLOW_QUERY_EXPLAIN
+        and elapsed_ms >= SLOW_QUERY_EXPLAIN_MS
+        and not executemany
+        and conn.dialect.name == "postgresql"
+        and statement.lstrip()[:6].upper() == "SELECT"
+        and _explain_allowed()
+    ):
+        _explain(conn, statement, parameters)
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+def server_timing(stats: RequestStats, total_seconds: float) -> str:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+        f"app;dur={total_seconds * 1000:.1f}"
+    )
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # Share MetricsMiddleware's stats when it runs; otherwise keep our own
+        stats = current_request.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = current_request.set(stats)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if SERVER_TIMING_ENABLED and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                current_request.reset(token)
+            if REQUEST_QUERY_WARN and stats.queries >= REQUEST_QUERY_WARN:
+                logger.warning(
+                    "%s %s ran %d queries (%.1f ms in the database)",
+                    scope["method"], scope["path"], stats.queries, stats.db_seconds * 1000
+                )
@@ -0,0 +1,202 @@
+"""
+Rate limiting for abuse-prone endpoints
+
+An ASGI middleware that throttles OTP, login, contact and wholesale requests
+before they reach routing, so rejected requests cost no DB queries and no
+bcrypt. Limits use a sliding-window counter (current + weighted previous
+fixed window) keyed by client IP and, where the endpoint takes one, by the
+phone number or email in the request body.
+
+Counters live in the KV store: the in-process store by default, or any
+Redis-protocol server (RATE_LIMIT_STORE_URL, falling back to KV_STORE_URL)
+so limits are shared across gunicorn workers. If the store is unreachable
+requests are let through. Store calls run in the threadpool: with Redis they
+are blocking socket round trips that must not stall the event loop.
+"""
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from .services.kv_store import create_store, get_store
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_STORE_URL = os.getenv("RATE_LIMIT_STORE_URL", "")
+# Number of trusted reverse proxies in front of the app (Azure front end = 1);
+# the client IP is taken that many entries from the end of X-Forwarded-For
+RATE_LIMIT_TRUSTED_PROXY_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_PROXY_HOPS", "0"))
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    method: str
+    path: str
+    limit: int  # requests allowed per period
+    period: int  # seconds
+    key: str = "ip"  # "ip" or a request body field such as "phone" or "email"
+
+
+RULES = (
+    RateLimitRule("POST", "/api/v1/auth/send-otp", 10, 60),
+    RateLimitRule("POST", "/api/v1/auth/send-otp", 3, 600, key="phone"),
+    RateLimitRule("POST", "/api/v1/auth/login-otp", 20, 60),
+    RateLimitRule("POST", "/api/v1/auth/login-otp", 10, 600, key="phone"),
+    RateLimitRule("POST", "/api/v1/auth/login", 20, 60),
+    RateLimitRule("POST", "/api/v1/auth/login", 10, 300, key="email"),
+    RateLimitRule("POST", "/api/v1/auth/token", 20, 60),
+    RateLimitRule("POST", "/api/v1/auth/token", 10, 300, key="username"),
+    RateLimitRule("POST", "/api/v1/auth/refresh", 30, 60),
+    RateLimitRule("POST", "/api/v1/contact", 5, 60),
+    RateLimitRule("POST", "/api/v1/contact", 5, 3600, key="email"),
+    RateLimitRule("POST", "/api/v1/wholesale/inquiry", 5, 60),
+    RateLimitRule("POST", "/api/v1/wholesale/inquiry", 5, 3600, key="email"),
+)
+
+
+def hit(store, rule: RateLimitRule, identity: str, now: Optional[float] = None) -> Tuple[bool, int]:
+    """
+    Count one request against a rule.
+    Returns (allowed, retry_after_seconds).
+    """
+    now = time.time() if now is None else now
+    window = int(now // rule.period)
+    elapsed = now - window * rule.period
+    prefix = f"rl:{rule.path}:{rule.key}:{rule.period}:{identity}"
+    current = store.incr(f"{prefix}:{window}", ttl=rule.period * 2)
+    previous = int(store.get(f"{prefix}:{window - 1}") or 0)
+    weight = 1 - elapsed / rule.period
+    if previous * weight + current <= rule.limit:
+        return True, 0
+    if current > rule.limit or previous == 0:
+        # Blocked until this window ends (and the previous one stops counting)
+        retry_after = rule.period - elapsed
+    else:
+        # Wait until the previous window's share has decayed enough
+        excess = previous * weight + current - rule.limit
+        retry_after = excess / previous * rule.period
+    return False, max(1, math.ceil(retry_after))
+
+
+def _strip_port(hop: str) -> str:
+    """Address of an X-Forwarded-For hop: 1.2.3.4, 1.2.3.4:5678, 2001:db8::1 or [2001:db8::1]:5678"""
+    if hop.startswith("["):
+        return hop[1:].split("]", 1)[0]
+    if hop.count(":") == 1:
+        return hop.split(":", 1)[0]
+    return hop
+
+
+def _client_ip(scope) -> str:
+    if RATE_LIMIT_TRUSTED_PROXY_HOPS:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                hops = [hop.strip() for hop in value.decode("latin-1").split(",")]
+                if len(hops) >= RATE_LIMIT_TRUSTED_PROXY_HOPS:
+                    return _strip_port(hops[-RATE_LIMIT_TRUSTED_PROXY_HOPS])
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _body_fields(scope, body: bytes) -> dict:
+    content_type = ""
+    for name, value in scope["headers"]:
+        if name == b"content-type":
+            content_type = value.decode("latin-1")
+            break
+    try:
+        if content_type.startswith("application/json"):
+            data = json.loads(body or b"{}")
+            return data if isinstance(data, dict) else {}
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+    except (ValueError, UnicodeDecodeError):
+        pass
+    return {}
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, rules=RULES, store=None):
+        self.app = app
+        self.store = store
+        self.rules = {}
+        for rule in rules:
+            self.rules.setdefault((rule.method, rule.path), []).append(rule)
+
+    def _get_store(self):
+        if self.store is None:
+            self.store = create_store(RATE_LIMIT_STORE_URL) if RATE_LIMIT_STORE_URL else get_store()
+        return self.store
+
+    def _retry_after(self, rules, scope, fields: dict) -> int:
+        """Count the request against every rule; seconds to wait, or 0 if allowed"""
+        retry_after = 0
+        try:
+            store = self._get_store()
+            for rule in rules:
+                if rule.key == "ip":
+                    identity = _client_ip(scope)
+                else:
+                    identity = str(fields.get(rule.key) or "").strip().lower()
+                    if not identity:
+                        continue
+                allowed, wait = hit(store, rule, identity)
+                if not allowed:
+                    retry_after = max(retry_after, wait)
+        except Exception:
+            logger.exception("Rate limit store unavailable; allowing request")
+            return 0
+        return retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rules = self.rules.get((scope["method"], scope["path"].rstrip("/")))
+        if not rules:
+            return await self.app(scope, receive, send)
+
+        fields = {}
+        downstream_receive = receive
+        if any(rule.key != "ip" for rule in rules):
+            # Buffer the body to read the identifier, then replay it downstream
+            chunks = []
+            while True:
+                message = await receive()
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body = b"".join(chunks)
+            fields = _body_fields(scope, body)
+            replayed = False
+
+            async def downstream_receive():
+                nonlocal replayed
+                if not replayed:
+                    replayed = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                # After the body, only the server knows when the client goes away
+                return await receive()
+
+        retry_after = await run_in_threadpool(self._retry_after, rules, scope, fields)
+        if retry_after:
+            body = json.dumps({"detail": "Too many requests. Please try again later."}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        await self.app(scope, downstream_receive, send)
@@ -3,12 +3,13 @@ from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
+import logging
 import os
-import random
-import string
-from .. import models, schemas, database
+from .. import models, schemas, database, sessions
+from ..services import otp_store
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/v1/auth",
@@ -19,17 +20,28 @@ router = APIRouter(
 SECRET_KEY = os.getenv("SECRET_KEY", "secret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+APP_ENV = os.getenv("APP_ENV", "production").lower()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token", auto_error=False)
 
+# passlib/bcrypt and jose are imported on first use to keep worker startup fast
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=None)
+def _jose():
+    from jose import JWTError, jwt
+    return jwt, JWTError
+
 # Utils
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -38,20 +50,45 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    jwt, _ = _jose()
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+def token_response(user: models.User, session: models.UserSession, refresh_token: str) -> dict:
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email, "sid": session.family_id}, expires_delta=access_token_expires
+    )
+    
+    return {
+        "access_token": access_token, 
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "role": user.role.value,
+        "user": user
+    }
+
+def start_session(db: Session, user: models.User) -> dict:
+    refresh_token, session = sessions.create_session(db, user.id)
+    db.commit()
+    return token_response(user, session, refresh_token)
+
+# Plain def so FastAPI runs these in the threadpool: the revocation check and
+# the user lookup are blocking store and database calls
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    jwt, JWTError = _jose()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
+        if sessions.is_revoked(payload.get("sid")):
+            raise credentials_exception
         token_data = schemas.TokenData(email=email)
     except JWTError:
         raise credentials_exception
@@ -60,14 +97,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     return user
 
-async def get_optional_user(token: Optional[str] = Depends(oauth2_scheme_optional), db: Session = Depends(database.get_db)):
+def get_optional_user(token: Optional[str] = Depends(oauth2_scheme_optional), db: Session = Depends(database.get_db)):
     if not token:
         return None
+    jwt, JWTError = _jose()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             return None
+        if sessions.is_revoked(payload.get("sid")):
+            return None
         token_data = schemas.TokenData(email=email)
     except JWTError:
         return None
@@ -107,59 +147,38 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
         }
         send_welcome_email(email_data)
     except Exception as e:
-        print(f"[EMAIL ERROR] Failed to send welcome email: {str(e)}")
+        logger.exception("Failed to send welcome email")
         # Don't fail registration if email fails
     
     return new_user
 
 @router.post("/send-otp")
 def send_otp(request: schemas.OTPRequest, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.phone == request.phone).first()
-    if not user:
+    user_exists = db.query(models.User.id).filter(models.User.phone == request.phone).first()
+    if not user_exists:
         raise HTTPException(status_code=404, detail="User with this phone number not found")
         
-    # Generate OTP
-    otp = str(random.randint(100000, 999999))
+    # Generate OTP; it lives in the expiring OTP store, not on the user row
+    otp = otp_store.issue(request.phone)
     
-    # Save OTP to DB
-    user.otp = otp
-    user.otp_expiry = datetime.utcnow() + timedelta(minutes=10)
-    db.commit()
-    
-    # Send OTP (Mock)
-    print(f"--- OTP for {request.phone}: {otp} ---")
+    # Send OTP (Mock); the code itself is never logged
+    if APP_ENV != "production":
+        logger.debug("OTP issued for %s", request.phone)
     
     return {"message": "OTP sent successfully"}
 
 @router.post("/login-otp", response_model=schemas.Token)
 def login_otp(request: schemas.OTPLogin, db: Session = Depends(database.get_db)):
+    try:
+        otp_store.verify(request.phone, request.otp)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     user = db.query(models.User).filter(models.User.phone == request.phone).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-        
-    if not user.otp or user.otp != request.otp:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-        
-    if user.otp_expiry < datetime.utcnow():
-        raise HTTPException(status_code=400, detail="OTP expired")
-        
-    # Clear OTP
-    user.otp = None
-    user.otp_expiry = None
-    db.commit()
-    
-    # Generate Token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
     
-    return {
-        "access_token": access_token, 
-        "token_type": "bearer",
-        "role": user.role.value,
-        "user": user
-    }
+    return start_session(db, user)
 
 @router.post("/login", response_model=schemas.Token)
 def login(user_credentials: schemas.UserLogin, db: Session = Depends(database.get_db)):
@@ -170,17 +189,7 @@ def login(user_credentials: schemas.UserLogin, db: Session = Depends(database.ge
     if not verify_password(user_credentials.password, user.hashed_password):
         raise HTTPException(status_code=403, detail="Invalid credentials")
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    
-    return {
-        "access_token": access_token, 
-        "token_type": "bearer",
-        "role": user.role.value,
-        "user": user
-    }
+    return start_session(db, user)
 
 @router.post("/token", response_model=schemas.Token)
 def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
@@ -191,14 +200,24 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     if not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=403, detail="Invalid credentials")
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    return start_session(db, user)
+
+@router.post("/refresh", response_model=schemas.Token)
+def refresh_access_token(request: schemas.RefreshTokenRequest, db: Session = Depends(database.get_db)):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    try:
+        refresh_token, session = sessions.rotate(db, request.refresh_token)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
     
-    return {
-        "access_token": access_token, 
-        "token_type": "bearer",
-        "role": user.role.value,
-        "user": user
-    }
+    user = db.query(models.User).filter(models.User.id == session.user_id).first()
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    return token_response(user, session, refresh_token)
+
+@router.post("/logout")
+def logout(request: schemas.RefreshTokenRequest, db: Session = Depends(database.get_db)):
+    """Revoke the session; its refresh and access tokens stop working"""
+    sessions.revoke(db, request.refresh_token)
+    return {"message": "Logged out successfully"}
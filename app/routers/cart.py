@@ -1,14 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import json
+import os
+import secrets
 from .. import models, schemas, database
 from .auth import get_current_user
+from ..services.kv_store import get_store
 
 router = APIRouter(
     prefix="/api/v1/cart",
     tags=["Cart"]
 )
 
+CART_TAX_RATE = 0.05
+GUEST_CART_TTL_SECONDS = int(os.getenv("GUEST_CART_TTL_SECONDS", str(7 * 24 * 3600)))
+
 def get_or_create_cart(db: Session, user_id: int):
     cart = db.query(models.Cart).filter(models.Cart.user_id == user_id).first()
     if not cart:
@@ -61,7 +68,7 @@ def get_cart(
             "quantity": item.quantity,
         })
         
-    tax = subtotal * 0.05 
+    tax = subtotal * CART_TAX_RATE
     total = subtotal + tax
     
     # Construct the response matching CartResponse
@@ -133,3 +140,141 @@ def remove_cart_item(
     db.commit()
     
     return get_cart(db, current_user)
+
+
+# Guest carts
+# Anonymous carts are stored in the KV store under an opaque token, so reads
+# never touch Postgres. Product details are snapshotted when an item is added;
+# checkout re-prices every line from the database anyway.
+#
+# Each cart is one hash with a field per line ("item:<product>:<variant>",
+# the snapshot) and a separate counter per line ("qty:<product>:<variant>").
+# Adds increment the counter in place, so concurrent adds to the same cart
+# never overwrite each other's lines. Every write slides the expiry forward.
+
+def _guest_cart_key(token: str) -> str:
+    # v2: hash layout; carts in the old single-JSON layout simply expire
+    return f"guest_cart:v2:{token}"
+
+def _guest_cart_line(product_id: int, variant_id: Optional[int]) -> str:
+    return f"{product_id}:{variant_id or 0}"
+
+def _cart_from_fields(fields: dict) -> Optional[dict]:
+    if not fields:
+        return None
+    items = []
+    for field, value in fields.items():
+        if not field.startswith("item:"):
+            continue
+        quantity = int(fields.get("qty:" + field[len("item:"):], 0))
+        if quantity > 0:
+            items.append({**json.loads(value), "quantity": quantity})
+    items.sort(key=lambda item: item["id"])
+    return {"items": items}
+
+def load_guest_cart(token: str) -> Optional[dict]:
+    return _cart_from_fields(get_store().hgetall(_guest_cart_key(token)))
+
+def delete_guest_cart(token: str):
+    get_store().delete(_guest_cart_key(token))
+
+def guest_cart_order_items(token: str) -> List[dict]:
+    """Guest cart lines in the item format expected by create_order"""
+    cart = load_guest_cart(token)
+    if not cart:
+        return []
+    return [
+        {"productId": item["product_id"], "variantId": item["variant_id"], "quantity": item["quantity"]}
+        for item in cart["items"]
+    ]
+
+def _get_guest_cart_fields_or_404(token: str) -> dict:
+    fields = get_store().hgetall(_guest_cart_key(token))
+    if not fields:
+        raise HTTPException(status_code=404, detail="Cart not found or expired")
+    return fields
+
+def _guest_cart_response(token: str, cart: dict) -> dict:
+    subtotal = sum(item["price"] * item["quantity"] for item in cart["items"])
+    tax = subtotal * CART_TAX_RATE
+    return {
+        "success": True,
+        "data": {
+            "token": token,
+            "items": cart["items"],
+            "subtotal": subtotal,
+            "tax": tax,
+            "total": subtotal + tax
+        }
+    }
+
+@router.post("/guest", response_model=schemas.GuestCartAPIResponse, status_code=status.HTTP_201_CREATED)
+def create_guest_cart():
+    token = secrets.token_urlsafe(24)
+    get_store().hsetnx(_guest_cart_key(token), "created", "1", ttl=GUEST_CART_TTL_SECONDS)
+    return _guest_cart_response(token, {"items": []})
+
+@router.get("/guest/{token}", response_model=schemas.GuestCartAPIResponse)
+def get_guest_cart(token: str):
+    return _guest_cart_response(token, _cart_from_fields(_get_guest_cart_fields_or_404(token)))
+
+@router.post("/guest/{token}/items", response_model=schemas.GuestCartAPIResponse)
+def add_to_guest_cart(
+    token: str,
+    item_in: schemas.CartItemCreate,
+    db: Session = Depends(database.get_db)
+):
+    store = get_store()
+    key = _guest_cart_key(token)
+    fields = _get_guest_cart_fields_or_404(token)
+    line = _guest_cart_line(item_in.product_id, item_in.variant_id)
+    
+    if f"item:{line}" not in fields:
+        if item_in.quantity <= 0:
+            return _guest_cart_response(token, _cart_from_fields(fields))
+        product = db.query(models.Product).filter(models.Product.id == item_in.product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        price = product.sale_price if product.sale_price else product.price
+        variant_name = None
+        if item_in.variant_id:
+            variant = db.query(models.Variant).filter(
+                models.Variant.id == item_in.variant_id,
+                models.Variant.product_id == product.id
+            ).first()
+            if not variant:
+                raise HTTPException(status_code=404, detail="Variant not found")
+            price = variant.price
+            variant_name = variant.name
+        
+        # A concurrent add of the same line may get there first; its snapshot wins
+        store.hsetnx(key, f"item:{line}", json.dumps({
+            "id": store.hincr(key, "next_id", ttl=GUEST_CART_TTL_SECONDS),
+            "product_id": product.id,
+            "variant_id": item_in.variant_id,
+            "product_name": product.name,
+            "variant_name": variant_name,
+            "product_image": product.image_url,
+            "price": price
+        }), ttl=GUEST_CART_TTL_SECONDS)
+    
+    quantity = store.hincr(key, f"qty:{line}", item_in.quantity, ttl=GUEST_CART_TTL_SECONDS)
+    if quantity <= 0:
+        store.hdel(key, f"item:{line}", f"qty:{line}", ttl=GUEST_CART_TTL_SECONDS)
+    return _guest_cart_response(token, load_guest_cart(token))
+
+@router.delete("/guest/{token}/items/{item_id}", response_model=schemas.GuestCartAPIResponse)
+def remove_guest_cart_item(token: str, item_id: int):
+    fields = _get_guest_cart_fields_or_404(token)
+    
+    field = next(
+        (field for field, value in fields.items() if field.startswith("item:") and json.loads(value)["id"] == item_id),
+        None
+    )
+    if not field:
+        raise HTTPException(status_code=404, detail="Item not found in cart")
+    
+    line = field[len("item:"):]
+    get_store().hdel(_guest_cart_key(token), field, f"qty:{line}", ttl=GUEST_CART_TTL_SECONDS)
+    return _guest_cart_response(token, load_guest_cart(token))
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
-from .. import models, schemas, database
+from .. import cdn, models, schemas, database
+from ..fast_json import typed_response
 from .auth import get_current_user
 
 router = APIRouter(
@@ -10,9 +11,10 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.CategoryResponse])
-def get_categories(db: Session = Depends(database.get_db)):
+def get_categories(request: Request, db: Session = Depends(database.get_read_db)):
     categories = db.query(models.Category).all()
-    return categories
+    cdn.tag(request, [cdn.CATEGORIES_KEY])
+    return typed_response(List[schemas.CategoryResponse], categories)
 
 @router.post("/", response_model=schemas.CategoryResponse, status_code=status.HTTP_201_CREATED)
 def create_category(category: schemas.CategoryCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
@@ -26,6 +28,7 @@ def create_category(category: schemas.CategoryCreate, db: Session = Depends(data
     db.add(new_category)
     db.commit()
     db.refresh(new_category)
+    cdn.purge([cdn.CATEGORIES_KEY])
     return new_category
 
 @router.put("/{id}", response_model=schemas.CategoryResponse)
@@ -40,6 +43,7 @@ def update_category(id: int, category: schemas.CategoryCreate, db: Session = Dep
     db_category.description = category.description
     db.commit()
     db.refresh(db_category)
+    cdn.purge([cdn.CATEGORIES_KEY, cdn.category_key(id)])
     return db_category
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -52,4 +56,5 @@ def delete_category(id: int, db: Session = Depends(database.get_db), current_use
     
     db.delete(db_category)
     db.commit()
+    cdn.purge([cdn.CATEGORIES_KEY, cdn.category_key(id)])
     return None
@@ -9,7 +9,7 @@ router = APIRouter(
 )
 
 @router.get("/stats", response_model=schemas.DashboardStats)
-def get_dashboard_stats(db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
+def get_dashboard_stats(db: Session = Depends(database.get_read_db), current_user: models.User = Depends(get_current_user)):
     if current_user.role != models.UserRole.admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime
-from .. import models, schemas, database
+from .. import models, schemas, database, offer_index
 from .auth import get_current_user
 
 router = APIRouter(
@@ -29,36 +28,27 @@ def create_offer(offer: schemas.OfferCreate, db: Session = Depends(database.get_
     db.add(new_offer)
     db.commit()
     db.refresh(new_offer)
+    offer_index.invalidate()
     return new_offer
 
 @router.post("/validate")
-def validate_offer(validation: schemas.OfferValidate, db: Session = Depends(database.get_db)):
-    offer = db.query(models.Offer).filter(models.Offer.code == validation.code).first()
+def validate_offer(validation: schemas.OfferValidate):
+    # Served from the in-memory offer index; unknown codes never hit the DB
+    offer = offer_index.lookup(validation.code)
     
     if not offer:
         return {"valid": False, "message": "Invalid coupon code"}
     
-    if offer.status != models.OfferStatus.Active:
-        return {"valid": False, "message": "Coupon is not active"}
-        
-    if offer.valid_from and offer.valid_from > datetime.utcnow():
-        return {"valid": False, "message": "Coupon is not yet valid"}
-        
-    if offer.valid_until and offer.valid_until < datetime.utcnow():
-        return {"valid": False, "message": "Coupon has expired"}
-        
-    if offer.usage_limit is not None and offer.usage_limit <= 0: # Simplified usage check
-        return {"valid": False, "message": "Coupon usage limit reached"}
-        
-    if validation.cart_value < offer.min_order_value:
-        return {"valid": False, "message": f"Minimum order value of {offer.min_order_value} required"}
+    reason = offer.check(validation.cart_value)
+    if reason:
+        return {"valid": False, "message": reason}
 
     discount_amount = 0
-    if offer.type == models.OfferType.Percentage:
+    if offer.type == "percentage":
         discount_amount = (offer.value / 100) * validation.cart_value
-    elif offer.type == models.OfferType.Fixed:
+    elif offer.type == "fixed":
         discount_amount = offer.value
-    elif offer.type == models.OfferType.Shipping:
+    elif offer.type == "shipping":
         discount_amount = 0 # Logic for free shipping would be handled by frontend/cart logic usually, or return specific flag
         
     return {
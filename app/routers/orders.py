@@ -1,9 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
-from .. import models, schemas, database
+from .. import models, schemas, database, offer_index
+from ..fast_json import typed_response
+from ..business_rules import redeem_offer
 from .auth import get_current_user, get_optional_user
+from .cart import guest_cart_order_items, delete_guest_cart
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def get_orders_read_db(current_user: models.User = Depends(get_current_user)):
+    """Replica session for order reads, or the primary right after this user wrote"""
+    db = database.read_sessionmaker_for(current_user.id)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def format_order(order: models.Order) -> dict:
+    """Order row as an OrderResponse dict, with product and variant names on each item"""
+    return {
+        "id": order.id,
+        "customer_name": order.customer_name,
+        "customer_email": order.customer_email,
+        "customer_phone": order.customer_phone,
+        "customer_address": order.customer_address,
+        "subtotal": order.subtotal,
+        "discount_amount": order.discount_amount,
+        "tax_amount": order.tax_amount,
+        "shipping_amount": order.shipping_amount,
+        "cod_charges": order.cod_charges,
+        "total_amount": order.total_amount,
+        "status": order.status,
+        "created_at": order.created_at,
+        "items": [
+            {
+                "product_id": item.product_id,
+                "variant_id": item.variant_id,
+                "quantity": item.quantity,
+                "price": item.price,
+                "product_name": item.product.name if item.product else "Unknown Product",
+                "variant_name": item.variant.name if item.variant else None,
+                "product_image": item.product.image_url if item.product else None
+            }
+            for item in order.items
+        ]
+    }
+
+# Items with their products and variants, loaded in a few batched queries
+ORDER_ITEMS_LOADER = selectinload(models.Order.items).options(
+    selectinload(models.OrderItem.product),
+    selectinload(models.OrderItem.variant)
+)
 
 router = APIRouter(
     prefix="/api/v1/orders",
@@ -90,45 +140,25 @@ def create_order(
         customer_email = order_in.customerEmail
         customer_phone = order_in.customerPhone
 
+    # Guest carts are resolved server-side instead of resending every line
+    items = order_in.items
+    if not items and order_in.cartToken:
+        items = guest_cart_order_items(order_in.cartToken)
+    if not items:
+        raise HTTPException(status_code=400, detail="Order must contain at least one item")
+
     # Validate products and calculate totals
+    free_samples = list(order_in.freeSamples or [])
+    if order_in.freeSample:
+        free_samples.append(order_in.freeSample)
     try:
         financial_breakdown, order_items = calculate_order_totals(
             db=db,
-            items=order_in.items,
+            items=items,
             coupon_code=order_in.couponCode,
-            payment_method=order_in.paymentMethod
+            payment_method=order_in.paymentMethod,
+            free_samples=free_samples
         )
-        
-        # Free Sample Logic: Buy 3 Premix (Category 1), Get 1 Free
-        print(f"DEBUG: freeSample in request: {order_in.freeSample}")
-        if order_in.freeSample:
-            # Check eligibility: Count distinct items in Category 1
-            premix_count = 0
-            for item in order_in.items:
-                product = db.query(models.Product).get(item['productId'])
-                if product and product.category_id == 1: # 1 is Instant Premixes
-                    premix_count += 1
-            
-            print(f"DEBUG: premix_count: {premix_count}")
-            
-            if premix_count >= 3:
-                # Validate free sample item
-                free_product = db.query(models.Product).get(order_in.freeSample['productId'])
-                if not free_product:
-                    raise HTTPException(status_code=400, detail="Free sample product not found")
-                
-                if free_product.category_id != 1:
-                     raise HTTPException(status_code=400, detail="Free sample must be an Instant Premix")
-
-                # Add free sample to order items
-                order_items.append({
-                    "product_id": free_product.id,
-                    "variant_id": order_in.freeSample.get('variantId'),
-                    "quantity": 1,
-                    "price": 0.0 # Free!
-                })
-            else:
-                raise HTTPException(status_code=400, detail="Not eligible for free sample. Buy 3 Instant Premixes to get 1 free.")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
         
@@ -149,8 +179,20 @@ def create_order(
     )
     
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    db.flush()
+
+    # Consume coupon usage in the same transaction as the order
+    try:
+        redeem_offer(
+            db,
+            offer_index.lookup(order_in.couponCode),
+            order_id=new_order.id,
+            user_id=user_id,
+            customer_email=customer_email
+        )
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Create Order Items
     for item in order_items:
@@ -169,8 +211,14 @@ def create_order(
         if cart:
             db.query(models.CartItem).filter(models.CartItem.cart_id == cart.id).delete()
         
+    if current_user:
+        # Before commit: reading current_user.id afterwards would reload the user
+        database.mark_recent_write(current_user.id)
     db.commit()
 
+    if order_in.cartToken:
+        delete_guest_cart(order_in.cartToken)
+
     # Send order confirmation email
     try:
         from ..services.email_service import send_order_confirmation
@@ -183,21 +231,20 @@ def create_order(
             'order_date': datetime.now().strftime("%B %d, %Y"),
             'items': [
                 {
-                    'name': item['product'].name if 'product' in item else db.query(models.Product).get(item['product_id']).name,
-                    'variant_name': item.variant.name if item.variant else None,
-                    'quantity': item.quantity,
-                    'price': item.price,
-                    'product_image': item.product.image_url if item.product else None
+                    'name': item['product_name'],
+                    'variant_name': item['variant_name'],
+                    'quantity': item['quantity'],
+                    'price': item['price'],
+                    'product_image': item['product_image']
                 }
                 for item in order_items
             ],
-            'cod_charges': financial_breakdown['cod_charges'],
-            'total_amount': financial_breakdown['total_amount'],
+            **financial_breakdown,
             'shipping_address': order_in.shippingAddress
         }
         send_order_confirmation(email_data)
     except Exception as e:
-        print(f"[EMAIL ERROR] Failed to send order confirmation: {str(e)}")
+        logger.exception("Failed to send order confirmation", extra={"order_id": new_order.id})
         # Don't fail the order if email fails
     
     return {
@@ -240,7 +287,7 @@ def get_orders(
     skip: int = 0, 
     limit: int = 100, 
     status: Optional[models.OrderStatus] = None,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(get_orders_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     query = db.query(models.Order)
@@ -252,47 +299,14 @@ def get_orders(
     if status:
         query = query.filter(models.Order.status == status)
     
-    orders = query.order_by(models.Order.created_at.desc()).offset(skip).limit(limit).all()
+    orders = query.options(ORDER_ITEMS_LOADER).order_by(models.Order.created_at.desc()).offset(skip).limit(limit).all()
     
-    # Format orders with proper item data
-    formatted_orders = []
-    for order in orders:
-        order_data = {
-            "id": order.id,
-            "customer_name": order.customer_name,
-            "customer_email": order.customer_email,
-            "customer_phone": order.customer_phone,
-            "customer_address": order.customer_address,
-            "subtotal": order.subtotal,
-            "discount_amount": order.discount_amount,
-            "tax_amount": order.tax_amount,
-            "shipping_amount": order.shipping_amount,
-            "cod_charges": order.cod_charges,
-            "total_amount": order.total_amount,
-            "status": order.status,
-            "created_at": order.created_at,
-            "items": []
-        }
-        
-        # Format order items with product and variant names
-        for item in order.items:
-            item_data = {
-                "product_id": item.product_id,
-                "variant_id": item.variant_id,
-                "quantity": item.quantity,
-                "price": item.price,
-                "product_name": item.product.name if item.product else "Unknown Product",
-                "variant_name": item.variant.name if item.variant else None,
-                "product_image": item.product.image_url if item.product else None
-            }
-            order_data["items"].append(item_data)
-        
-        formatted_orders.append(order_data)
+    formatted_orders = [format_order(order) for order in orders]
     
-    return {
+    return typed_response(schemas.OrderListAPIResponse, {
         "success": True,
         "data": formatted_orders
-    }
+    })
 
 @router.get(
     "/{id}",
@@ -312,8 +326,8 @@ def get_orders(
     - Complete item list with product and variant names
     """
 )
-def get_order(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
-    order = db.query(models.Order).filter(models.Order.id == id).first()
+def get_order(id: int, db: Session = Depends(get_orders_read_db), current_user: models.User = Depends(get_current_user)):
+    order = db.query(models.Order).options(ORDER_ITEMS_LOADER).filter(models.Order.id == id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
         
@@ -321,41 +335,10 @@ def get_order(id: int, db: Session = Depends(database.get_db), current_user: mod
     if current_user.role != models.UserRole.admin and order.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this order")
     
-    # Format order with proper item data
-    order_data = {
-        "id": order.id,
-        "customer_name": order.customer_name,
-        "customer_email": order.customer_email,
-        "customer_phone": order.customer_phone,
-        "customer_address": order.customer_address,
-        "subtotal": order.subtotal,
-        "discount_amount": order.discount_amount,
-        "tax_amount": order.tax_amount,
-        "shipping_amount": order.shipping_amount,
-        "cod_charges": order.cod_charges,
-        "total_amount": order.total_amount,
-        "status": order.status,
-        "created_at": order.created_at,
-        "items": []
-    }
-    
-    # Format order items with product and variant names
-    for item in order.items:
-        item_data = {
-            "product_id": item.product_id,
-            "variant_id": item.variant_id,
-            "quantity": item.quantity,
-            "price": item.price,
-            "product_name": item.product.name if item.product else "Unknown Product",
-            "variant_name": item.variant.name if item.variant else None,
-            "product_image": item.product.image_url if item.product else None
-        }
-        order_data["items"].append(item_data)
-        
-    return {
+    return typed_response(schemas.OrderDetailAPIResponse, {
         "success": True,
-        "data": order_data
-    }
+        "data": format_order(order)
+    })
 
 @router.patch(
     "/{id}/status",
@@ -389,38 +372,8 @@ def update_order_status(
         raise HTTPException(status_code=404, detail="Order not found")
     
     order.status = status_update.status
+    database.mark_recent_write(current_user.id)
     db.commit()
     db.refresh(order)
     
-    # Manually format order data to include product and variant names
-    order_data = {
-        "id": order.id,
-        "customer_name": order.customer_name,
-        "customer_email": order.customer_email,
-        "customer_phone": order.customer_phone,
-        "customer_address": order.customer_address,
-        "subtotal": order.subtotal,
-        "discount_amount": order.discount_amount,
-        "tax_amount": order.tax_amount,
-        "shipping_amount": order.shipping_amount,
-        "cod_charges": order.cod_charges,
-        "total_amount": order.total_amount,
-        "status": order.status,
-        "created_at": order.created_at,
-        "items": []
-    }
-    
-    # Format order items with product and variant names
-    for item in order.items:
-        item_data = {
-            "product_id": item.product_id,
-            "variant_id": item.variant_id,
-            "quantity": item.quantity,
-            "price": item.price,
-            "product_name": item.product.name if item.product else "Unknown Product",
-            "variant_name": item.variant.name if item.variant else None,
-            "product_image": item.product.image_url if item.product else None
-        }
-        order_data["items"].append(item_data)
-    
-    return order_data
+    return format_order(order)
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File, Form, Query
+from sqlalchemy import func, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
-from .. import models, schemas, database
+import json
+import re
+from .. import cdn, models, schemas, database
+from ..fast_json import typed_response
 from .auth import get_current_user
 from ..services.azure_blob import upload_image_to_blob
 
@@ -10,18 +15,50 @@ router = APIRouter(
     tags=["Products"]
 )
 
+ATTRIBUTE_KEY = re.compile(r"^[A-Za-z0-9_]+$")
+
+def parse_attribute_filters(attr: List[str]) -> dict:
+    """["unit:Sachet", "veg:true"] -> {"unit": "Sachet", "veg": True}"""
+    filters = {}
+    for item in attr:
+        key, sep, raw = item.partition(":")
+        if not sep or not ATTRIBUTE_KEY.match(key):
+            raise HTTPException(status_code=400, detail=f"Invalid attribute filter '{item}', expected key:value")
+        # Numbers, true/false and null match typed JSON values; anything else is a string
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        if isinstance(value, (dict, list)):
+            value = raw
+        filters[key] = value
+    return filters
+
+def filter_by_attributes(query, db: Session, filters: dict):
+    if db.get_bind().dialect.name == "postgresql":
+        # JSONB containment, served by the ix_products_attributes GIN index
+        return query.filter(type_coerce(models.Product.attributes, JSONB).contains(filters))
+    for key, value in filters.items():
+        query = query.filter(func.json_extract(models.Product.attributes, f"$.{key}") == value)
+    return query
+
 @router.get("/", response_model=schemas.ProductListAPIResponse)
 def get_products(
+    request: Request,
     page: int = 1, 
     limit: int = 10, 
     search: Optional[str] = None, 
     category: Optional[str] = None,
     category_id: Optional[int] = None,
     sort: Optional[str] = None,
-    db: Session = Depends(database.get_db)
+    attr: Optional[List[str]] = Query(None, description="Attribute filters as key:value, e.g. attr=unit:Sachet&attr=veg:true"),
+    db: Session = Depends(database.get_read_db)
 ):
     query = db.query(models.Product)
     
+    if attr:
+        query = filter_by_attributes(query, db, parse_attribute_filters(attr))
+    
     if search:
         query = query.filter(models.Product.name.contains(search))
     
@@ -48,11 +85,13 @@ def get_products(
         
     total = query.count()
     skip = (page - 1) * limit
-    products = query.offset(skip).limit(limit).all()
+    # Load the page's variants in one query instead of one per product
+    products = query.options(selectinload(models.Product.variants)).offset(skip).limit(limit).all()
     
     pages = (total + limit - 1) // limit
+    cdn.tag(request, [cdn.PRODUCT_LIST_KEY, *cdn.product_keys(products)])
     
-    return {
+    return typed_response(schemas.ProductListAPIResponse, {
         "success": True,
         "data": {
             "products": products,
@@ -62,10 +101,10 @@ def get_products(
                 "pages": pages
             }
         }
-    }
+    })
 
 @router.get("/{id_or_slug}", response_model=schemas.ProductDetailAPIResponse)
-def get_product_details(id_or_slug: str, db: Session = Depends(database.get_db)):
+def get_product_details(id_or_slug: str, request: Request, db: Session = Depends(database.get_read_db)):
     query = db.query(models.Product)
     if id_or_slug.isdigit():
         product = query.filter(models.Product.id == int(id_or_slug)).first()
@@ -74,11 +113,12 @@ def get_product_details(id_or_slug: str, db: Session = Depends(database.get_db))
         
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    cdn.tag(request, cdn.product_keys([product]))
         
-    return {
+    return typed_response(schemas.ProductDetailAPIResponse, {
         "success": True,
         "data": product
-    }
+    })
 
 @router.post("/", response_model=schemas.ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
@@ -112,6 +152,7 @@ async def create_product(
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    cdn.purge([cdn.PRODUCT_LIST_KEY, cdn.product_key(new_product.id), cdn.category_key(category_id)])
     return new_product
 
 @router.put("/{id}", response_model=schemas.ProductResponse)
@@ -132,6 +173,7 @@ async def update_product(
     product = db.query(models.Product).filter(models.Product.id == id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    purge_keys = [cdn.PRODUCT_LIST_KEY, cdn.product_key(product.id), cdn.category_key(product.category_id)]
     
     if name: product.name = name
     if category_id: product.category_id = category_id
@@ -145,6 +187,7 @@ async def update_product(
     
     db.commit()
     db.refresh(product)
+    cdn.purge(purge_keys + [cdn.category_key(product.category_id)])
     return product
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -155,6 +198,8 @@ def delete_product(id: int, db: Session = Depends(database.get_db), current_user
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    purge_keys = [cdn.PRODUCT_LIST_KEY, cdn.product_key(product.id), cdn.category_key(product.category_id)]
     db.delete(product)
     db.commit()
+    cdn.purge(purge_keys)
     return None
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from dataclasses import asdict
+from typing import Optional
+from .. import models, schemas, profiler
+from .auth import get_current_user
+
+router = APIRouter(
+    prefix="/api/v1/admin/profiling",
+    tags=["Profiling"]
+)
+
+def require_profiling_admin(current_user: models.User = Depends(get_current_user)):
+    if not profiler.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if current_user.role != models.UserRole.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    return current_user
+
+def get_session_or_404(session_id: str) -> profiler.ProfileSession:
+    session = profiler.get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Profiling session not found")
+    return session
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+def start_profiling(request: schemas.ProfileSessionCreate, current_user: models.User = Depends(require_profiling_admin)):
+    """
+    Profile the next `count` requests matching method and path, on any worker.
+    Requests sent with the returned token in an X-Profile-Token header are
+    profiled whatever their path.
+    """
+    session = profiler.arm(request.method, request.path, request.count, request.interval_ms)
+    return asdict(session)
+
+@router.get("/")
+def list_profiling_sessions(current_user: models.User = Depends(require_profiling_admin)):
+    return [
+        {**asdict(session), "profiled": len(profiler.results(session))}
+        for session in profiler.list_sessions()
+    ]
+
+@router.get("/{session_id}")
+def get_profiling_session(session_id: str, current_user: models.User = Depends(require_profiling_admin)):
+    """Per-request summaries; the stacks themselves are under /collapsed"""
+    session = get_session_or_404(session_id)
+    requests = [
+        {key: value for key, value in result.items() if key != "stacks"}
+        for result in profiler.results(session)
+    ]
+    return {**asdict(session), "requests": requests}
+
+@router.get("/{session_id}/collapsed")
+def get_collapsed_stacks(session_id: str, slot: Optional[int] = None, current_user: models.User = Depends(require_profiling_admin)):
+    """Collapsed stacks (flamegraph.pl / speedscope input), merged or for one request slot"""
+    session = get_session_or_404(session_id)
+    results = profiler.results(session)
+    if slot is not None:
+        results = [result for result in results if result["slot"] == slot]
+    return Response(profiler.collapsed(profiler.merged_stacks(results)), media_type="text/plain")
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+def stop_profiling(session_id: str, current_user: models.User = Depends(require_profiling_admin)):
+    if not profiler.disarm(session_id):
+        raise HTTPException(status_code=404, detail="Profiling session not found")
+    return None
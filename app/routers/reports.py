@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from .. import models, schemas, database
 from .auth import get_current_user
@@ -9,7 +9,7 @@ router = APIRouter(
 )
 
 @router.get("/sales")
-def get_sales_report(period: str = "monthly", db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
+def get_sales_report(period: str = "monthly", db: Session = Depends(database.get_read_db), current_user: models.User = Depends(get_current_user)):
     # Mock data for charts
     return {
         "success": True,
@@ -21,7 +21,7 @@ def get_sales_report(period: str = "monthly", db: Session = Depends(database.get
     }
 
 @router.get("/top-products")
-def get_top_products(db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
+def get_top_products(db: Session = Depends(database.get_read_db), current_user: models.User = Depends(get_current_user)):
     # Mock data
     return {
         "success": True,
@@ -31,3 +31,85 @@ def get_top_products(db: Session = Depends(database.get_db), current_user: model
             {"name": "Earl Grey", "revenue": 20000, "quantity": 40}
         ]
     }
+
+@router.post("/pricing-simulation")
+def simulate_pricing(
+    simulation: schemas.PricingSimulationRequest,
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Price many carts at once against the live rules or a what-if variant.
+    With replayOrders, historical orders are re-priced, with the offer each
+    one redeemed, and the recorded amounts are returned alongside as a
+    baseline.
+    """
+    if current_user.role != models.UserRole.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+
+    import numpy as np
+    from .. import offer_index
+    from ..pricing import get_rules, with_overrides
+    from ..pricing_batch import quote_batch, summarize
+
+    rules = get_rules()
+    if simulation.rules:
+        try:
+            rules = with_overrides(rules, simulation.rules)
+        except (KeyError, TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid rules override: {e}")
+
+    baseline = None
+    if simulation.replayOrders:
+        query = db.query(
+            models.Order.subtotal,
+            models.Order.cod_charges,
+            models.Order.discount_amount,
+            models.Order.tax_amount,
+            models.Order.shipping_amount,
+            models.Order.total_amount,
+            models.Offer.code
+        ).outerjoin(
+            models.OfferRedemption, models.OfferRedemption.order_id == models.Order.id
+        ).outerjoin(
+            models.Offer, models.Offer.id == models.OfferRedemption.offer_id
+        ).filter(models.Order.status != models.OrderStatus.Cancelled)
+        if simulation.dateFrom:
+            query = query.filter(models.Order.created_at >= simulation.dateFrom)
+        if simulation.dateTo:
+            query = query.filter(models.Order.created_at < simulation.dateTo)
+        rows = query.all()
+        recorded = np.array([row[:6] for row in rows], dtype=np.float64).reshape(-1, 6)
+        recorded = np.nan_to_num(recorded)
+        subtotals = recorded[:, 0]
+        payment_methods = np.where(recorded[:, 1] > 0, "cod", "prepaid").tolist()
+        # The offer each order redeemed, so the baseline's discounts are replayed too
+        coupon_codes = [row.code for row in rows]
+        baseline = {
+            key: round(float(recorded[:, i].sum()), 2)
+            for i, key in enumerate(("subtotal", "cod_charges", "discount_amount", "tax_amount", "shipping_amount", "total_amount"))
+        }
+    else:
+        if simulation.subtotals is None:
+            raise HTTPException(status_code=400, detail="Provide subtotals or set replayOrders")
+        subtotals = simulation.subtotals
+        payment_methods = simulation.paymentMethods
+        coupon_codes = simulation.couponCodes
+
+    try:
+        # Live offers apply unless the simulation overrides the coupon table
+        coupon_lookup = None if "COUPONS" in simulation.rules else offer_index.lookup
+        quotes = quote_batch(subtotals, payment_methods, coupon_codes, rules=rules, coupon_lookup=coupon_lookup)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    data = summarize(quotes)
+    if baseline is not None:
+        data["baseline"] = baseline
+    if simulation.includeQuotes:
+        data["quotes"] = {key: values.tolist() for key, values in quotes.items()}
+
+    return {
+        "success": True,
+        "data": data
+    }
@@ -1,8 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from .models import UserRole, OrderStatus, OfferType, OfferStatus, WholesaleInquiryStatus
-import json
 
 # Address Schemas
 class AddressBase(BaseModel):
@@ -60,9 +59,13 @@ class UserUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
     role: str
     user: UserResponse
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 class TokenData(BaseModel):
     email: Optional[str] = None
 
@@ -111,24 +114,6 @@ class ProductResponse(ProductBase):
     review_count: int
     display_order: int = 0  # Explicitly include for response
     variants: List[VariantResponse] = []
-    
-    @field_validator('images', mode='before')
-    def parse_images(cls, v):
-        if isinstance(v, str):
-            try:
-                return json.loads(v)
-            except json.JSONDecodeError:
-                return []
-        return v
-
-    @field_validator('attributes', mode='before')
-    def parse_attributes(cls, v):
-        if isinstance(v, str):
-            try:
-                return json.loads(v)
-            except json.JSONDecodeError:
-                return {}
-        return v
 
     class Config:
         from_attributes = True  # Pydantic v2
@@ -182,8 +167,8 @@ class OrderResponse(BaseModel):
 
 class OrderCreate(BaseModel):
     items: List[dict] = Field(
-        ...,
-        description="List of products to order. Each item must have productId, quantity, and optional variantId",
+        [],
+        description="List of products to order. Each item must have productId, quantity, and optional variantId. May be omitted when cartToken is given",
         example=[
             {"productId": 19, "variantId": None, "quantity": 2},
             {"productId": 20, "variantId": None, "quantity": 1}
@@ -225,11 +210,21 @@ class OrderCreate(BaseModel):
         description="Optional coupon code for discounts (e.g., WELCOME10, FLAT50)",
         example="WELCOME10"
     )
+    cartToken: Optional[str] = Field(
+        None,
+        description="Optional guest cart token. Used as the item list when items is empty; the guest cart is cleared after the order",
+        example=None
+    )
     freeSample: Optional[dict] = Field(
         None,
         description="Optional free sample item {productId, variantId} if eligibility criteria met",
         example={"productId": 25, "variantId": None}
     )
+    freeSamples: Optional[List[dict]] = Field(
+        None,
+        description="Optional list of free items {productId, variantId}, one per earned promotion reward",
+        example=None
+    )
     
     class Config:
         schema_extra = {
@@ -281,6 +276,7 @@ class OfferBase(BaseModel):
     valid_from: Optional[datetime] = None
     valid_until: Optional[datetime] = None
     usage_limit: Optional[int] = None
+    per_user_limit: Optional[int] = None
     status: OfferStatus = OfferStatus.Active
 
 class OfferCreate(OfferBase):
@@ -327,6 +323,26 @@ class CartAPIResponse(BaseModel):
     success: bool
     data: CartResponse
 
+# Guest carts live in the KV store and keep a snapshot of product details,
+# so they are plain data rather than ORM-backed responses
+class GuestCartItemResponse(CartItemBase):
+    id: int
+    product_name: str
+    variant_name: Optional[str] = None
+    product_image: Optional[str] = None
+    price: float
+
+class GuestCartResponse(BaseModel):
+    token: str
+    items: List[GuestCartItemResponse] = []
+    subtotal: float
+    tax: float
+    total: float
+
+class GuestCartAPIResponse(BaseModel):
+    success: bool
+    data: GuestCartResponse
+
 class OrderListAPIResponse(BaseModel):
     success: bool
     data: List[OrderResponse]
@@ -374,3 +390,43 @@ class ContactSubmissionCreate(BaseModel):
     email: EmailStr
     subject: str
     message: str
+
+# Pricing simulation
+class PricingSimulationRequest(BaseModel):
+    subtotals: Optional[List[float]] = Field(
+        None,
+        description="Cart subtotals to price. Omit when replayOrders is true"
+    )
+    paymentMethods: Optional[List[str]] = Field(
+        None,
+        description="Payment method per cart (same length as subtotals). Omit for prepaid"
+    )
+    couponCodes: Optional[List[Optional[str]]] = Field(
+        None,
+        description="Coupon code per cart (same length as subtotals), null for none"
+    )
+    replayOrders: bool = Field(
+        False,
+        description="Price historical orders instead of subtotals. Orders with COD charges are replayed as COD; coupons are not recorded on orders and are not replayed"
+    )
+    dateFrom: Optional[datetime] = None
+    dateTo: Optional[datetime] = None
+    rules: Dict[str, Any] = Field(
+        {},
+        description="Overrides for config_rules settings, e.g. {\"SHIPPING_TIERS\": [...], \"TAX_RATE\": 12}",
+        example={"SHIPPING_TIERS": [
+            {"cart_min": 0, "cart_max": 400, "shipping_charge": 60},
+            {"cart_min": 400, "cart_max": None, "shipping_charge": 0}
+        ]}
+    )
+    includeQuotes: bool = Field(
+        False,
+        description="Include per-cart results in the response"
+    )
+
+# Profiling Schemas
+class ProfileSessionCreate(BaseModel):
+    path: str = Field(..., description="Exact request path, or a prefix ending in *", examples=["/api/v1/orders/"])
+    method: str = "GET"
+    count: int = Field(5, ge=1, le=100, description="Number of matching requests to profile")
+    interval_ms: float = Field(5, ge=1, le=100, description="Sampling interval")
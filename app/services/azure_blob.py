@@ -1,17 +1,31 @@
+import logging
 import os
-from azure.storage.blob import BlobServiceClient, ContentSettings
 from fastapi import UploadFile, HTTPException
 import uuid
+import time
+
+from ..metrics import azure_uploads, azure_upload_duration
+
+# The Azure SDK is imported on first upload, not at startup: it is by far the
+# heaviest import in the app and only admin image uploads need it.
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME", "product-images")
 
+_blob_service_client = None
+
 def get_blob_service_client():
+    global _blob_service_client
     if not AZURE_CONNECTION_STRING:
-        print("Warning: AZURE_STORAGE_CONNECTION_STRING not set.")
+        logger.warning("AZURE_STORAGE_CONNECTION_STRING not set")
         return None
-    return BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
+    if _blob_service_client is None:
+        from azure.storage.blob import BlobServiceClient
+        _blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
+    return _blob_service_client
 
 async def upload_image_to_blob(file: UploadFile) -> str:
     """
@@ -39,7 +53,7 @@ async def upload_image_to_blob(file: UploadFile) -> str:
             except Exception as e:
                 # If public access is not permitted, try creating without it
                 # Note: Images won't be publicly accessible via URL unless account settings are changed
-                print(f"Warning: Could not enable public access for container: {e}")
+                logger.warning("Could not enable public access for container %s: %s", AZURE_CONTAINER_NAME, e)
                 container_client.create_container()
 
         # Upload blob
@@ -50,13 +64,20 @@ async def upload_image_to_blob(file: UploadFile) -> str:
         content = await file.read()
         
         # Set content type
+        from azure.storage.blob import ContentSettings
         content_settings = ContentSettings(content_type=file.content_type)
         
-        blob_client.upload_blob(content, content_settings=content_settings, overwrite=True)
+        started = time.perf_counter()
+        try:
+            blob_client.upload_blob(content, content_settings=content_settings, overwrite=True)
+        finally:
+            azure_upload_duration.observe(time.perf_counter() - started)
+        azure_uploads.inc(("ok",))
         
         # Return URL
         return blob_client.url
         
     except Exception as e:
-        print(f"Error uploading to Azure Blob: {e}")
+        logger.exception("Error uploading to Azure Blob")
+        azure_uploads.inc(("failed",))
         raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
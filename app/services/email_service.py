@@ -6,9 +6,15 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional, List
+import logging
 import os
+import time
 from pathlib import Path
 
+from ..metrics import email_sent, email_smtp_duration
+
+logger = logging.getLogger(__name__)
+
 # Email configuration from environment variables
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
@@ -40,11 +46,13 @@ def send_email(
         bool: True if sent successfully, False otherwise
     """
     if not EMAIL_ENABLED:
-        print(f"[EMAIL DISABLED] Would send to {to_email}: {subject}")
+        logger.info("Email disabled, not sending", extra={"to": to_email, "subject": subject})
+        email_sent.inc(("disabled",))
         return True
     
     if not SMTP_USERNAME or not SMTP_PASSWORD:
-        print("[EMAIL ERROR] SMTP credentials not configured")
+        logger.error("SMTP credentials not configured")
+        email_sent.inc(("not_configured",))
         return False
     
     try:
@@ -62,16 +70,22 @@ def send_email(
         msg.attach(MIMEText(html_body, 'html'))
         
         # Connect to SMTP server and send
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
+        started = time.perf_counter()
+        try:
+            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+                server.starttls()
+                server.login(SMTP_USERNAME, SMTP_PASSWORD)
+                server.send_message(msg)
+        finally:
+            email_smtp_duration.observe(time.perf_counter() - started)
         
-        print(f"[EMAIL] Sent to {to_email}: {subject}")
+        logger.info("Email sent", extra={"to": to_email, "subject": subject})
+        email_sent.inc(("sent",))
         return True
         
     except Exception as e:
-        print(f"[EMAIL ERROR] Failed to send to {to_email}: {str(e)}")
+        logger.exception("Failed to send email", extra={"to": to_email, "subject": subject})
+        email_sent.inc(("failed",))
         return False
 
 
@@ -0,0 +1,263 @@
+"""
+Key-value store with per-key TTL for short-lived server-side state
+(guest carts, counters, markers) that should never hit Postgres.
+
+Backends:
+- MemoryStore: in-process LRU with lazy expiry and a size cap (default)
+- RedisStore: speaks the Redis protocol (RESP) over a plain socket, so any
+  Redis-compatible server (Redis, Valkey, KeyDB, a local stand-in) works
+
+Besides plain string values, both backends have small hashes (hgetall,
+hsetnx, hincr, hdel) so concurrent writers can update separate fields of one
+record without a read-modify-write. Hash writes take a ttl that refreshes the
+expiry of the whole key.
+
+Select the backend with KV_STORE_URL:
+    KV_STORE_URL=                        -> in-process memory store
+    KV_STORE_URL=redis://localhost:6379/0 -> shared Redis-protocol store
+"""
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse
+
+KV_STORE_URL = os.getenv("KV_STORE_URL", "")
+KV_STORE_MAX_ENTRIES = int(os.getenv("KV_STORE_MAX_ENTRIES", "100000"))
+KV_STORE_TIMEOUT_SECONDS = float(os.getenv("KV_STORE_TIMEOUT_SECONDS", "2"))
+
+# Commands that are safe to send twice. After a connection error the server
+# may or may not have run the command, so anything else (INCRBY, HINCRBY,
+# GETDEL...) is never retried: a double increment is worse than an error.
+IDEMPOTENT_COMMANDS = frozenset({"GET", "SET", "DEL", "HGETALL", "HDEL", "PEXPIRE", "AUTH", "SELECT"})
+
+
+class MemoryStore:
+    """Thread-safe LRU store. Expired keys are dropped when they are touched."""
+
+    def __init__(self, max_entries: int = KV_STORE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, value: str, ttl: Optional[float], now: float):
+        self._data[key] = (value, now + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return entry[0] if entry else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl, time.monotonic())
+
+    def delete(self, key: str) -> bool:
+        """Remove a key; True if it existed (and had not expired)"""
+        with self._lock:
+            return self._live(key, time.monotonic()) is not None and self._data.pop(key, None) is not None
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Increment an integer counter. The TTL is only applied when the key is created."""
+        with self._lock:
+            now = time.monotonic()
+            entry = self._live(key, now)
+            if entry is None:
+                value = amount
+                self._store(key, str(value), ttl, now)
+            else:
+                value = int(entry[0]) + amount
+                self._data[key] = (str(value), entry[1])
+            return value
+
+    def _hash(self, key: str, ttl: Optional[float], now: float) -> dict:
+        entry = self._live(key, now)
+        fields = entry[0] if entry else {}
+        self._store(key, fields, ttl if ttl else (entry[1] - now if entry and entry[1] else None), now)
+        return fields
+
+    def hgetall(self, key: str) -> dict:
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return dict(entry[0]) if entry else {}
+
+    def hsetnx(self, key: str, field: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a hash field unless it exists; True if it was set"""
+        with self._lock:
+            fields = self._hash(key, ttl, time.monotonic())
+            if field in fields:
+                return False
+            fields[field] = value
+            return True
+
+    def hincr(self, key: str, field: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            fields = self._hash(key, ttl, time.monotonic())
+            value = int(fields.get(field, 0)) + amount
+            fields[field] = str(value)
+            return value
+
+    def hdel(self, key: str, *fields: str, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self._live(key, now):
+                hash_fields = self._hash(key, ttl, now)
+                for field in fields:
+                    hash_fields.pop(field, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisStore:
+    """Minimal RESP client; one connection per thread, reconnects on failure."""
+
+    def __init__(self, url: str, timeout: float = KV_STORE_TIMEOUT_SECONDS):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        conn = (sock, sock.makefile("rb"))
+        self._local.conn = conn
+        if self.password:
+            self._call(conn, "AUTH", self.password)
+        if self.db:
+            self._call(conn, "SELECT", self.db)
+        return conn
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by KV store")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise RuntimeError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode()
+        if prefix == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read(reader) for _ in range(length)]
+        raise RuntimeError(f"Unexpected KV store reply: {line!r}")
+
+    def _call(self, conn, *args):
+        sock, reader = conn
+        sock.sendall(self._encode(*args))
+        return self._read(reader)
+
+    def execute(self, *args):
+        """Run a raw command; idempotent commands are retried once on a fresh connection."""
+        conn = getattr(self._local, "conn", None)
+        try:
+            return self._call(conn or self._connect(), *args)
+        except (ConnectionError, OSError):
+            self._local.conn = None
+            if str(args[0]).upper() not in IDEMPOTENT_COMMANDS:
+                raise
+            return self._call(self._connect(), *args)
+
+    def get(self, key: str) -> Optional[str]:
+        return self.execute("GET", key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        if ttl:
+            self.execute("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            self.execute("SET", key, value)
+
+    def delete(self, key: str) -> bool:
+        return self.execute("DEL", key) == 1
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        if ttl:
+            # Create the key with its TTL only if missing; INCRBY keeps the TTL
+            self.execute("SET", key, 0, "PX", int(ttl * 1000), "NX")
+        return self.execute("INCRBY", key, amount)
+
+    def _touch(self, key: str, ttl: Optional[float]) -> None:
+        if ttl:
+            self.execute("PEXPIRE", key, int(ttl * 1000))
+
+    def hgetall(self, key: str) -> dict:
+        reply = self.execute("HGETALL", key) or []
+        return dict(zip(reply[::2], reply[1::2]))
+
+    def hsetnx(self, key: str, field: str, value: str, ttl: Optional[float] = None) -> bool:
+        created = self.execute("HSETNX", key, field, value) == 1
+        self._touch(key, ttl)
+        return created
+
+    def hincr(self, key: str, field: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = self.execute("HINCRBY", key, field, amount)
+        self._touch(key, ttl)
+        return value
+
+    def hdel(self, key: str, *fields: str, ttl: Optional[float] = None) -> None:
+        if fields:
+            self.execute("HDEL", key, *fields)
+            self._touch(key, ttl)
+
+
+def create_store(url: str = KV_STORE_URL):
+    if url and url.startswith("redis://"):
+        return RedisStore(url)
+    return MemoryStore()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store instance, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+
+def is_shared() -> bool:
+    """Whether get_store() is seen by every worker (False for the in-process store)"""
+    return not isinstance(get_store(), MemoryStore)
@@ -0,0 +1,63 @@
+"""
+One-time passwords for phone login, kept in the KV store instead of the
+users table.
+
+Each phone number has at most one live code, stored as an HMAC (never in
+plain text) under a key that expires on its own after OTP_TTL_SECONDS.
+Wrong guesses are counted with an atomic increment; after OTP_MAX_ATTEMPTS
+the code is discarded and a new one must be requested. A code can be used
+once: a matching code is only accepted by the request whose delete actually
+removed it, so concurrent requests with the same code can't both log in.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+
+from .kv_store import get_store
+
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "600"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+SECRET_KEY = os.getenv("SECRET_KEY", "secret")
+
+
+def _hash(phone: str, code: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), f"{phone}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+def _keys(phone: str):
+    return f"otp:{phone}", f"otp:{phone}:attempts"
+
+
+def issue(phone: str) -> str:
+    """Generate a new code for the phone number, replacing any previous one"""
+    code = f"{secrets.randbelow(900000) + 100000}"
+    code_key, attempts_key = _keys(phone)
+    store = get_store()
+    store.delete(attempts_key)
+    store.set(code_key, _hash(phone, code), ttl=OTP_TTL_SECONDS)
+    return code
+
+
+def verify(phone: str, code: str) -> None:
+    """
+    Check and consume a code.
+    Raises ValueError with a user-facing message if it doesn't match.
+    """
+    code_key, attempts_key = _keys(phone)
+    store = get_store()
+    expected = store.get(code_key)
+    if expected is None:
+        raise ValueError("OTP expired or not requested")
+
+    if store.incr(attempts_key, ttl=OTP_TTL_SECONDS) > OTP_MAX_ATTEMPTS:
+        store.delete(code_key)
+        raise ValueError("Too many attempts. Please request a new OTP")
+
+    if not hmac.compare_digest(expected, _hash(phone, code or "")):
+        raise ValueError("Invalid OTP")
+
+    # The delete is the atomic claim; a concurrent request may have consumed it already
+    if not store.delete(code_key):
+        raise ValueError("OTP expired or not requested")
+    store.delete(attempts_key)
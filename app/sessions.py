@@ -0,0 +1,193 @@
+"""
+Refresh-token sessions
+
+Logging in with a password or OTP starts a session: the client receives a
+short-lived access token and a refresh token. POST /auth/refresh exchanges
+the refresh token for a new pair with one indexed lookup, so keeping a user
+signed in never runs bcrypt again.
+
+Refresh tokens are random and only their SHA-256 hash is stored
+(user_sessions.token_hash, unique index). Every use rotates the token. All
+rotations of one login share a family_id; presenting a token that was
+already rotated (a stolen copy being replayed) revokes the whole family.
+
+Access tokens carry the family id as "sid". Revoked families are held in an
+in-memory set, so get_current_user checks revocation without a query. The
+set is loaded at startup and reloaded when any worker revokes a session (a
+version counter in the KV store, checked at most every
+SESSION_REVOCATION_CHECK_INTERVAL seconds). A family only needs to stay in
+the set while access tokens issued to it can still be valid.
+
+The version counter only reaches other workers through a shared KV store
+(KV_STORE_URL). With the in-process store each worker instead reloads the
+set from the database every SESSION_REVOCATION_RELOAD_INTERVAL seconds, so
+under several gunicorn workers a logout takes up to that long to apply
+everywhere; run Redis to make it immediate.
+"""
+import hashlib
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import FrozenSet, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import database, models
+from .services.kv_store import get_store, is_shared
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+SESSION_REVOCATION_CHECK_INTERVAL = float(os.getenv("SESSION_REVOCATION_CHECK_INTERVAL", "1"))
+# Fallback reload without a shared KV store
+SESSION_REVOCATION_RELOAD_INTERVAL = float(os.getenv("SESSION_REVOCATION_RELOAD_INTERVAL", "30"))
+VERSION_KEY = "sessions:revoked:version"
+
+
+def _hash(token: str) -> str:
+    # Tokens are 256 random bits, so a plain digest is enough (no bcrypt needed)
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_session(db: Session, user_id: int, family_id: Optional[str] = None) -> Tuple[str, models.UserSession]:
+    """Add a new session row and return (refresh_token, session); the caller commits"""
+    token = secrets.token_urlsafe(32)
+    session = models.UserSession(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=_hash(token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    db.add(session)
+    return token, session
+
+
+def rotate(db: Session, token: str) -> Tuple[str, models.UserSession]:
+    """
+    Exchange a refresh token for a new one in the same family.
+    Raises ValueError if the token is unknown, expired or already used.
+    """
+    now = datetime.utcnow()
+    session = db.query(models.UserSession).filter(models.UserSession.token_hash == _hash(token)).first()
+    if session is None:
+        raise ValueError("Invalid refresh token")
+    if session.revoked_at is not None or session.rotated_at is not None:
+        if session.revoked_at is None:
+            logger.warning("Refresh token reuse detected; revoking session family %s", session.family_id)
+            revoke_family(db, session.family_id)
+        raise ValueError("Refresh token has been revoked")
+    if session.expires_at < now:
+        raise ValueError("Refresh token expired")
+
+    # Claim the token; of two concurrent rotations only one updates the row
+    claimed = db.query(models.UserSession).filter(
+        models.UserSession.id == session.id,
+        models.UserSession.rotated_at.is_(None)
+    ).update({models.UserSession.rotated_at: now}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        revoke_family(db, session.family_id)
+        raise ValueError("Refresh token has been revoked")
+
+    new_token, new_session = create_session(db, session.user_id, session.family_id)
+    db.commit()
+    return new_token, new_session
+
+
+def revoke(db: Session, token: str) -> None:
+    """Log out: revoke the family the refresh token belongs to"""
+    session = db.query(models.UserSession).filter(models.UserSession.token_hash == _hash(token)).first()
+    if session is not None:
+        revoke_family(db, session.family_id)
+
+
+def revoke_family(db: Session, family_id: str) -> None:
+    db.query(models.UserSession).filter(
+        models.UserSession.family_id == family_id,
+        models.UserSession.revoked_at.is_(None)
+    ).update({models.UserSession.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    _publish_revocation(family_id)
+
+
+# In-memory revocation set
+
+_revoked: FrozenSet[str] = frozenset()
+_version: Optional[int] = None
+_loaded = False
+_loaded_at = 0.0
+_next_check = 0.0
+_publish_pending = False  # a revocation the store was down for; published on the next check
+_lock = threading.Lock()
+
+
+def _shared_version() -> Optional[int]:
+    value = get_store().get(VERSION_KEY)
+    return int(value) if value is not None else None
+
+
+def load_revocations() -> None:
+    """(Re)load the families revoked recently enough to still hold valid access tokens"""
+    global _revoked, _version, _loaded, _loaded_at
+    version = _shared_version()
+    cutoff = datetime.utcnow() - timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    db = database.SessionLocal()
+    try:
+        rows = db.query(models.UserSession.family_id).filter(
+            models.UserSession.revoked_at >= cutoff
+        ).distinct().all()
+    finally:
+        db.close()
+    _revoked = frozenset(row.family_id for row in rows)
+    _version = version
+    _loaded = True
+    _loaded_at = time.monotonic()
+    logger.info("Loaded %d revoked session families (v%s)", len(_revoked), version)
+
+
+def _publish_revocation(family_id: str) -> None:
+    global _revoked, _version, _next_check, _publish_pending
+    with _lock:
+        _revoked = _revoked | {family_id}
+        # Other workers see the new version and reload from the database
+        try:
+            version = get_store().incr(VERSION_KEY)
+        except Exception:
+            # The revocation is committed and already applies in this worker;
+            # the next check publishes it once the store is back
+            logger.exception("Could not publish the session revocation")
+            _publish_pending = True
+            _next_check = 0.0
+            return
+        if version == (_version or 0) + 1:
+            _version = version
+        else:
+            # Another worker revoked in between; the next check reloads its families too
+            _next_check = 0.0
+
+
+def is_revoked(family_id: Optional[str]) -> bool:
+    """Whether access tokens for this session family must be rejected"""
+    global _next_check, _publish_pending
+    if not family_id:
+        return False
+    now = time.monotonic()
+    if not _loaded or now >= _next_check:
+        with _lock:
+            if not _loaded or now >= _next_check:
+                if _publish_pending:
+                    get_store().incr(VERSION_KEY)
+                    _publish_pending = False
+                if (
+                    not _loaded
+                    or _shared_version() != _version
+                    or (not is_shared() and now - _loaded_at >= SESSION_REVOCATION_RELOAD_INTERVAL)
+                ):
+                    load_revocations()
+                _next_check = now + SESSION_REVOCATION_CHECK_INTERVAL
+    return family_id in _revoked
@@ -0,0 +1,289 @@
+"""
+Micro-benchmarks for checkout pricing, order serialization and email templates
+
+Each benchmark runs a hot-path function on fixed, seeded inputs without a
+database (calculate_order_totals gets a stub session that answers its
+id IN (...) queries from prebuilt rows; coupons are resolved from a pinned
+offer index):
+- calculate_order_totals for 3, 20 and 100 line carts, with a coupon and COD
+- calculate_shipping and apply_coupon over 100 cart values
+- ProductResponse validation of products with many variants and images
+- format_order (routers/orders) for orders of 5 and 50 items
+- get_order_confirmation_template for orders of 5 and 50 items
+
+Timing: the number of calls per measurement is calibrated so one measurement
+takes about --target-ms, then --repeat measurements are taken with the garbage
+collector off (timeit's default). The minimum per-call time is the figure
+compared between runs; the median and spread are reported to show noise.
+--cpu pins the process to one core, which makes runs noticeably steadier.
+
+--save writes the results as JSON; --baseline compares against saved results
+and exits with status 1 when a benchmark's minimum got slower by more than
+--tolerance.
+
+Usage:
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --filter order_totals --repeat 15
+    python benchmarks/bench_hot_paths.py --cpu 2 --save benchmarks/hot_paths_baseline.json
+    python benchmarks/bench_hot_paths.py --cpu 2 --baseline benchmarks/hot_paths_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# The app modules import the models; no connection is ever opened
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app import business_rules, models, offer_index, schemas
+from app.pricing import get_rules
+from app.routers.orders import format_order
+from app.services.email_templates import get_order_confirmation_template
+
+SEED = 42
+SHIPPING_ADDRESS = {"street": "12 MG Road", "city": "Pune", "state": "Maharashtra", "zip": "411001", "country": "India"}
+
+
+# Fixtures
+
+def build_catalog(size: int = 200, rng=None):
+    rng = rng or random.Random(SEED)
+    products, variants = {}, {}
+    for product_id in range(1, size + 1):
+        products[product_id] = SimpleNamespace(
+            id=product_id,
+            name=f"Instant Premix {product_id}",
+            price=round(rng.uniform(99, 899), 2),
+            sale_price=None if product_id % 4 else 89.0,
+            category_id=1 + product_id % 4,
+            image_url=f"https://cdn.example.com/products/{product_id}.webp",
+        )
+        variants[product_id * 10] = SimpleNamespace(id=product_id * 10, product_id=product_id, name="500 g", price=499.0)
+    return products, variants
+
+
+class StubQuery:
+    def __init__(self, rows: dict):
+        self.rows = rows  # id -> row
+
+    def filter(self, *criteria):
+        # Only id IN (...) filters are used; apply them as the database would,
+        # so the rows handed back (and the work on them) scale with the cart
+        rows = self.rows
+        for criterion in criteria:
+            rows = {row_id: rows[row_id] for row_id in criterion.right.value if row_id in rows}
+        return StubQuery(rows)
+
+    def all(self):
+        return list(self.rows.values())
+
+
+class StubSession:
+    """Answers calculate_order_totals' two queries from prebuilt rows"""
+
+    def __init__(self, products, variants):
+        self.rows = {models.Product: products, models.Variant: variants}
+
+    def query(self, model):
+        return StubQuery(self.rows[model])
+
+
+def build_cart(products: dict, lines: int, rng) -> list:
+    return [
+        {"productId": product_id, "variantId": product_id * 10 if rng.random() < 0.3 else None, "quantity": rng.randint(1, 4)}
+        for product_id in rng.sample(sorted(products), lines)
+    ]
+
+
+def use_fixed_offers():
+    """Coupon lookups hit a pinned in-memory index that never refreshes from the database"""
+    entries = {
+        code: offer_index.OfferEntry(code=code, type=coupon.type, value=coupon.value,
+                                     min_order_value=coupon.min_order_value, enabled=coupon.active)
+        for code, coupon in get_rules().coupons.items()
+    }
+    entries["SAVE10"] = offer_index.OfferEntry(code="SAVE10", type="percentage", value=10, offer_id=1)
+    entries["FREESHIP"] = offer_index.OfferEntry(code="FREESHIP", type="shipping", value=0, offer_id=2)
+    offer_index.pin(entries)
+
+
+def build_product(variant_count: int, image_count: int):
+    return SimpleNamespace(
+        id=1,
+        name="Masala Chai Premix",
+        slug="masala-chai-premix",
+        description="Ready in two minutes. " * 20,
+        price=349.0,
+        sale_price=299.0,
+        stock=120,
+        category_id=3,
+        image_url="https://cdn.example.com/products/1.webp",
+        images=[f"https://cdn.example.com/products/1-{n}.webp" for n in range(image_count)],
+        rating=4.6,
+        review_count=87,
+        attributes={"unit": "Jar", "weight": "250g", "veg": True, "origin": "Assam"},
+        display_order=1,
+        variants=[SimpleNamespace(id=n, name=f"{(n + 1) * 50} g", price=99.0 + n * 20, stock=10) for n in range(variant_count)],
+    )
+
+
+def build_order(products: dict, variants: dict, item_count: int, rng):
+    items = []
+    for product_id in rng.sample(sorted(products), item_count):
+        variant = variants[product_id * 10] if rng.random() < 0.3 else None
+        items.append(SimpleNamespace(
+            product_id=product_id, variant_id=variant.id if variant else None, quantity=rng.randint(1, 4),
+            price=variant.price if variant else products[product_id].price,
+            product=products[product_id], variant=variant,
+        ))
+    return SimpleNamespace(
+        id=1042, customer_name="Rajesh Kumar", customer_email="rajesh@example.com", customer_phone="+91 98765 43210",
+        customer_address=json.dumps(SHIPPING_ADDRESS), subtotal=1840.0, discount_amount=184.0, tax_amount=0.0,
+        shipping_amount=60.0, cod_charges=40.0, total_amount=1756.0, status=models.OrderStatus.Pending,
+        created_at=datetime(2026, 1, 15, 10, 30), items=items,
+    )
+
+
+def build_email(order) -> dict:
+    formatted = format_order(order)
+    return {
+        "customer_email": order.customer_email,
+        "customer_name": order.customer_name,
+        "order_id": order.id,
+        "order_date": "January 15, 2026",
+        "items": [
+            {"name": item["product_name"], "variant_name": item["variant_name"], "quantity": item["quantity"],
+             "price": item["price"], "product_image": item["product_image"]}
+            for item in formatted["items"]
+        ],
+        "subtotal": order.subtotal,
+        "discount_amount": order.discount_amount,
+        "tax_amount": order.tax_amount,
+        "shipping_amount": order.shipping_amount,
+        "cod_charges": order.cod_charges,
+        "total_amount": order.total_amount,
+        "shipping_address": SHIPPING_ADDRESS,
+    }
+
+
+def build_benchmarks() -> dict:
+    """Name -> zero-argument callable, all inputs built up front"""
+    rng = random.Random(SEED)
+    use_fixed_offers()
+    products, variants = build_catalog(rng=rng)
+    session = StubSession(products, variants)
+    subtotals = [round(rng.uniform(50, 3000), 2) for _ in range(100)]
+    coupons = [rng.choice(["SAVE10", "FLAT50", "FREESHIP", None]) for _ in range(100)]
+
+    benchmarks = {}
+    for lines in (3, 20, 100):
+        cart = build_cart(products, lines, rng)
+        benchmarks[f"order_totals[{lines} lines]"] = (
+            lambda cart=cart: business_rules.calculate_order_totals(session, cart, "cod", coupon_code="SAVE10")
+        )
+    benchmarks["calculate_shipping[x100]"] = lambda: [business_rules.calculate_shipping(value) for value in subtotals]
+    benchmarks["apply_coupon[x100]"] = lambda: [
+        business_rules.apply_coupon(value, code) for value, code in zip(subtotals, coupons) if value >= 300
+    ]
+    for variant_count, image_count in ((2, 3), (50, 20), (200, 50)):
+        product = build_product(variant_count, image_count)
+        benchmarks[f"product_response[{variant_count} variants, {image_count} images]"] = (
+            lambda product=product: schemas.ProductResponse.model_validate(product, from_attributes=True)
+        )
+    for item_count in (5, 50):
+        order = build_order(products, variants, item_count, rng)
+        benchmarks[f"format_order[{item_count} items]"] = lambda order=order: format_order(order)
+        email = build_email(order)
+        benchmarks[f"confirmation_email[{item_count} items]"] = lambda email=email: get_order_confirmation_template(email)
+    return benchmarks
+
+
+# Measurement
+
+def measure(func, repeat: int, target_ms: float) -> dict:
+    timer = timeit.Timer(func)
+    timer.timeit(number=10)  # warm caches and lazy imports
+    number = 1
+    while True:
+        elapsed = timer.timeit(number=number)
+        if elapsed * 1000 >= target_ms / 4:
+            break
+        number *= 4
+    number = max(1, int(number * target_ms / 1000 / elapsed))
+    per_call = sorted(t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number))
+    median = statistics.median(per_call)
+    return {
+        "min_us": round(per_call[0], 3),
+        "median_us": round(median, 3),
+        "spread": round((per_call[-1] - per_call[0]) / median, 3),
+        "calls": number,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before and result["min_us"] > before["min_us"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {before['min_us']:.2f} -> {result['min_us']:.2f} us "
+                f"(+{result['min_us'] / before['min_us'] - 1:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7, help="measurements per benchmark")
+    parser.add_argument("--target-ms", type=float, default=200, help="approximate length of one measurement")
+    parser.add_argument("--cpu", type=int, help="pin the process to this CPU core")
+    parser.add_argument("--save", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown of the minimum (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    if args.cpu is not None:
+        os.sched_setaffinity(0, {args.cpu})
+
+    benchmarks = {name: func for name, func in build_benchmarks().items() if args.filter in name}
+    results = {}
+    print(f"{'benchmark':<44} {'min':>11} {'median':>11} {'spread':>7}")
+    for name, func in benchmarks.items():
+        results[name] = result = measure(func, args.repeat, args.target_ms)
+        print(f"{name:<44} {result['min_us']:>9.2f}us {result['median_us']:>9.2f}us {result['spread']:>6.0%}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpu": args.cpu,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+        print(f"✓ Results saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("python") != platform.python_version():
+            print(f"warning: baseline was recorded on Python {baseline.get('python')}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"FAIL: slower than the baseline by more than {args.tolerance:.0%}")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✓ Within {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
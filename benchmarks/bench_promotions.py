@@ -0,0 +1,80 @@
+"""
+Benchmark promotion evaluation over large carts
+
+Evaluates several stacked promotions against synthetic carts of increasing
+size entirely in memory (the same path checkout uses after loading the cart).
+
+Usage:
+    python benchmarks/bench_promotions.py
+"""
+import os
+import random
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.promotions import apply_promotions, compile_promotions
+
+PROMOTIONS = compile_promotions([
+    {
+        "code": "PREMIX_FREE_SAMPLE",
+        "description": "Buy 3 Instant Premixes to get 1 free",
+        "qualifying_category_ids": [1],
+        "min_qualifying": 3,
+        "reward_category_ids": [1],
+    },
+    {
+        "code": "COOKIE_6_GET_2",
+        "description": "Buy 6 cookie packs, get 1 free for every 6",
+        "qualifying_category_ids": [2],
+        "min_qualifying": 6,
+        "count_by": "quantity",
+        "repeat": True,
+        "reward_category_ids": [2],
+    },
+    {
+        "code": "HAMPER_GIFT",
+        "description": "Free tin with any 10 hamper items",
+        "qualifying_product_ids": list(range(500, 600)),
+        "min_qualifying": 10,
+        "reward_product_ids": [9999],
+        "auto_apply": True,
+    },
+])
+
+
+def build_cart(size: int, seed: int = 42):
+    rng = random.Random(seed)
+    products = {
+        product_id: SimpleNamespace(
+            id=product_id, name=f"Product {product_id}", category_id=rng.randint(1, 5), image_url=None
+        )
+        for product_id in range(1, 1001)
+    }
+    products[9999] = SimpleNamespace(id=9999, name="Gift tin", category_id=9, image_url=None)
+    lines = []
+    for product_id in rng.sample(range(1, 1001), min(size, 1000)) * max(1, size // 1000):
+        product = products[product_id]
+        lines.append({"product_id": product.id, "category_id": product.category_id, "quantity": rng.randint(1, 4)})
+    lines = lines[:size]
+    claim = next(product for product in products.values() if product.category_id == 1)
+    return lines, [{"productId": claim.id, "variantId": None}], products
+
+
+def main():
+    print(f"{'cart lines':>10}  {'per evaluation':>15}")
+    for size in (10, 100, 1_000, 10_000, 100_000):
+        lines, claims, products = build_cart(size)
+        number = max(1, 100_000 // size)
+        seconds = min(timeit.repeat(
+            lambda: apply_promotions(PROMOTIONS, lines, claims, products),
+            number=number,
+            repeat=5
+        )) / number
+        print(f"{size:>10}  {seconds * 1e6:>12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark response serialization for the product list
+
+Compares, for pages of 10, 100 and 1000 products built from ORM-like objects:
+- standard: what FastAPI does with response_model (validate, dump to Python
+  objects, encode with the stdlib json module)
+- fast: app.fast_json (one TypeAdapter validation, JSON written by pydantic-core)
+- prevalidated: payload is already a ProductListAPIResponse, JSON only
+
+Usage:
+    python benchmarks/bench_serialization.py
+"""
+import json
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# app.schemas imports the models; no connection is ever opened
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import schemas
+from app.fast_json import dump_json
+
+SIZES = (10, 100, 1000)
+
+
+def build_payload(size: int) -> dict:
+    products = [
+        SimpleNamespace(
+            id=i,
+            name=f"Instant Premix {i}",
+            slug=f"instant-premix-{i}",
+            description="Ready in two minutes. " * 4,
+            price=149.0 + i,
+            sale_price=129.0 + i if i % 3 == 0 else None,
+            stock=20,
+            category_id=1 + i % 4,
+            image_url=f"https://cdn.example.com/products/{i}.webp",
+            images=[f"https://cdn.example.com/products/{i}-{n}.webp" for n in range(3)],
+            rating=4.5,
+            review_count=12,
+            attributes={"unit": "Sachet", "weight": "25g", "veg": True},
+            display_order=i,
+            variants=[SimpleNamespace(id=i * 10 + n, name=f"{n + 1} kg", price=399.0 * (n + 1), stock=5) for n in range(2)],
+        )
+        for i in range(size)
+    ]
+    return {
+        "success": True,
+        "data": {"products": products, "pagination": {"total": size, "page": 1, "pages": 1}},
+    }
+
+
+def standard(payload) -> bytes:
+    model = schemas.ProductListAPIResponse.model_validate(payload, from_attributes=True)
+    return json.dumps(model.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast(payload) -> bytes:
+    return dump_json(schemas.ProductListAPIResponse, payload)
+
+
+def main():
+    print(f"{'products':>8} {'standard':>12} {'fast':>12} {'prevalidated':>14} {'speedup':>8}")
+    for size in SIZES:
+        payload = build_payload(size)
+        typed = schemas.ProductListAPIResponse.model_validate(payload, from_attributes=True)
+        assert json.loads(standard(payload)) == json.loads(fast(payload))
+        number = max(1, 2000 // size)
+        timings = {}
+        for name, func, arg in (("standard", standard, payload), ("fast", fast, payload), ("prevalidated", fast, typed)):
+            timings[name] = min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number * 1000
+        print(
+            f"{size:>8} {timings['standard']:>10.3f}ms {timings['fast']:>10.3f}ms "
+            f"{timings['prevalidated']:>12.3f}ms {timings['standard'] / timings['fast']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
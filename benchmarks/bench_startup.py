@@ -0,0 +1,108 @@
+"""
+Benchmark worker startup
+
+Measures two things in fresh interpreter processes, the way a new gunicorn
+worker starts:
+- import time of app.main, broken down by top-level package (python -X importtime)
+- time to first request: launch uvicorn and poll /health until it answers
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1500
+
+With --budget-ms the script exits with status 1 when the median time to
+first request exceeds the budget, so it can gate CI. DATABASE_URL defaults to
+a throwaway SQLite file; startup must not depend on the schema existing.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_startup.db"))
+    return env
+
+
+def import_breakdown():
+    """Returns (total_ms, {top-level package: self ms})"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    )
+    by_package = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+        by_package[name.split(".")[0]] += int(self_us) / 1000
+        if name == "app.main":
+            total = int(cumulative_us) / 1000
+    return total, dict(by_package)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(timeout: float = 30.0) -> float:
+    """Milliseconds from process launch until GET /health returns 200"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError(f"No response from {url} within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12, help="packages to show in the import breakdown")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if median time to first request exceeds this")
+    args = parser.parse_args()
+
+    total, by_package = import_breakdown()
+    print(f"import app.main: {total:.0f} ms")
+    for package, ms in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {package:<24} {ms:8.1f} ms")
+
+    timings = [time_to_first_request() for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print(f"time to first request: median {median:.0f} ms, min {min(timings):.0f} ms ({args.runs} runs)")
+
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"FAIL: over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
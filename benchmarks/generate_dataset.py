@@ -0,0 +1,559 @@
+"""
+Generate a large, realistic dataset for performance work
+
+Fills the database with seeded synthetic data at a chosen scale:
+categories, products (with variants, images and attributes), users (with
+addresses), offers, orders with items and coupon redemptions, and open carts.
+Order history ends today (or at --end-date); the same seed, sizes and end
+date always produce the same rows.
+
+The data is shaped like a real shop rather than uniform noise:
+- product popularity follows a power law, so a few hundred products make up
+  most order lines and the long tail is rarely bought
+- a small share of customers place most orders; one order in ten is a guest
+- order volume grows over time, order ids increase with created_at, and
+  status depends on age (old orders are delivered or cancelled)
+- totals come from the pricing rules in config_rules.py, the same way
+  checkout computes them
+
+Rows are streamed in batches straight through the DBAPI connection (COPY on
+Postgres, executemany on SQLite), bypassing the ORM, so the large scale (100k
+products, 500k users, 5M orders) loads in minutes. Ids continue after the
+current maximum of each table, so the script can also add data to a
+database that already has some. The schema is migrated first.
+
+Every generated user can log in with --password. The admin accounts are
+admin<id>@example.com, and the customers are user<id>@example.com.
+
+Usage:
+    python benchmarks/generate_dataset.py --scale small
+    python benchmarks/generate_dataset.py --scale large --database-url postgresql://localhost/trumix_bench
+    python benchmarks/generate_dataset.py --scale medium --orders 2000000 --seed 7
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BATCH_SIZE = 50_000
+DEFAULT_PASSWORD = "benchmark-password"
+HISTORY_DAYS = 3 * 365
+
+
+@dataclass(frozen=True)
+class Sizes:
+    categories: int
+    products: int
+    users: int
+    orders: int
+    offers: int
+    admins: int = 1
+    cart_ratio: float = 0.1  # share of users with an open cart
+
+
+SCALES = {
+    "tiny": Sizes(categories=8, products=200, users=500, orders=2_000, offers=20),
+    "small": Sizes(categories=20, products=2_000, users=10_000, orders=50_000, offers=50),
+    "medium": Sizes(categories=40, products=20_000, users=100_000, orders=1_000_000, offers=200),
+    "large": Sizes(categories=60, products=100_000, users=500_000, orders=5_000_000, offers=1_000),
+}
+
+FLAVOURS = (
+    "Cardamom", "Ginger", "Lemongrass", "Masala", "Tulsi", "Saffron", "Hazelnut", "Mocha", "Vanilla",
+    "Caramel", "Rose", "Mint", "Chocolate", "Kesar Badam", "Filter", "Irish", "Butterscotch", "Coconut",
+)
+PRODUCTS = ("Tea Premix", "Coffee Premix", "Cookies", "Rusk", "Hot Chocolate", "Cold Coffee", "Iced Tea", "Nankhatai")
+UNITS = ("Sachet", "Box", "Jar", "Pouch", "Tin")
+SIZES = ("100 g", "250 g", "500 g", "1 kg")
+FIRST_NAMES = (
+    "Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rahul", "Meera",
+    "Aditya", "Isha", "Karan", "Pooja", "Siddharth", "Neha", "Amit", "Divya", "Raj", "Asha",
+)
+LAST_NAMES = (
+    "Sharma", "Patel", "Iyer", "Reddy", "Singh", "Gupta", "Nair", "Kumar", "Das", "Mehta",
+    "Joshi", "Rao", "Bose", "Khan", "Pillai", "Verma",
+)
+CITIES = (
+    ("Mumbai", "Maharashtra", "400001"), ("Pune", "Maharashtra", "411001"), ("Delhi", "Delhi", "110001"),
+    ("Bengaluru", "Karnataka", "560001"), ("Chennai", "Tamil Nadu", "600001"), ("Kolkata", "West Bengal", "700001"),
+    ("Hyderabad", "Telangana", "500001"), ("Ahmedabad", "Gujarat", "380001"), ("Jaipur", "Rajasthan", "302001"),
+    ("Kochi", "Kerala", "682001"),
+)
+
+
+def _slugify(text: str) -> str:
+    return "-".join(text.lower().split())
+
+
+def _power_law_weights(count: int, exponent: float = 1.1) -> list:
+    """Cumulative Zipf-like weights: item i is picked in proportion to 1 / (i + 1) ** exponent"""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+class Loader:
+    """Writes batches of rows through one raw DBAPI connection and transaction"""
+
+    def __init__(self, engine):
+        self.dialect = engine.dialect
+        self.postgres = engine.dialect.name == "postgresql"
+        self.connection = engine.raw_connection()
+        self.cursor = self.connection.cursor()
+        self.rows_written = {}
+        if self.postgres:
+            self.cursor.execute("SET LOCAL synchronous_commit = off")
+        else:
+            self.cursor.execute("PRAGMA synchronous")
+            self.synchronous = self.cursor.fetchone()[0]
+            self.cursor.execute("PRAGMA synchronous = OFF")
+
+    def next_id(self, table) -> int:
+        self.cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table.name}")
+        return self.cursor.fetchone()[0] + 1
+
+    def write(self, table, columns: tuple, rows: list):
+        """Rows hold Python values (datetimes, enums, dicts); the column types convert them"""
+        if not rows:
+            return
+        processors = [
+            table.c[name].type.dialect_impl(self.dialect).bind_processor(self.dialect) for name in columns
+        ]
+        if any(processors):
+            rows = [
+                tuple(value if process is None or value is None else process(value) for process, value in zip(processors, row))
+                for row in rows
+            ]
+        column_list = ", ".join(columns)
+        if self.postgres:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            self.cursor.copy_expert(f"COPY {table.name} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            placeholders = ", ".join("?" for _ in columns)
+            self.cursor.executemany(f"INSERT INTO {table.name} ({column_list}) VALUES ({placeholders})", rows)
+        self.rows_written[table.name] = self.rows_written.get(table.name, 0) + len(rows)
+
+    def finish(self, tables):
+        if self.postgres:
+            # Ids were given explicitly; move the sequences past them
+            for table in tables:
+                self.cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+                )
+        self.connection.commit()
+        # Fresh statistics so the planner sees the new table sizes
+        for table in tables:
+            self.cursor.execute(f"ANALYZE {table.name}")
+        if not self.postgres:
+            self.cursor.execute(f"PRAGMA synchronous = {self.synchronous}")
+        self.connection.commit()
+        self.connection.close()
+
+
+class Generator:
+    def __init__(self, loader: Loader, sizes: Sizes, seed: int, hashed_password: str, end: datetime, log=print):
+        from app.pricing import get_rules
+
+        self.loader = loader
+        self.sizes = sizes
+        self.seed = seed
+        self.hashed_password = hashed_password
+        self.rules = get_rules()
+        self.log = log
+        self.now = end
+        self.history_start = self.now - timedelta(days=HISTORY_DAYS)
+
+    def rng(self, stream: int) -> random.Random:
+        # One stream per table: changing the order count doesn't change the products
+        return random.Random(self.seed * 1000 + stream)
+
+    def _batched(self, table, columns, rows):
+        """Write an iterable of rows in BATCH_SIZE chunks with a progress line"""
+        started = time.perf_counter()
+        count = 0
+        for batch in iter(lambda: list(itertools.islice(rows, BATCH_SIZE)), []):
+            self.loader.write(table, columns, batch)
+            count += len(batch)
+        self._report(table.name, count, started)
+
+    def _report(self, name: str, count: int, started: float):
+        elapsed = time.perf_counter() - started
+        self.log(f"  {name:<20} {count:>10,} rows in {elapsed:6.1f}s ({count / max(elapsed, 1e-9):,.0f}/s)")
+
+    def run(self) -> dict:
+        from app import models
+
+        self.categories()
+        self.products()
+        self.users()
+        self.offers()
+        self.orders()
+        self.carts()
+        return {
+            "admin_emails": [f"admin{user_id}@example.com" for user_id in self.admin_ids],
+            "first_user_id": self.first_user_id,
+            "coupon_codes": [code for code, active in self.offer_codes if active],
+            "rows": dict(self.loader.rows_written),
+            "tables": [
+                models.Category.__table__, models.Product.__table__, models.Variant.__table__,
+                models.User.__table__, models.Address.__table__, models.Offer.__table__,
+                models.Order.__table__, models.OrderItem.__table__, models.OfferRedemption.__table__,
+                models.Cart.__table__, models.CartItem.__table__,
+            ],
+        }
+
+    def categories(self):
+        from app import models
+
+        table = models.Category.__table__
+        first = self.loader.next_id(table)
+        self.category_ids = list(range(first, first + self.sizes.categories))
+        names = [f"{flavour} {product}" for product in PRODUCTS for flavour in FLAVOURS]
+        rows = (
+            (
+                category_id,
+                f"{names[i % len(names)]} {category_id}",
+                f"{_slugify(names[i % len(names)])}-{category_id}",
+                f"Our {names[i % len(names)].lower()} range",
+                f"https://cdn.example.com/categories/{category_id}.webp",
+            )
+            for i, category_id in enumerate(self.category_ids)
+        )
+        self._batched(table, ("id", "name", "slug", "description", "image_url"), rows)
+
+    def products(self):
+        from app import models
+
+        rng = self.rng(1)
+        table = models.Product.__table__
+        variant_table = models.Variant.__table__
+        first = self.loader.next_id(table)
+        next_variant_id = self.loader.next_id(variant_table)
+        category_weights = _power_law_weights(len(self.category_ids), 0.8)
+        self.product_ids = list(range(first, first + self.sizes.products))
+        # Sellable price (sale price when set) and variants, for order and cart lines
+        self.product_prices = {}
+        self.product_variants = {}
+        columns = (
+            "id", "name", "slug", "description", "price", "sale_price", "stock", "image_url", "images",
+            "rating", "review_count", "attributes", "category_id", "display_order",
+        )
+        variant_columns = ("id", "product_id", "name", "price", "stock")
+        started = time.perf_counter()
+        for start in range(0, len(self.product_ids), BATCH_SIZE):
+            rows, variant_rows = [], []
+            for product_id in self.product_ids[start:start + BATCH_SIZE]:
+                name = f"{rng.choice(FLAVOURS)} {rng.choice(PRODUCTS)} {product_id}"
+                price = round(max(10.0, rng.lognormvariate(5.3, 0.7)), 2)
+                sale_price = round(price * rng.uniform(0.7, 0.95), 2) if rng.random() < 0.2 else None
+                rating = round(rng.uniform(3.2, 5.0), 1)
+                rows.append((
+                    product_id, name, f"{_slugify(name)}", f"{name}. Small-batch, ready in two minutes.",
+                    price, sale_price, rng.randint(0, 500), f"https://cdn.example.com/products/{product_id}.webp",
+                    [f"https://cdn.example.com/products/{product_id}-{n}.webp" for n in range(rng.randint(1, 5))],
+                    rating, int(rng.paretovariate(1.2)) - 1,
+                    {"unit": rng.choice(UNITS), "veg": rng.random() < 0.9, "weight": rng.choice(SIZES)},
+                    rng.choices(self.category_ids, cum_weights=category_weights)[0], product_id,
+                ))
+                self.product_prices[product_id] = sale_price or price
+                if rng.random() < 0.6:
+                    variants = []
+                    for size_index, size in enumerate(rng.sample(SIZES, rng.randint(2, 3))):
+                        variant_price = round(price * (1 + 0.8 * size_index), 2)
+                        variant_rows.append((next_variant_id, product_id, size, variant_price, rng.randint(0, 200)))
+                        variants.append((next_variant_id, variant_price))
+                        next_variant_id += 1
+                    self.product_variants[product_id] = variants
+            self.loader.write(table, columns, rows)
+            self.loader.write(variant_table, variant_columns, variant_rows)
+        self._report(table.name, len(self.product_ids), started)
+        self.log(f"  {variant_table.name:<20} {self.loader.rows_written.get(variant_table.name, 0):>10,} rows")
+
+    def users(self):
+        from app import models
+
+        rng = self.rng(2)
+        table = models.User.__table__
+        address_table = models.Address.__table__
+        first = self.loader.next_id(table)
+        next_address_id = self.loader.next_id(address_table)
+        self.first_user_id = first
+        self.admin_ids = list(range(first, first + self.sizes.admins))
+        self.customer_ids = list(range(first + self.sizes.admins, first + self.sizes.admins + self.sizes.users))
+        # (name, email, phone, address) per customer, for the customer fields on orders
+        self.customers = {}
+        columns = ("id", "name", "email", "hashed_password", "role", "phone", "created_at")
+        address_columns = ("id", "user_id", "street", "city", "state", "zip", "country", "is_default")
+        span = HISTORY_DAYS * 86400
+        started = time.perf_counter()
+        all_ids = self.admin_ids + self.customer_ids
+        for start in range(0, len(all_ids), BATCH_SIZE):
+            rows, address_rows = [], []
+            for user_id in all_ids[start:start + BATCH_SIZE]:
+                name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                is_admin = user_id < first + self.sizes.admins
+                email = f"admin{user_id}@example.com" if is_admin else f"user{user_id}@example.com"
+                phone = f"9{user_id:09d}"
+                created_at = self.history_start + timedelta(seconds=span * rng.random())
+                role = models.UserRole.admin if is_admin else models.UserRole.user
+                rows.append((user_id, name, email, self.hashed_password, role, phone, created_at))
+                city, state, zip_code = rng.choice(CITIES)
+                address = {"street": f"{rng.randint(1, 400)} MG Road", "city": city, "state": state, "zip": zip_code, "country": "India"}
+                if not is_admin:
+                    self.customers[user_id] = (name, email, phone, json.dumps(address))
+                if rng.random() < 0.7:
+                    address_rows.append((next_address_id, user_id, address["street"], city, state, zip_code, "India", True))
+                    next_address_id += 1
+            self.loader.write(table, columns, rows)
+            self.loader.write(address_table, address_columns, address_rows)
+        self._report(table.name, len(all_ids), started)
+        self.log(f"  {address_table.name:<20} {self.loader.rows_written.get(address_table.name, 0):>10,} rows")
+
+    def offers(self):
+        from app import models
+
+        rng = self.rng(3)
+        table = models.Offer.__table__
+        first = self.loader.next_id(table)
+        # (id, type, value, min_order_value, valid_until, per_user_limit) of the
+        # active offers orders may have redeemed
+        self.redeemable = []
+        self.offer_codes = []
+        rows = []
+        for offer_id in range(first, first + self.sizes.offers):
+            offer_type = rng.choices(
+                [models.OfferType.Percentage, models.OfferType.Fixed, models.OfferType.Shipping], [6, 3, 1]
+            )[0]
+            value = rng.choice([5, 10, 15, 20]) if offer_type == models.OfferType.Percentage else (
+                rng.choice([25, 50, 100]) if offer_type == models.OfferType.Fixed else 0
+            )
+            min_order_value = rng.choice([0, 199, 299, 499])
+            expired = rng.random() < 0.3
+            valid_until = (self.now - timedelta(days=rng.randint(1, 300))) if expired else None
+            active = rng.random() < 0.85
+            per_user_limit = rng.choice([None, None, 1, 3])
+            code = f"SAVE{offer_id}"
+            rows.append((
+                offer_id, code, offer_type, value, min_order_value, None,
+                valid_until.replace(tzinfo=None) if valid_until else None,
+                None, per_user_limit,
+                models.OfferStatus.Active if active else models.OfferStatus.Inactive,
+            ))
+            self.offer_codes.append((code, active and not expired))
+            if active and offer_type != models.OfferType.Shipping:
+                self.redeemable.append((offer_id, offer_type, value, min_order_value, valid_until, per_user_limit))
+        self._batched(
+            table,
+            ("id", "code", "type", "value", "min_order_value", "valid_from", "valid_until", "usage_limit",
+             "per_user_limit", "status"),
+            iter(rows),
+        )
+
+    def _order_status(self, rng, age_days: float):
+        from app import models
+
+        if age_days > 14:
+            return rng.choices([models.OrderStatus.Delivered, models.OrderStatus.Cancelled], [93, 7])[0]
+        if age_days > 3:
+            return rng.choices(
+                [models.OrderStatus.Shipped, models.OrderStatus.Delivered, models.OrderStatus.Cancelled], [30, 62, 8]
+            )[0]
+        return rng.choices(
+            [models.OrderStatus.Pending, models.OrderStatus.Processing, models.OrderStatus.Shipped], [50, 35, 15]
+        )[0]
+
+    def orders(self):
+        from app import models
+
+        rng = self.rng(4)
+        tables = models.Order.__table__, models.OrderItem.__table__, models.OfferRedemption.__table__
+        order_id = first_order_id = self.loader.next_id(tables[0])
+        item_id = self.loader.next_id(tables[1])
+        redemption_id = self.loader.next_id(tables[2])
+        # Shuffled so the popular products and the heavy buyers are spread over the id range
+        popular_products = self.product_ids[:]
+        rng.shuffle(popular_products)
+        product_weights = _power_law_weights(len(popular_products))
+        buyers = self.customer_ids[:]
+        rng.shuffle(buyers)
+        buyer_weights = _power_law_weights(len(buyers), 0.6)
+        guest_names = [f"{given} {family}" for given in FIRST_NAMES for family in LAST_NAMES]
+        columns = (
+            "id", "user_id", "customer_name", "customer_email", "customer_phone", "customer_address",
+            "subtotal", "discount_amount", "tax_amount", "shipping_amount", "cod_charges", "total_amount",
+            "status", "created_at",
+        )
+        item_columns = ("id", "order_id", "product_id", "variant_id", "quantity", "price")
+        redemption_columns = ("id", "offer_id", "order_id", "user_id", "customer_email", "created_at")
+        # (offer id, user id or guest email) -> redemptions so far, for per_user_limit
+        redeemed = Counter()
+        total = self.sizes.orders
+        span = HISTORY_DAYS * 86400
+        started = time.perf_counter()
+        for start in range(0, total, BATCH_SIZE):
+            rows, item_rows, redemption_rows = [], [], []
+            for n in range(start, min(start + BATCH_SIZE, total)):
+                # Volume grows over time: the density of created_at rises towards now
+                created_at = self.history_start + timedelta(seconds=span * math.sqrt((n + rng.random()) / total))
+                if rng.random() < 0.1:
+                    user_id = None
+                    name = rng.choice(guest_names)
+                    email = f"guest{order_id}@example.com"
+                    phone = f"8{order_id:09d}"
+                    city, state, zip_code = rng.choice(CITIES)
+                    address = json.dumps({"street": "1 Station Road", "city": city, "state": state, "zip": zip_code, "country": "India"})
+                else:
+                    user_id = rng.choices(buyers, cum_weights=buyer_weights)[0]
+                    name, email, phone, address = self.customers[user_id]
+
+                subtotal = 0.0
+                seen = set()
+                for _ in range(rng.choices((1, 2, 3, 4, 5, 8), (30, 28, 18, 12, 8, 4))[0]):
+                    product_id = rng.choices(popular_products, cum_weights=product_weights)[0]
+                    variants = self.product_variants.get(product_id)
+                    variant_id, price = rng.choice(variants) if variants and rng.random() < 0.5 else (None, self.product_prices[product_id])
+                    if (product_id, variant_id) in seen:
+                        continue
+                    seen.add((product_id, variant_id))
+                    quantity = rng.choices((1, 2, 3, 4, 6), (55, 25, 10, 6, 4))[0]
+                    subtotal += price * quantity
+                    item_rows.append((item_id, order_id, product_id, variant_id, quantity, price))
+                    item_id += 1
+
+                discount = 0.0
+                if self.redeemable and rng.random() < 0.12:
+                    offer_id, offer_type, value, min_order_value, valid_until, per_user_limit = rng.choice(self.redeemable)
+                    redeemer = (offer_id, user_id if user_id is not None else email)
+                    # Checkout only accepts the code inside its window and under the per-user limit
+                    if (
+                        subtotal >= min_order_value
+                        and (valid_until is None or created_at <= valid_until)
+                        and (per_user_limit is None or redeemed[redeemer] < per_user_limit)
+                    ):
+                        redeemed[redeemer] += 1
+                        discount = round(subtotal * value / 100, 2) if offer_type == models.OfferType.Percentage else min(value, subtotal)
+                        redemption_rows.append((redemption_id, offer_id, order_id, user_id, email, created_at))
+                        redemption_id += 1
+                payment_method = "cod" if rng.random() < 0.35 else "upi"
+                tax = self.rules.tax(subtotal - discount)
+                shipping = self.rules.shipping(subtotal)
+                try:
+                    cod = self.rules.cod(subtotal, payment_method)
+                except ValueError:
+                    # Above COD_MAX_ORDER_VALUE checkout refuses COD; the customer paid online
+                    payment_method = "upi"
+                    cod = self.rules.cod(subtotal, payment_method)
+                age_days = (self.now - created_at).total_seconds() / 86400
+                rows.append((
+                    order_id, user_id, name, email, phone, address,
+                    round(subtotal, 2), round(discount, 2), tax, shipping, cod,
+                    round(subtotal - discount + tax + shipping + cod, 2),
+                    self._order_status(rng, age_days), created_at,
+                ))
+                order_id += 1
+            self.loader.write(tables[0], columns, rows)
+            self.loader.write(tables[1], item_columns, item_rows)
+            self.loader.write(tables[2], redemption_columns, redemption_rows)
+            if total > BATCH_SIZE:
+                self.log(f"    {order_id - first_order_id:,} / {total:,} orders")
+        self._report(tables[0].name, total, started)
+        for table in tables[1:]:
+            self.log(f"  {table.name:<20} {self.loader.rows_written.get(table.name, 0):>10,} rows")
+
+    def carts(self):
+        from app import models
+
+        rng = self.rng(5)
+        table, item_table = models.Cart.__table__, models.CartItem.__table__
+        cart_id = self.loader.next_id(table)
+        item_id = self.loader.next_id(item_table)
+        owners = rng.sample(self.customer_ids, int(len(self.customer_ids) * self.sizes.cart_ratio))
+        rows, item_rows = [], []
+        started = time.perf_counter()
+        for user_id in owners:
+            updated_at = self.now - timedelta(seconds=rng.randint(60, 30 * 86400))
+            rows.append((cart_id, user_id, updated_at - timedelta(hours=rng.randint(0, 48)), updated_at))
+            for product_id in rng.sample(self.product_ids, min(len(self.product_ids), rng.randint(1, 4))):
+                variants = self.product_variants.get(product_id)
+                variant_id = rng.choice(variants)[0] if variants and rng.random() < 0.5 else None
+                item_rows.append((item_id, cart_id, product_id, variant_id, rng.randint(1, 3)))
+                item_id += 1
+            cart_id += 1
+            if len(rows) >= BATCH_SIZE:
+                self.loader.write(table, ("id", "user_id", "created_at", "updated_at"), rows)
+                self.loader.write(item_table, ("id", "cart_id", "product_id", "variant_id", "quantity"), item_rows)
+                rows, item_rows = [], []
+        self.loader.write(table, ("id", "user_id", "created_at", "updated_at"), rows)
+        self.loader.write(item_table, ("id", "cart_id", "product_id", "variant_id", "quantity"), item_rows)
+        self._report(table.name, len(owners), started)
+        self.log(f"  {item_table.name:<20} {self.loader.rows_written.get(item_table.name, 0):>10,} rows")
+
+
+def generate(sizes: Sizes, seed: int = 42, password: str = DEFAULT_PASSWORD, end: datetime = None, log=print) -> dict:
+    """Migrate the schema and load a dataset; needs DATABASE_URL set before app is imported"""
+    from app import catalog_version, migrations, offer_index
+    from app.database import engine
+    from app.routers.auth import get_password_hash
+
+    if end is None:
+        end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    migrations.upgrade()
+    loader = Loader(engine)
+    try:
+        summary = Generator(loader, sizes, seed, get_password_hash(password), end, log).run()
+    except BaseException:
+        loader.connection.rollback()
+        loader.connection.close()
+        raise
+    loader.finish(summary.pop("tables"))
+    # Rows were written around the ORM: bump the versions so running servers
+    # reload. This reaches them only through a shared KV_STORE_URL; otherwise
+    # they pick the data up after CATALOG_VERSION_MAX_AGE / OFFER_INDEX_MAX_AGE.
+    catalog_version.bump()
+    offer_index.invalidate()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="password of every generated user")
+    parser.add_argument("--end-date", type=datetime.fromisoformat, help="last day of order history (YYYY-MM-DD), default today")
+    for field in ("categories", "products", "users", "orders", "offers", "admins"):
+        parser.add_argument(f"--{field}", type=int, help=f"override the number of {field} of the scale")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if not os.getenv("DATABASE_URL"):
+        parser.error("set DATABASE_URL or pass --database-url")
+    sizes = replace(SCALES[args.scale], **{
+        field: getattr(args, field)
+        for field in ("categories", "products", "users", "orders", "offers", "admins")
+        if getattr(args, field) is not None
+    })
+
+    started = time.perf_counter()
+    print(f"Generating {args.scale} dataset (seed {args.seed}): {sizes}")
+    end = args.end_date.replace(tzinfo=timezone.utc) if args.end_date else None
+    summary = generate(sizes, args.seed, args.password, end)
+    print(f"✓ Loaded {sum(summary['rows'].values()):,} rows in {time.perf_counter() - started:.0f}s")
+    print(f"  admin login: {summary['admin_emails'][0]} / {args.password}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Load test the API with scripted shopper and admin scenarios
+
+Virtual users (an async httpx client each) log in once and then loop over a
+weighted mix of scenarios until the duration is up:
+- browse: product list pages, product details, categories
+- search: name search, category and attribute filters
+- cart: add items, view the cart, remove an item
+- checkout: place a COD order for one to three products, sometimes with a coupon
+- admin: order listing, dashboard stats and reports
+
+The app is driven either in-process (ASGI transport, no sockets) or as a
+uvicorn server launched by this script (--launch, closest to production).
+The database is a fresh SQLite file by default, or any URL given with
+--database-url. The schema is migrated, and when the database has no products
+it is filled by generate_dataset.py at --scale. Point --database-url at a
+database generated beforehand to test against production-sized data.
+
+Reports throughput and p50/p95/p99 latency per request type. --save writes
+the results as JSON; --baseline compares against a saved run and exits with
+status 1 when a request type got slower (p95) or the overall throughput
+dropped by more than --tolerance.
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --duration 30 --users 20 --scenarios browse,checkout
+    python benchmarks/load_test.py --launch --workers 2 --save benchmarks/baseline.json
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json --tolerance 0.25
+    python benchmarks/load_test.py --scale small
+    python benchmarks/load_test.py --database-url postgresql://localhost/trumix_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from generate_dataset import DEFAULT_PASSWORD, SCALES
+
+COUPON_CODE = "LOADTEST10"
+SHIPPING_ADDRESS = {"street": "12 MG Road", "city": "Pune", "state": "Maharashtra", "zip": "411001", "country": "India"}
+SEARCH_TERMS = ("Premix", "Cookie", "Masala", "Tea", "Coffee")
+
+# Scenario weights for shoppers; one virtual user in ten is an admin
+WEIGHTS = {"browse": 50, "search": 20, "cart": 20, "checkout": 10}
+
+
+def configure_environment(database_url: str):
+    """Settings for the app under test; must run before anything imports app"""
+    os.environ["DATABASE_URL"] = database_url
+    # Every virtual user logs in from the same address
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("EMAIL_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("APP_ENV", "production")
+
+
+def prepare_database(args) -> dict:
+    """Generate a dataset if the catalog is empty, then collect ids and logins to use"""
+    from app import migrations, models, offer_index
+    from app.database import SessionLocal
+    from generate_dataset import generate
+
+    migrations.upgrade()
+    db = SessionLocal()
+    try:
+        if not db.query(models.Product.id).first():
+            print(f"Generating the {args.scale} dataset...")
+            generate(SCALES[args.scale], args.seed, args.password, log=lambda line: None)
+        if not db.query(models.Offer.id).filter(models.Offer.code == COUPON_CODE).first():
+            db.add(models.Offer(code=COUPON_CODE, type=models.OfferType.Percentage, value=10, min_order_value=0))
+            db.commit()
+            offer_index.invalidate()
+        admin = db.query(models.User.email).filter(models.User.role == models.UserRole.admin).order_by(models.User.id).first()
+        if admin is None:
+            raise SystemExit("No admin user in the database; generate_dataset.py creates one")
+        product_ids = [row.id for row in db.query(models.Product.id).all()]
+        shoppers = [
+            row.email for row in db.query(models.User.email)
+            .filter(models.User.role == models.UserRole.user).order_by(models.User.id).limit(1000)
+        ]
+        category_slugs = [row.slug for row in db.query(models.Category.slug).all()]
+    finally:
+        db.close()
+    return {
+        "product_ids": product_ids,
+        "shoppers": shoppers,
+        "admin_email": admin.email,
+        "category_slugs": category_slugs,
+        "password": args.password,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client, name: str, method: str, url: str, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code not in expected:
+            self.errors[name] += 1
+            return None
+        return response
+
+
+# Scenarios
+
+async def browse(client, recorder, data, rng, headers):
+    page = rng.randint(1, 5)
+    await recorder.call(client, "GET /products (page)", "GET", f"/api/v1/products/?page={page}&limit=20&sort=order")
+    await recorder.call(client, "GET /products/{id}", "GET", f"/api/v1/products/{rng.choice(data['product_ids'])}")
+    await recorder.call(client, "GET /categories", "GET", "/api/v1/categories/")
+
+
+async def search(client, recorder, data, rng, headers):
+    term = rng.choice(SEARCH_TERMS)
+    await recorder.call(client, "GET /products?search", "GET", f"/api/v1/products/?search={term}&limit=20")
+    category = rng.choice(data["category_slugs"])
+    await recorder.call(client, "GET /products?category", "GET", f"/api/v1/products/?category={category}&sort=price_asc")
+    await recorder.call(client, "GET /products?attr", "GET", "/api/v1/products/?attr=unit:Sachet&limit=20")
+
+
+async def cart(client, recorder, data, rng, headers):
+    for product_id in rng.sample(data["product_ids"], 2):
+        await recorder.call(
+            client, "POST /cart/items", "POST", "/api/v1/cart/items",
+            json={"product_id": product_id, "variant_id": None, "quantity": rng.randint(1, 3)}, headers=headers
+        )
+    response = await recorder.call(client, "GET /cart", "GET", "/api/v1/cart/", headers=headers)
+    if response is not None:
+        items = response.json()["data"]["items"]
+        if items:
+            await recorder.call(client, "DELETE /cart/items/{id}", "DELETE", f"/api/v1/cart/items/{items[0]['id']}", headers=headers)
+
+
+async def checkout(client, recorder, data, rng, headers):
+    items = [
+        {"productId": product_id, "variantId": None, "quantity": rng.randint(1, 3)}
+        for product_id in rng.sample(data["product_ids"], rng.randint(1, 3))
+    ]
+    order = {"items": items, "shippingAddress": SHIPPING_ADDRESS, "paymentMethod": "cod"}
+    if rng.random() < 0.3:
+        order["couponCode"] = COUPON_CODE
+    await recorder.call(client, "POST /orders", "POST", "/api/v1/orders/", expected=(201,), json=order, headers=headers)
+    await recorder.call(client, "GET /orders (mine)", "GET", "/api/v1/orders/?limit=10", headers=headers)
+
+
+async def admin(client, recorder, data, rng, headers):
+    await recorder.call(client, "GET /orders (admin)", "GET", "/api/v1/orders/?limit=50", headers=headers)
+    await recorder.call(client, "GET /dashboard/stats", "GET", "/api/v1/dashboard/stats", headers=headers)
+    await recorder.call(client, "GET /reports/sales", "GET", "/api/v1/reports/sales", headers=headers)
+    await recorder.call(client, "GET /reports/top-products", "GET", "/api/v1/reports/top-products", headers=headers)
+
+
+SCENARIOS = {"browse": browse, "search": search, "cart": cart, "checkout": checkout, "admin": admin}
+
+
+async def login(client, email: str, password: str) -> dict:
+    response = await client.post("/api/v1/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def is_admin_user(index: int, scenarios: list) -> bool:
+    return "admin" in scenarios and (index % 10 == 9 or scenarios == ["admin"])
+
+
+async def virtual_user(index, client, recorder, data, scenarios, headers, deadline, seed):
+    rng = random.Random(seed * 1000 + index)
+    if is_admin_user(index, scenarios):
+        names, weights = ["admin"], [1]
+    else:
+        names = [name for name in scenarios if name != "admin"] or ["browse"]
+        weights = [WEIGHTS[name] for name in names]
+    while time.perf_counter() < deadline:
+        await SCENARIOS[rng.choices(names, weights)[0]](client, recorder, data, rng, headers)
+
+
+async def drive(make_client, data, args) -> tuple:
+    recorder = Recorder()
+    async with make_client() as client:
+        # Logins (bcrypt) and a warm-up pass happen before the clock starts
+        logins = await asyncio.gather(*(
+            login(
+                client,
+                data["admin_email"] if is_admin_user(i, args.scenarios) else data["shoppers"][i % len(data["shoppers"])],
+                data["password"],
+            )
+            for i in range(args.users)
+        ))
+        await browse(client, Recorder(), data, random.Random(0), {})
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(i, client, recorder, data, args.scenarios, logins[i], deadline, args.seed)
+            for i in range(args.users)
+        ))
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+def run_in_process(data, args):
+    import httpx
+    from app.main import app
+
+    async def main():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            return await drive(lambda: httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60), data, args)
+
+    return asyncio.run(main())
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_launched(data, args):
+    import httpx
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(args.workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=dict(os.environ), stdout=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.perf_counter() + 60
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() > deadline:
+                raise RuntimeError("Server did not start within 60s")
+            time.sleep(0.1)
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        return asyncio.run(drive(lambda: httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60), data, args))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+# Reporting
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    requests = {}
+    for name in sorted(set(recorder.latencies) | set(recorder.errors)):
+        values = sorted(recorder.latencies[name])
+        requests[name] = {
+            "count": len(values),
+            "errors": recorder.errors[name],
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        }
+    total = sum(entry["count"] for entry in requests.values())
+    return {
+        "duration_s": round(elapsed, 2),
+        "requests_total": total,
+        "errors_total": sum(entry["errors"] for entry in requests.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "requests": requests,
+    }
+
+
+def print_summary(summary: dict):
+    print(f"{'request':<28} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, entry in summary["requests"].items():
+        print(
+            f"{name:<28} {entry['count']:>7} {entry['errors']:>5} {entry['rps']:>8.1f} {entry['p50_ms']:>9.1f} "
+            f"{entry['p95_ms']:>9.1f} {entry['p99_ms']:>9.1f} {entry['max_ms']:>9.1f}"
+        )
+    print(
+        f"total: {summary['requests_total']} requests, {summary['errors_total']} errors, "
+        f"{summary['throughput_rps']:.1f} req/s over {summary['duration_s']:.1f}s"
+    )
+
+
+def compare(summary: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """Regressions as readable strings; empty when the run is within tolerance"""
+    regressions = []
+    for name, entry in summary["requests"].items():
+        before = baseline["requests"].get(name)
+        if not before or not before["count"]:
+            continue
+        limit = before["p95_ms"] * (1 + tolerance)
+        if entry["p95_ms"] > limit and entry["p95_ms"] - before["p95_ms"] >= min_delta_ms:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {entry['p95_ms']:.1f} ms")
+        if entry["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {entry['errors']}")
+    if summary["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput_rps']:.1f} -> {summary['throughput_rps']:.1f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load after warm-up")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file")
+    parser.add_argument("--scale", choices=SCALES, default="tiny", help="dataset generated when the database is empty")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="password of the generated users")
+    parser.add_argument("--launch", action="store_true", help="run against a uvicorn server instead of in-process")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --launch")
+    parser.add_argument("--save", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore p95 changes smaller than this")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    database_url = args.database_url
+    if not database_url:
+        path = os.path.join(tempfile.gettempdir(), "trumix_load_test.db")
+        if os.path.exists(path):
+            os.remove(path)
+        database_url = f"sqlite:///{path}"
+    configure_environment(database_url)
+
+    data = prepare_database(args)
+    mode = f"uvicorn x{args.workers}" if args.launch else "in-process"
+    print(f"{args.users} users, {args.duration:.0f}s, {mode}, {database_url.split('@')[-1]}")
+    recorder, elapsed = run_launched(data, args) if args.launch else run_in_process(data, args)
+    summary = summarize(recorder, elapsed)
+    summary["config"] = {"users": args.users, "duration": args.duration, "mode": mode, "scenarios": args.scenarios}
+    print_summary(summary)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"✓ Results saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("users") != args.users or baseline.get("config", {}).get("mode") != mode:
+            print(f"warning: baseline was recorded with {baseline.get('config')}")
+        regressions = compare(summary, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("FAIL: regressions against the baseline")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✓ Within {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
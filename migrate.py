@@ -0,0 +1,29 @@
+"""
+Apply database schema migrations
+Usage:
+    python migrate.py            # apply all pending migrations
+    python migrate.py status     # show applied and pending migrations
+    python migrate.py 3          # apply pending migrations up to version 3
+"""
+import logging
+import sys
+
+from app import migrations
+
+def main(args):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args and args[0] == "status":
+        for migration, applied in migrations.status():
+            mark = "✓" if applied else " "
+            print(f"[{mark}] {migration.version:03d} {migration.name} - {migration.description}")
+        return
+
+    target = int(args[0]) if args else None
+    applied = migrations.upgrade(target=target)
+    if applied:
+        print(f"✓ Applied {len(applied)} migration(s): " + ", ".join(f"{m.version:03d}_{m.name}" for m in applied))
+    else:
+        print("Database is up to date")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
 from app import models
+import app.catalog_version  # session hooks bump the catalog version; servers see it through a shared KV_STORE_URL
 
 def seed_products():
     db = SessionLocal()
@@ -58,7 +59,7 @@ def seed_products():
                     category_id=premix_cat.id,
                     stock=100, # Default stock
                     # Storing retailer price in attributes for now as it's not a main field
-                    attributes=f'{{"retailer_price": {p_data["retailer_price"]}, "unit": "Sachet"}}'
+                    attributes={"retailer_price": p_data["retailer_price"], "unit": "Sachet"}
                 )
                 db.add(product)
                 print(f"Created product: {product.name}")